@@ -1,13 +1,30 @@
-import yfinance as yf
-import pandas as pd
-import datetime as dt
-import requests 
-import json
-from .fetch_info import safe_get_info
-
-def fetch_business_prompt(ticker):
+from .fetch_info import safe_get_info, InfoUnavailable
+from .ollama_client import generate, DEFAULT_MODEL
+from .prompt_packer import SHARED_NUM_CTX
+from .llm_scheduler import SchedulerSaturated
+from .deadline import DeadlineExceeded
+from .stage_memo import fields_fingerprint, reuse_output, remember_output
+
+# Every info field fetch_business_prompt reads; the output is regenerated only when one changes.
+BUSINESS_FIELDS = (
+    "industry",
+    "sector",
+    "longBusinessSummary",
+    "country",
+    "fullTimeEmployees",
+    "companyOfficers",
+)
+
+def business_fingerprint(ticker, tick):
+    """
+    Fingerprint of the info fields the business prompt reads.
+    """
+    return fields_fingerprint(tick, BUSINESS_FIELDS)
+
+def fetch_business_prompt(ticker, info=None):
     
-    tick = safe_get_info(ticker)
+    # Callers that already hold the info dict (e.g. a MarketDataContext) pass it in.
+    tick = info if info is not None else safe_get_info(ticker)
 
 
     industry = tick.get('industry', 'N/A')
@@ -76,24 +93,27 @@ Your task is to analyze the company's business model, its competitive position i
 
     return bussiness_prompt
 
-def get_business_response(ticker) -> str: 
+def get_business_response(ticker, info=None) -> str: 
         
+    tick = info if info is not None else safe_get_info(ticker)
+    if not tick:
+        raise InfoUnavailable(f"No company info for {ticker}")
+
+    # Reuse the last output while the fields this prompt reads are unchanged.
+    stage_fingerprint = business_fingerprint(ticker, tick)
+    previous = reuse_output(ticker, "business_analysis", stage_fingerprint)
+    if previous is not None:
+        return previous
+
     try: 
         # Call Ollama API
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "qwen2.5:latest",  # or your favorite model
-                    "prompt": fetch_business_prompt(ticker),
-                    "stream": False,
-                    "num_ctx": 32000  # Adjust context size as needed
-
-                },
-                timeout=120
-            )
-            summary = response.json().get("response", "").strip()
+            summary = generate(fetch_business_prompt(ticker, tick), model=DEFAULT_MODEL, options={"num_ctx": SHARED_NUM_CTX},
+                               timeout=120, cache=True)
+            remember_output(ticker, "business_analysis", stage_fingerprint, summary)
             return summary
 
+    except (SchedulerSaturated, DeadlineExceeded):
+        raise  # the view answers 503 / the stage degrades, instead of a placeholder text
     except Exception as e:
         print(f"Error calling Ollama API: {e}")
         summary = "Failed to generate summary due to an error."
@@ -1,27 +1,21 @@
 # API/Summary.py
 
-import requests
-import json
+from .ollama_client import generate, generate_stream
+from .llm_scheduler import SchedulerSaturated
+from .deadline import DeadlineExceeded
+from .stage_memo import fingerprint, reuse_output, remember_output
+from .prompt_packer import Section, json_section, pack_sections, SHARED_NUM_CTX, OUTPUT_TOKENS
 
 OLLAMA_MODEL = "qwen2.5"  # You can easily change this if needed later
 
+# Insight key -> the summary prompt section that carries its text.
+INSIGHT_SECTION_TITLES = {
+    "business_analysis": "BUSINESS OVERVIEW",
+    "health_analysis": "FINANCIAL HEALTH",
+    "analyst_opinion": "ANALYST OPINION",
+}
 
-def summarize_stock(ticker, vision_analysis, stock_ai, news_sentiment, health_text, business_text, analyst_opinion_text):
-    """
-    Generates a holistic summary for a single stock.
-
-    Args:
-        ticker (str): Stock ticker
-        vision_analysis (dict): Vision model analysis
-        stock_ai (dict): Dict with volume, volatility_sharpe, basic_info
-        news_sentiment (dict): News sentiment result
-
-    Returns:
-        str: Stock summary text
-    """
-    stock_prompt = f"""
-You are a financial research assistant. Summarize the investment outlook for {ticker} based on the following structured data sources.
-
+SUMMARY_AREAS = """
 Provide a well-organized response covering these key areas:
 🔍 1. Business Model & Competitive Advantage
 - What products/services does the company offer, and who are its main customers?
@@ -54,104 +48,163 @@ Provide a well-organized response covering these key areas:
 📚 7. Sentiment & Analyst Coverage
 - What's the recent tone in media or investor sentiment?
 - What do analysts project (ratings, targets, earnings surprises)?
+"""
 
---- TECHNICAL ANALYSIS ---
-{json.dumps(vision_analysis, indent=2)}
 
---- RISK METRICS ---
-{stock_ai.get('volume', 'N/A')}
-{stock_ai.get('volatility_sharpe', 'N/A')}
-{stock_ai.get('basic_info', 'N/A')}
+def _summary_sections(vision_analysis, stock_ai, news_sentiment, health_text, business_text, analyst_opinion_text):
+    # Higher priority survives longer when the prompt is over budget. The LLM
+    # insight sections are dense and already distilled; raw news JSON is not.
+    risk_text = "\n".join(str(stock_ai.get(key, 'N/A')) for key in ("volume", "volatility_sharpe", "basic_info"))
+    return [
+        json_section("TECHNICAL ANALYSIS", vision_analysis, priority=2, min_tokens=300),
+        Section("RISK METRICS", risk_text, priority=5, min_tokens=200),
+        json_section("NEWS SENTIMENT", news_sentiment, priority=1),
+        Section("BUSINESS OVERVIEW", business_text, priority=3, min_tokens=300),
+        Section("FINANCIAL HEALTH", health_text, priority=4, min_tokens=400),
+        Section("ANALYST OPINION", analyst_opinion_text, priority=4, min_tokens=300),
+    ]
 
---- NEWS SENTIMENT ---
-{json.dumps(news_sentiment, indent=2)}
 
---- BUSINESS OVERVIEW ---
-{business_text or 'N/A'}
+def build_stock_prompt(ticker, vision_analysis, stock_ai, news_sentiment, health_text, business_text, analyst_opinion_text):
+    """
+    Builds the single-stock summary prompt, packed by section priority into the
+    token budget of the shared context size.
 
---- FINANCIAL HEALTH ---
-{health_text or 'N/A'}
+    Returns:
+        str: The prompt text
+    """
+    header = f"""
+You are a financial research assistant. Summarize the investment outlook for {ticker} based on the following structured data sources.
+""" + SUMMARY_AREAS
+    sections = _summary_sections(vision_analysis, stock_ai, news_sentiment, health_text, business_text, analyst_opinion_text)
 
---- ANALYST OPINION ---
-{analyst_opinion_text or 'N/A'}
-"""
+    stock_prompt, _, shrunk = pack_sections(header, sections, SHARED_NUM_CTX - OUTPUT_TOKENS)
+    if shrunk:
+        print(f"Shrunk sections to fit context: {', '.join(shrunk)}")
 
-    # Ensure the prompt is not too long
-    print(len(stock_prompt))
-    if len(stock_prompt) > 32000:
-        print("Truncating stock prompt to fit within context size")
-        stock_prompt = stock_prompt[:32000]  # Truncate if necessary
+    return stock_prompt
 
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": stock_prompt,
-                "stream": False,
-                "options":{
-                    "num_ctx": 32000
-                }  # Adjust context size as needed
-
-            },
-            timeout=240
-        )
-        summary_text = response.json().get("response", "").strip()
-    except Exception as e:
-        summary_text = f"Stock summary generation failed: {str(e)}"
-
-    return summary_text
 
-
-def summary_portfolio(portfolio_ai, news_sentiment):
+def build_session_prompt(session, ticker, vision_analysis, stock_ai, news_sentiment, health_text, business_text,
+                         analyst_opinion_text):
+    """
+    Follow-up summary message for a chat session that already holds the
+    insight analyses: only the sections not yet in the conversation are sent,
+    packed into what is left of the session's context.
+    """
+    header = f"""
+Using the analyses you wrote above together with the additional data below, summarize the investment outlook for {ticker}.
+Write plain prose, not JSON.
+""" + SUMMARY_AREAS
+    already_sent = {INSIGHT_SECTION_TITLES[key] for key in session.covered}
+    sections = [
+        section for section in _summary_sections(vision_analysis, stock_ai, news_sentiment, health_text,
+                                                 business_text, analyst_opinion_text)
+        if section.title not in already_sent
+    ]
+    budget = session.options["num_ctx"] - session.history_tokens - OUTPUT_TOKENS
+    prompt, prompt_tokens, shrunk = pack_sections(header, sections, budget)
+    print(f"Session follow-up for {ticker}: ~{prompt_tokens} new tokens on top of ~{session.history_tokens} in history")
+    if shrunk:
+        print(f"Shrunk sections to fit context: {', '.join(shrunk)}")
+    return prompt
+
+
+def _log_session_prefill(session):
+    turn = session.turns[-1] if session.turns else None
+    if turn and turn["prompt_eval_count"] is not None:
+        print(f"Summary prefill for {session.ticker}: {turn['prompt_eval_count']} tokens evaluated "
+              f"of ~{turn['history_tokens']} sent")
+
+
+def summary_fingerprint(vision_analysis, stock_ai, news_sentiment, health_text, business_text, analyst_opinion_text):
     """
-    Generates a holistic summary for the user's portfolio.
+    Fingerprint of every upstream section summarize_stock consumes.
+    """
+    return fingerprint({
+        "vision": vision_analysis,
+        "risk": {key: stock_ai.get(key) for key in ("volume", "volatility_sharpe", "basic_info")},
+        "news": news_sentiment,
+        "health": health_text,
+        "business": business_text,
+        "analyst": analyst_opinion_text,
+    })
+
+
+def summarize_stock(ticker, vision_analysis, stock_ai, news_sentiment, health_text, business_text, analyst_opinion_text,
+                    session=None):
+    """
+    Generates a holistic summary for a single stock.
 
     Args:
-        portfolio_ai (dict): Dict with summary, sector, dividends, recommendations
+        ticker (str): Stock ticker
+        vision_analysis (dict): Vision model analysis
+        stock_ai (dict): Dict with volume, volatility_sharpe, basic_info
         news_sentiment (dict): News sentiment result
+        session (ChatSession): Continue the conversation that produced the
+            insights, so their text isn't prefilled a second time
 
     Returns:
-        str: Portfolio summary text
+        str: Stock summary text
     """
-    portfolio_prompt = f"""
-        You are a financial assistant. Based on the following portfolio analysis, provide a clear 4-6 bullet point summary covering:
-
-        1. Portfolio performance trends
-        2. Sector distribution insights
-        3. Dividend income highlights
-        4. Notable analyst recommendations
-        5. General investment outlook and risks
+    # Only re-run when at least one upstream section changed since last time.
+    inputs_fingerprint = summary_fingerprint(vision_analysis, stock_ai, news_sentiment,
+                                             health_text, business_text, analyst_opinion_text)
+    previous = reuse_output(ticker, "stock_summary", inputs_fingerprint)
+    if previous is not None:
+        return previous
 
-        --- PORTFOLIO SUMMARY ---
-        {portfolio_ai.get('summary', 'N/A')}
+    try:
+        if session is not None and session.covered:
+            summary_text = session.ask(build_session_prompt(session, ticker, vision_analysis, stock_ai, news_sentiment,
+                                                            health_text, business_text, analyst_opinion_text))
+            _log_session_prefill(session)
+        else:
+            stock_prompt = build_stock_prompt(ticker, vision_analysis, stock_ai, news_sentiment,
+                                              health_text, business_text, analyst_opinion_text)
+            summary_text = generate(stock_prompt, model=OLLAMA_MODEL, options={"num_ctx": SHARED_NUM_CTX}, timeout=240,
+                                    cache=True)
+        remember_output(ticker, "stock_summary", inputs_fingerprint, summary_text)
+    except (SchedulerSaturated, DeadlineExceeded):
+        raise
+    except Exception as e:
+        summary_text = f"Stock summary generation failed: {str(e)}"
 
-        --- SECTOR TOTALS ---
-        {portfolio_ai.get('sector', 'N/A')}
+    return summary_text
 
-        --- DIVIDENDS ---
-        {portfolio_ai.get('dividends', 'N/A')}
 
-        --- RECOMMENDATIONS ---
-        {portfolio_ai.get('recommendations', 'N/A')}
+def summarize_stock_stream(ticker, vision_analysis, stock_ai, news_sentiment, health_text, business_text, analyst_opinion_text,
+                           session=None):
+    """
+    Streaming variant of summarize_stock.
 
-        --- NEWS SENTIMENT ---
-        {json.dumps(news_sentiment, indent=2)}
+    Yields:
+        str: Summary text chunks as the model produces them
     """
+    inputs_fingerprint = summary_fingerprint(vision_analysis, stock_ai, news_sentiment,
+                                             health_text, business_text, analyst_opinion_text)
+    previous = reuse_output(ticker, "stock_summary", inputs_fingerprint)
+    if previous is not None:
+        yield previous
+        return
 
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": portfolio_prompt,
-                "stream": False,
-                "num_ctx": 32000  # Adjust context size if needed
-            },
-            timeout=240
-        )
-        summary_text = response.json().get("response", "").strip()
+        if session is not None and session.covered:
+            chunks = session.ask_stream(build_session_prompt(session, ticker, vision_analysis, stock_ai, news_sentiment,
+                                                             health_text, business_text, analyst_opinion_text))
+        else:
+            stock_prompt = build_stock_prompt(ticker, vision_analysis, stock_ai, news_sentiment,
+                                              health_text, business_text, analyst_opinion_text)
+            chunks = generate_stream(stock_prompt, model=OLLAMA_MODEL, options={"num_ctx": SHARED_NUM_CTX}, timeout=240,
+                                     cache=True)
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        if session is not None and session.covered:
+            _log_session_prefill(session)
+        remember_output(ticker, "stock_summary", inputs_fingerprint, "".join(parts).strip())
+    except (SchedulerSaturated, DeadlineExceeded):
+        raise
     except Exception as e:
-        summary_text = f"Portfolio summary generation failed: {str(e)}"
-
-    return summary_text
+        yield f"Stock summary generation failed: {str(e)}"
@@ -1,13 +1,41 @@
-import yfinance as yf
-import pandas as pd
-import datetime as dt
-import requests 
-import json
-from .fetch_info import safe_get_info
-
-def fetch_opinions_prompt(ticker):
+from .fetch_info import safe_get_info, InfoUnavailable
+from .ollama_client import generate, DEFAULT_MODEL
+from .prompt_packer import SHARED_NUM_CTX
+from .llm_scheduler import SchedulerSaturated
+from .deadline import DeadlineExceeded
+from .stage_memo import fingerprint, fields_fingerprint, reuse_output, remember_output
+from .peer_table import peer_context, PEER_FIELDS
+
+# Every info field fetch_opinions_prompt reads; the output is regenerated only when one changes.
+OPINION_FIELDS = (
+    "recommendationKey",
+    "numberOfAnalystOpinions",
+    "recommendationMean",
+    "targetMeanPrice",
+    "targetMedianPrice",
+    "averageAnalystRating",
+    "forwardPE",
+    "trailingPegRatio",
+    "epsForward",
+    "targetHighPrice",
+    "targetLowPrice",
+)
+
+# Fields compared against the ticker's industry / sector peers in the prompt.
+OPINION_PEER_FIELDS = tuple(field for field in OPINION_FIELDS if field in PEER_FIELDS)
+
+
+def opinions_fingerprint(ticker, tick):
+    """
+    Fingerprint of everything the opinions prompt reads: its info fields and the peer context.
+    """
+    return fingerprint({"fields": fields_fingerprint(tick, OPINION_FIELDS),
+                        "peers": peer_context(ticker, OPINION_PEER_FIELDS)})
+
+def fetch_opinions_prompt(ticker, info=None):
     
-    tick = safe_get_info(ticker)
+    # Callers that already hold the info dict (e.g. a MarketDataContext) pass it in.
+    tick = info if info is not None else safe_get_info(ticker)
 
 
     #data 
@@ -24,6 +52,8 @@ def fetch_opinions_prompt(ticker):
     peg_ratio = tick.get("trailingPegRatio")
     eps_fwd = tick.get("epsForward")
 
+    peers = peer_context(ticker, OPINION_PEER_FIELDS) or "No peer data available."
+
     analysts_prompt = f"""
 You are a financial analyst tasked with evaluating the stock recommendations for {ticker} based on analyst opinions.
 
@@ -44,6 +74,9 @@ Valuation Metrics:
 - PEG Ratio: {peg_ratio}
 - EPS Forward: {eps_fwd}
 
+Peer Comparison:
+{peers}
+
 Please provide a detailed analysis of the stock's potential based on these recommendations, valuation metrics, and price targets.
 """
 
@@ -51,24 +84,27 @@ Please provide a detailed analysis of the stock's potential based on these recom
 
     return analysts_prompt
 
-def get_opinions_response(ticker) -> str: 
+def get_opinions_response(ticker, info=None) -> str: 
         
+    tick = info if info is not None else safe_get_info(ticker)
+    if not tick:
+        raise InfoUnavailable(f"No company info for {ticker}")
+
+    # Reuse the last output while the fields this prompt reads are unchanged.
+    stage_fingerprint = opinions_fingerprint(ticker, tick)
+    previous = reuse_output(ticker, "analyst_opinion", stage_fingerprint)
+    if previous is not None:
+        return previous
+
     try: 
         # Call Ollama API
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "qwen2.5:latest",  # or your favorite model
-                    "prompt": fetch_opinions_prompt(ticker),
-                    "stream": False,
-                    "num_ctx": 32000  # Adjust context size as needed
-
-                },
-                timeout=120
-            )
-            summary = response.json().get("response", "").strip()
+            summary = generate(fetch_opinions_prompt(ticker, tick), model=DEFAULT_MODEL, options={"num_ctx": SHARED_NUM_CTX},
+                               timeout=120, cache=True)
+            remember_output(ticker, "analyst_opinion", stage_fingerprint, summary)
             return summary
 
+    except (SchedulerSaturated, DeadlineExceeded):
+        raise  # the view answers 503 / the stage degrades, instead of a placeholder text
     except Exception as e:
         print(f"Error calling Ollama API: {e}")
         summary = "Failed to generate summary due to an error."
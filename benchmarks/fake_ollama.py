@@ -0,0 +1,221 @@
+import re
+import json
+import time
+import threading
+from os.path import commonprefix
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Ollama HTTP API (/api/generate, /api/chat, /api/tags,
+# /api/ps). Responses are canned text whose timing follows a simple model:
+# prompt tokens cost prefill_latency each, generated tokens cost token_latency
+# each, and at most `slots` requests generate at once (like OLLAMA_NUM_PARALLEL).
+# Like the real server, each slot keeps its last conversation evaluated, so a
+# request that repeats it as a prefix only prefills (and counts in
+# prompt_eval_count) the new part.
+
+WORDS = ("the company shows steady revenue growth with healthy margins while valuation "
+         "remains elevated relative to peers and analysts stay broadly positive").split()
+
+
+class FakeOllamaServer:
+    """
+    Args:
+        port (int): 0 picks a free port
+        token_latency (float): Seconds per generated token
+        prefill_latency (float): Seconds per prompt token
+        response_tokens (int): Tokens generated per response
+        slots (int): Requests generating concurrently; the rest queue
+        models (list): Model names reported as available and loaded
+    """
+
+    def __init__(self, port=0, token_latency=0.002, prefill_latency=0.00005, response_tokens=200,
+                 slots=4, models=("qwen2.5:latest",)):
+        self.token_latency = token_latency
+        self.prefill_latency = prefill_latency
+        self.response_tokens = response_tokens
+        self.models = list(models)
+        self.slots = threading.BoundedSemaphore(slots)
+        self._kv_cache = deque(maxlen=slots)  # text each slot has evaluated last
+        self._kv_lock = threading.Lock()
+        self.requests = 0
+        self._count_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, body, status=200):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunk(self, body):
+                data = (json.dumps(body) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": name, "model": name} for name in server.models]})
+                elif self.path == "/api/ps":
+                    self._send_json({"models": [{"name": name, "model": name} for name in server.models]})
+                elif self.path == "/":
+                    self._send_json({"status": "Ollama is running"})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path not in ("/api/generate", "/api/chat"):
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+                if body.get("model") not in server.models and body.get("model", "") + ":latest" not in server.models:
+                    self._send_json({"error": f"model '{body.get('model')}' not found"}, status=404)
+                    return
+                with server._count_lock:
+                    server.requests += 1
+                server._generate(self, body, chat=self.path == "/api/chat")
+
+        return Handler
+
+    @staticmethod
+    def conversation_text(body, chat):
+        if chat:
+            return "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in body.get("messages", []))
+        return body.get("prompt", "")
+
+    def prompt_tokens(self, body, chat):
+        """Tokens to prefill: the request text minus the longest prefix a slot still has cached."""
+        text = self.conversation_text(body, chat)
+        with self._kv_lock:
+            cached = max((len(commonprefix([text, seen])) for seen in self._kv_cache), default=0)
+        return max(1, (len(text) - cached) // 4)
+
+    def _remember(self, body, chat, answer):
+        text = self.conversation_text(body, chat) + (f"<assistant>{answer}" if chat else answer)
+        with self._kv_lock:
+            self._kv_cache.append(text)
+
+    def response_text(self, body):
+        """
+        Text to return for a request; override for custom payloads. In JSON
+        mode ("format": "json") it is an object with a string value for every
+        key the prompt asks for ('...these keys: "a", "b".').
+        """
+        text = " ".join(WORDS[i % len(WORDS)] for i in range(self.response_tokens))
+        if body.get("format") != "json":
+            return text
+        prompt = body.get("prompt") or "".join(m.get("content", "") for m in body.get("messages", []))
+        match = re.search(r"these keys: ([^\n]*)", prompt)
+        keys = re.findall(r'"([^"]+)"', match.group(1)) if match else ["response"]
+        share = max(1, self.response_tokens // len(keys))
+        return json.dumps({key: " ".join(WORDS[i % len(WORDS)] for i in range(share)) for key in keys})
+
+    def _generate(self, handler, body, chat):
+        prompt_tokens = self.prompt_tokens(body, chat)
+        words = self.response_text(body).split(" ")
+        started = time.monotonic()
+
+        with self.slots:
+            prefill_started = time.monotonic()
+            time.sleep(prompt_tokens * self.prefill_latency)
+            prompt_eval_duration = time.monotonic() - prefill_started
+
+            stream = body.get("stream", True)
+            if stream:
+                handler.send_response(200)
+                handler.send_header("Content-Type", "application/x-ndjson")
+                handler.send_header("Transfer-Encoding", "chunked")
+                handler.end_headers()
+
+            eval_started = time.monotonic()
+            for index, word in enumerate(words):
+                time.sleep(self.token_latency)
+                if stream:
+                    piece = word if index == 0 else " " + word
+                    handler._send_chunk(self._chunk(body, piece, chat, done=False))
+            eval_duration = time.monotonic() - eval_started
+
+        self._remember(body, chat, " ".join(words))
+        final = self._chunk(body, "" if stream else " ".join(words), chat, done=True)
+        final.update({
+            "total_duration": int((time.monotonic() - started) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_eval_duration * 1e9),
+            "eval_count": len(words),
+            "eval_duration": int(eval_duration * 1e9),
+        })
+        if not chat:
+            final["context"] = [1] * min(prompt_tokens + len(words), 64)
+
+        if stream:
+            handler._send_chunk(final)
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+        else:
+            handler._send_json(final)
+
+    @staticmethod
+    def _chunk(body, text, chat, done):
+        chunk = {"model": body.get("model"), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": done}
+        if chat:
+            chunk["message"] = {"role": "assistant", "content": text}
+        else:
+            chunk["response"] = text
+        return chunk
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a local fake Ollama server.")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--slots", type=int, default=4)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(port=args.port, token_latency=args.token_latency,
+                              response_tokens=args.response_tokens, slots=args.slots)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Worker startup benchmark: how long importing the views takes and how much
+resident memory a fresh worker process holds afterwards.
+
+Each run is a new interpreter, like a freshly forked gunicorn worker that
+doesn't share the master's pages. Three modes are compared:
+    django   - Django alone, the floor every worker pays anyway
+    lazy     - import views; heavy dependencies stay unloaded (the default)
+    preload  - import views, then lazy_imports.preload(); everything loaded,
+               which is what every worker paid before the imports were lazy
+
+    python -m API.benchmarks.imports --runs 5
+    python -m API.benchmarks.imports --stand-ins   # without the sibling apps (or yfinance) installed
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from .run import percentile
+
+PACKAGE = __package__.rsplit(".", 1)[0]
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("django", "lazy", "preload")
+
+# Reported when a mode's imports loaded them (stand-ins don't count).
+HEAVY_MODULES = ("pandas", "numpy", "yfinance", "API.AITools", "ScrapeData.helpers", "Vision.VisHelper",
+                 "MomentumSim.data_fetching")
+
+_CHILD = """
+import sys, json, time, importlib
+mode, package, stand_ins = sys.argv[1], sys.argv[2], sys.argv[3] == "1"
+if stand_ins:
+    # The yfinance stand-in too: importing the real one would load pandas and numpy before the snapshot.
+    importlib.import_module(package + ".benchmarks.stand_ins").install(fake_yfinance=True)
+import django
+from django.conf import settings
+settings.configure(DEBUG=False, ALLOWED_HOSTS=["*"], USE_TZ=True, INSTALLED_APPS=[])
+django.setup()
+import django.http, django.views.decorators.csrf, django.core.serializers.json
+already = set(sys.modules)  # stand-ins are registered up front; only count what the package pulls in
+
+started = time.perf_counter()
+preloaded = {}
+if mode != "django":
+    importlib.import_module(package + ".views")
+if mode == "preload":
+    preloaded = importlib.import_module(package + ".lazy_imports").preload()
+seconds = time.perf_counter() - started
+
+rss_kb = None
+try:
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+except (OSError, StopIteration):
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # peak, KiB on Linux
+print(json.dumps({"seconds": seconds, "rss_kb": rss_kb, "modules": len(sys.modules),
+                  "loaded": [name for name in json.loads(sys.argv[4]) if name in sys.modules and name not in already],
+                  "failed": [name for name, took in preloaded.items() if took is None]}))
+"""
+
+
+def measure(mode, stand_ins=False):
+    """
+    One fresh interpreter in the given mode.
+
+    Returns:
+        dict: seconds (import time after Django), rss_kb, modules and the heavy modules loaded
+    """
+    child = subprocess.run(
+        [sys.executable, "-c", _CHILD, mode, PACKAGE, "1" if stand_ins else "0", json.dumps(HEAVY_MODULES)],
+        cwd=PROJECT_DIR, capture_output=True, text=True,
+    )
+    if child.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{child.stderr}")
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per mode")
+    parser.add_argument("--stand-ins", action="store_true",
+                        help="register the benchmark stand-ins for the sibling apps and yfinance")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = {}
+    for mode in MODES:
+        samples = [measure(mode, args.stand_ins) for _ in range(args.runs)]
+        seconds = [sample["seconds"] for sample in samples]
+        rss_mb = [sample["rss_kb"] / 1024 for sample in samples]
+        report[mode] = {
+            "import_p50_s": percentile(seconds, 50),
+            "import_max_s": max(seconds),
+            "rss_p50_mb": percentile(rss_mb, 50),
+            "modules": samples[-1]["modules"],
+            "heavy_loaded": samples[-1]["loaded"],
+            "preload_failed": samples[-1]["failed"],
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return report
+
+    print(f"{'mode':<10}{'import p50':>12}{'import max':>12}{'RSS p50':>11}{'modules':>9}  heavy modules loaded")
+    for mode, row in report.items():
+        print(f"{mode:<10}{row['import_p50_s']:>11.3f}s{row['import_max_s']:>11.3f}s{row['rss_p50_mb']:>9.1f}MB"
+              f"{row['modules']:>9}  {', '.join(row['heavy_loaded']) or '-'}")
+        if row["preload_failed"]:
+            print(f"{'':<10}preload failed for: {', '.join(row['preload_failed'])}")
+    saved_s = report["preload"]["import_p50_s"] - report["lazy"]["import_p50_s"]
+    saved_mb = report["preload"]["rss_p50_mb"] - report["lazy"]["rss_p50_mb"]
+    print(f"\nLazy imports save {saved_s:.3f}s of startup and {saved_mb:.1f}MB RSS per worker until first use.")
+    return report
+
+
+if __name__ == "__main__":
+    main()
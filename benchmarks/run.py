@@ -0,0 +1,282 @@
+"""
+Offline throughput/latency benchmark for the analysis views.
+
+Runs comprehensive_summary, portfolio_breakdown and summarize_risk_metrics
+against a local fake Ollama server and recorded yfinance fixtures, with N
+concurrent clients, and reports p50/p95/p99 latency, requests per second and
+time per stage. Needs no network.
+
+    python -m API.benchmarks.run --clients 8 --requests 32
+    python -m API.benchmarks.run --scenario portfolio_breakdown --holdings 30 --token-latency 0.005
+"""
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import importlib
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from . import stand_ins
+from .fake_ollama import FakeOllamaServer
+
+PACKAGE = __package__.rsplit(".", 1)[0]
+
+SCENARIOS = ("comprehensive_summary", "portfolio_breakdown", "summarize_risk_metrics")
+BENCH_INFO_RATE = 10_000  # info fetches per second (and burst); the fixtures need no protecting
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class StageRecorder:
+    """Collects wall time and failures per stage from wrapped functions."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.failures = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, module, attribute, stage):
+        original = getattr(module, attribute)
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.failures[stage] += 1
+                raise
+            finally:
+                self.record(stage, time.perf_counter() - started)
+
+        setattr(module, attribute, timed)
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.failures.clear()
+
+    def report(self):
+        with self._lock:
+            return {
+                stage: {
+                    "calls": len(values),
+                    "mean_s": sum(values) / len(values),
+                    "p95_s": percentile(values, 95),
+                    "failed": self.failures[stage],
+                }
+                for stage, values in sorted(self.samples.items())
+            }
+
+
+def setup_django():
+    import django
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure(DEBUG=False, ALLOWED_HOSTS=["*"], USE_TZ=True, INSTALLED_APPS=[])
+    django.setup()
+
+
+def load_package(cold):
+    """
+    Imports the package modules with stand-ins in place and a throwaway data dir.
+    """
+    fake_yf = stand_ins.install()
+    setup_django()
+
+    modules = {}
+    for name in ("local_db", "fetch_info", "price_store", "generation_cache", "stage_memo", "summary_store",
+                 "ollama_client", "market_data", "pipeline", "portfolio_engine", "views",
+                 "Summary", "health_analysis", "analyst_opinion", "Business_analysis", "combined_insights"):
+        modules[name] = importlib.import_module(f"{PACKAGE}.{name}")
+    stand_ins.patch_package(PACKAGE, fake_yf)
+
+    modules["local_db"].DATA_DIR = tempfile.mkdtemp(prefix="analyst-bench-")
+    # The production limit (2/s, 5s queue) would starve concurrent clients and
+    # turn their info into {}, so stages would be measured on skipped prompts.
+    modules["fetch_info"].configure_rate_limit(rate=BENCH_INFO_RATE, burst=BENCH_INFO_RATE)
+    if cold:
+        disable_caches(modules)
+    return modules
+
+
+def disable_caches(modules):
+    """
+    Forces every request to do the full work: no info, generation, stage-memo
+    or precomputed-summary hits.
+    """
+    modules["fetch_info"].configure_info_cache(ttl=0)
+    modules["generation_cache"].get = lambda key: None
+    for name in ("health_analysis", "analyst_opinion", "Business_analysis", "combined_insights", "Summary"):
+        modules[name].reuse_output = lambda *args, **kwargs: None
+    for name in ("views", "portfolio_engine"):
+        modules[name].load_precomputed = lambda *args, **kwargs: None
+
+
+def instrument(modules, recorder):
+    pipeline, portfolio, views = modules["pipeline"], modules["portfolio_engine"], modules["views"]
+    recorder.wrap(modules["market_data"].MarketDataContext, "_load_history", "historical_data")
+    recorder.wrap(modules["fetch_info"], "get_info", "info_fetch")  # safe_get_info goes through it
+    for module in (pipeline, portfolio):
+        recorder.wrap(module, "run_news_sentiment", "news_sentiment")
+        recorder.wrap(module, "get_health_response", "health_analysis")
+        recorder.wrap(module, "get_opinions_response", "analyst_opinion")
+        recorder.wrap(module, "get_business_response", "business_analysis")
+        recorder.wrap(module, "summarize_stock", "stock_summary")
+    recorder.wrap(pipeline, "run_vision_stage", "vision_model")
+    recorder.wrap(pipeline, "run_stock_ai_stage", "stock_ai")
+    recorder.wrap(portfolio, "run_vision_model_analysis", "vision_model")
+    recorder.wrap(portfolio, "_stock_ai", "stock_ai")
+    recorder.wrap(portfolio, "batch_risk", "batch_risk")
+    # The single combined call of --combined-insights: pipeline reaches it through SharedInsights.
+    recorder.wrap(modules["combined_insights"], "get_combined_insights", "combined_insights")
+    recorder.wrap(portfolio, "get_combined_insights", "combined_insights")
+    recorder.wrap(views, "generate", "risk_metrics_summary")
+
+
+def make_requests(args):
+    tickers = ["AAPL", "MSFT", "NVDA"]
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def next_index():
+        with lock:
+            return next(counter)
+
+    return {
+        "comprehensive_summary": lambda: {
+            "mode": "single_stock",
+            "ticker": tickers[next_index() % len(tickers)],
+            "concurrent": args.concurrent_stages,
+            "combined_insights": args.combined_insights,
+            "reuse_context": args.reuse_context,
+        },
+        "portfolio_breakdown": lambda: {"user_id": 1, "combined_insights": args.combined_insights},
+        "summarize_risk_metrics": lambda: {"risk_metrics": {
+            "volume_text": "AAPL: average volume over the last 5 sessions was 52,310,000 vs 48,120,000 (+8.71%).",
+            "volatility_text": "AAPL: annualised volatility 27.80%, annualised return 18.20%, Sharpe ratio 0.51.",
+            "market_cap_text": "AAPL market cap: $3,424,890,126,336",
+        }},
+    }
+
+
+def run_scenario(view, make_payload, clients, total):
+    from django.test import RequestFactory
+    factory = RequestFactory()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def one():
+        request = factory.post("/", data=json.dumps(make_payload()), content_type="application/json")
+        started = time.perf_counter()
+        response = view(request)
+        if getattr(response, "streaming", False):
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for future in [pool.submit(one) for _ in range(total)]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "clients": clients,
+        "errors": len(errors),
+        "wall_s": wall,
+        "rps": total / wall if wall else 0.0,
+        "mean_s": sum(latencies) / len(latencies),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+    }
+
+
+def print_report(name, result, stages):
+    print(f"\n== {name} ({result['requests']} requests, {result['clients']} clients, {result['errors']} errors)")
+    print(f"   rps {result['rps']:.2f}   mean {result['mean_s']:.3f}s   p50 {result['p50_s']:.3f}s   "
+          f"p95 {result['p95_s']:.3f}s   p99 {result['p99_s']:.3f}s")
+    if stages:
+        print(f"   {'stage':<24}{'calls':>7}{'mean s':>10}{'p95 s':>10}{'failed':>8}")
+        for stage, row in stages.items():
+            print(f"   {stage:<24}{row['calls']:>7}{row['mean_s']:>10.3f}{row['p95_s']:>10.3f}{row['failed']:>8}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the analysis views.")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=16, help="Requests per scenario")
+    parser.add_argument("--holdings", type=int, default=10, help="Symbols in the benchmark portfolio")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="Fake Ollama seconds per token")
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--slots", type=int, default=4, help="Fake Ollama parallel slots")
+    parser.add_argument("--concurrent-stages", action="store_true", help='Send "concurrent": true')
+    parser.add_argument("--combined-insights", action="store_true", help='Send "combined_insights": true')
+    parser.add_argument("--reuse-context", action="store_true", help='Send "reuse_context": true')
+    parser.add_argument("--warm", action="store_true", help="Keep the info/generation/memo caches on")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiply the stand-in latencies (0 for pure CPU overhead)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    for key in stand_ins.LATENCY:
+        stand_ins.LATENCY[key] *= args.latency_scale
+    fixtures = ["AAPL", "MSFT", "NVDA"]
+    stand_ins.HOLDINGS[:] = (fixtures + [f"SYN{i:03d}" for i in range(args.holdings)])[:args.holdings]
+
+    modules = load_package(cold=not args.warm)
+    recorder = StageRecorder()
+    instrument(modules, recorder)
+
+    server = FakeOllamaServer(token_latency=args.token_latency, response_tokens=args.response_tokens,
+                              slots=args.slots).start()
+    modules["ollama_client"].OLLAMA_URL = server.url
+
+    payloads = make_requests(args)
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    results = {}
+    try:
+        for name in scenarios:
+            recorder.reset()
+            result = run_scenario(getattr(modules["views"], name), payloads[name], args.clients, args.requests)
+            stages = recorder.report()
+            print_report(name, result, stages)
+            results[name] = {**result, "stages": stages}
+    finally:
+        server.stop()
+
+    print(f"\nFake Ollama served {server.requests} generations")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
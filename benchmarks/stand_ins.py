@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import time
+import types
+import zlib
+
+# Network-free stand-ins for everything the views reach out to: yfinance,
+# the vision model, news scraping, the AITools risk tools and the user
+# portfolio lookup. Info dicts come from recorded fixtures; prices are a
+# deterministic random walk per symbol. Each call sleeps for a configurable
+# latency so stage timings look like production rather than zero.
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+LATENCY = {
+    "info": 0.15,  # yf.Ticker(...).info
+    "history": 0.3,  # yf.download / get_historical_data
+    "vision": 1.0,  # run_vision_model_analysis
+    "news": 0.5,  # run_news_sentiment
+    "tool": 0.1,  # each AITools .invoke
+    "portfolio": 0.05,  # fetch_updated_data
+}
+
+HOLDINGS = ["AAPL", "MSFT", "NVDA"]  # symbols fetch_updated_data returns
+
+
+def _load_json(*parts):
+    with open(os.path.join(FIXTURE_DIR, *parts)) as f:
+        return json.load(f)
+
+
+def _seed(symbol):
+    return zlib.crc32(symbol.encode("utf-8"))
+
+
+def load_info(symbol):
+    """
+    Recorded info dict for the symbol. Symbols without a fixture get a copy of
+    a recorded one with the identity fields swapped and the ratios nudged, so
+    large synthetic portfolios still produce distinct prompts.
+    """
+    symbol = symbol.upper()
+    path = os.path.join(FIXTURE_DIR, "info", f"{symbol}.json")
+    if os.path.exists(path):
+        return _load_json("info", f"{symbol}.json")
+
+    names = sorted(name[:-5] for name in os.listdir(os.path.join(FIXTURE_DIR, "info")))
+    info = _load_json("info", f"{names[_seed(symbol) % len(names)]}.json")
+    scale = 0.7 + (_seed(symbol) % 600) / 1000
+    for key, value in info.items():
+        if isinstance(value, float):
+            info[key] = round(value * scale, 4)
+    info.update({"symbol": symbol, "shortName": f"{symbol} Holdings Inc."})
+    return info
+
+
+class FakeTicker:
+    def __init__(self, symbol):
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        time.sleep(LATENCY["info"])
+        return load_info(self.ticker)
+
+
+def synthetic_history(symbol, start=None, end=None):
+    """
+    Business-day OHLCV frame following a seeded geometric random walk.
+    """
+    import numpy as np
+    import pandas as pd
+
+    index = pd.bdate_range(start or "2015-01-01", end or pd.Timestamp.today().normalize(), inclusive="left")
+    rng = np.random.default_rng(_seed(symbol))
+    # Generate from a fixed origin so overlapping ranges agree on prices.
+    origin = pd.bdate_range("2015-01-01", index[-1] if len(index) else "2015-01-02")
+    returns = rng.normal(0.0004, 0.018, len(origin))
+    close = pd.Series(100 * np.exp(np.cumsum(returns)), index=origin).reindex(index)
+    volume = pd.Series(rng.integers(5_000_000, 50_000_000, len(origin)).astype(float), index=origin).reindex(index)
+    return pd.DataFrame({
+        "Open": close * 0.998,
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Adj Close": close,
+        "Volume": volume,
+    }, index=index)
+
+
+def fake_download(symbol, start=None, end=None, **kwargs):
+    time.sleep(LATENCY["history"])
+    return synthetic_history(symbol, start, end)
+
+
+def fake_get_historical_data(ticker, start_date, end_date):
+    time.sleep(LATENCY["history"])
+    return synthetic_history(ticker, start_date, end_date)
+
+
+def fake_vision(ticker, start_date, end_date, indicators=None):
+    time.sleep(LATENCY["vision"])
+    return {"results": [{"ticker": ticker, "analysis": _load_json("vision.json"), "chart_json": "{}"}]}
+
+
+def fake_news(ticker):
+    time.sleep(LATENCY["news"])
+    return json.loads(json.dumps(_load_json("news.json")).replace("{ticker}", ticker))
+
+
+def fake_fetch_updated_data(user_id=1):
+    time.sleep(LATENCY["portfolio"])
+    return [{"symbol": symbol, "quantity": 10 + i} for i, symbol in enumerate(HOLDINGS)]
+
+
+class FakeTool:
+    """Mimics a LangChain tool's .invoke(dict) -> str."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def invoke(self, args):
+        time.sleep(LATENCY["tool"])
+        symbol = args.get("stock") or args.get("ticker") or ""
+        if self.name == "get_stock_info":
+            return f"{symbol} market cap: ${load_info(symbol).get('marketCap', 0):,.0f}"
+        return f"{self.name} for {symbol}: stand-in value"
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def install(fake_yfinance=False):
+    """
+    Registers the stand-in modules. Must run before the package's views are imported.
+
+    Args:
+        fake_yfinance (bool): Register the yfinance stand-in even when the real
+            one is installed, instead of importing it (and pandas / numpy with it)
+    """
+    tools = {name: FakeTool(name) for name in (
+        "summarize_portfolio", "sector_total", "get_total_dividends", "get_recommendations",
+        "analyse_volume_change", "get_volatility_and_sharpe", "get_monthly_performance", "get_stock_info")}
+
+    sys.modules.update({
+        "MomentumSim": _module("MomentumSim"),
+        "MomentumSim.data_fetching": _module(
+            "MomentumSim.data_fetching", get_historical_data=fake_get_historical_data,
+            fetch_multiple_historical_data=lambda *args, **kwargs: {}),
+        "ScrapeData": _module("ScrapeData"),
+        "ScrapeData.helpers": _module("ScrapeData.helpers", run_news_sentiment=fake_news),
+        "Vision": _module("Vision"),
+        "Vision.VisHelper": _module("Vision.VisHelper", run_vision_model_analysis=fake_vision),
+        "PortfolioGraphs": _module("PortfolioGraphs"),
+        "PortfolioGraphs.PortfolioAllLines": _module(
+            "PortfolioGraphs.PortfolioAllLines", get_multi_stock_graph_json=lambda *args, **kwargs: {}),
+        "API.AITools": _module("API.AITools", **tools),
+        "API.UpdateUserData": _module("API.UpdateUserData", fetch_updated_data=fake_fetch_updated_data),
+    })
+
+    fake_yf = _module("yfinance", Ticker=FakeTicker, download=fake_download)
+    if fake_yfinance:
+        sys.modules["yfinance"] = fake_yf
+        return fake_yf
+    try:
+        import yfinance  # noqa: F401  (the real one is patched per module after import)
+    except ImportError:
+        sys.modules["yfinance"] = fake_yf
+    return fake_yf
+
+
+def patch_package(package, fake_yf):
+    """
+    Points the package's own yfinance references at the stand-in.
+    """
+    for name in ("fetch_info", "price_store"):
+        module = sys.modules.get(f"{package}.{name}")
+        if module is not None:
+            module.yf = fake_yf
@@ -0,0 +1,138 @@
+import json
+import threading
+
+from .fetch_info import safe_get_info, InfoUnavailable
+from .ollama_client import generate, DEFAULT_MODEL
+from .llm_scheduler import SchedulerSaturated
+from .deadline import DeadlineExceeded
+from .stage_memo import reuse_output, remember_output
+from .prompt_packer import SHARED_NUM_CTX
+from .health_analysis import fetch_health_prompt, get_health_response, health_fingerprint
+from .analyst_opinion import fetch_opinions_prompt, get_opinions_response, opinions_fingerprint
+from .Business_analysis import fetch_business_prompt, get_business_response, business_fingerprint
+
+# Combined insights mode: the health, analyst-opinion and business prompts go
+# to the model as one JSON-mode request instead of three, so the shared info
+# is prefilled once and there is one generation instead of three. Any section
+# missing from the model's answer falls back to its own separate call.
+
+# Key in the JSON answer / llm_insights -> (prompt builder, separate-call fallback, memo fingerprint)
+INSIGHT_SECTIONS = {
+    "health_analysis": (fetch_health_prompt, get_health_response, health_fingerprint),
+    "analyst_opinion": (fetch_opinions_prompt, get_opinions_response, opinions_fingerprint),
+    "business_analysis": (fetch_business_prompt, get_business_response, business_fingerprint),
+}
+
+
+def build_combined_prompt(ticker, info, keys=tuple(INSIGHT_SECTIONS)):
+    """
+    One prompt holding each section's data block and instructions, asking for
+    a JSON object with one text answer per section.
+    """
+    tasks = "\n".join(
+        f"=== TASK \"{key}\" ===\n{INSIGHT_SECTIONS[key][0](ticker, info).strip()}\n" for key in keys
+    )
+    key_list = ", ".join(f'"{key}"' for key in keys)
+    return f"""
+You will complete {len(keys)} separate analyses of {ticker}. Each task below has its own role, data and instructions.
+
+{tasks}
+Respond with ONLY a JSON object with exactly these keys: {key_list}.
+Each value must be a single string holding the full written analysis for that task (plain text, newlines allowed).
+"""
+
+
+def parse_insights(text, keys=tuple(INSIGHT_SECTIONS)):
+    """
+    Pulls the section texts out of the model's JSON answer.
+
+    Returns:
+        dict: key -> text for every key that came back as a non-empty string;
+              empty if the answer isn't a JSON object
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {key: data[key].strip() for key in keys if isinstance(data.get(key), str) and data[key].strip()}
+
+
+def get_combined_insights(ticker, info=None, session=None):
+    """
+    The three insight sections from one structured call.
+
+    Args:
+        session (ChatSession): Ask through this chat session instead of
+            /api/generate, so the summary can continue the same conversation
+
+    Returns:
+        dict: health_analysis, analyst_opinion and business_analysis texts, the
+              same shape as calling the three get_*_response functions
+
+    Raises:
+        InfoUnavailable: There is no info for the ticker to prompt on
+    """
+    tick = info if info is not None else safe_get_info(ticker)
+    if not tick:
+        raise InfoUnavailable(f"No company info for {ticker}")
+
+    # Sections whose inputs haven't changed are reused, like in the separate calls.
+    fingerprints = {key: section_fingerprint(ticker, tick)
+                    for key, (_, _, section_fingerprint) in INSIGHT_SECTIONS.items()}
+    insights = {}
+    for key, stage_fingerprint in fingerprints.items():
+        previous = reuse_output(ticker, key, stage_fingerprint)
+        if previous is not None:
+            insights[key] = previous
+    missing = tuple(key for key in INSIGHT_SECTIONS if key not in insights)
+    if not missing:
+        return insights
+
+    prompt = build_combined_prompt(ticker, tick, missing)
+    try:
+        if session is not None:
+            # Opens the session, so it skips the generation cache (see ChatSession).
+            answer = session.ask(prompt, timeout=240, format="json")
+        else:
+            answer = generate(prompt, model=DEFAULT_MODEL, options={"num_ctx": SHARED_NUM_CTX}, timeout=240,
+                              cache=True, format="json")
+        parsed = parse_insights(answer, missing)
+        if session is not None:
+            session.covered.update(parsed)
+    except (SchedulerSaturated, DeadlineExceeded):
+        raise
+    except Exception as e:
+        print(f"Combined insights call failed for {ticker}: {e}")
+        parsed = {}
+
+    for key in missing:
+        if key in parsed:
+            insights[key] = parsed[key]
+            remember_output(ticker, key, fingerprints[key], parsed[key])
+        else:
+            print(f"Combined insights for {ticker} had no usable '{key}', falling back to a separate call")
+            insights[key] = INSIGHT_SECTIONS[key][1](ticker, tick)
+    return insights
+
+
+class SharedInsights:
+    """
+    Lets the three insight stages of one request share a single combined call:
+    whichever stage runs first makes it, the others wait for its result.
+    """
+
+    def __init__(self, ticker, info_loader, session=None):
+        self.ticker = ticker
+        self._info_loader = info_loader
+        self._session = session
+        self._lock = threading.Lock()
+        self._insights = None
+
+    def get(self, key):
+        if self._insights is None:
+            with self._lock:
+                if self._insights is None:
+                    self._insights = get_combined_insights(self.ticker, self._info_loader(), self._session)
+        return self._insights[key]
@@ -0,0 +1,65 @@
+import time
+import contextvars
+from contextlib import contextmanager
+
+# Per-request time budget. The view sets it once; stage threads started with
+# tracing.in_context inherit it, the pipeline stops waiting for stages when it
+# runs out, and every Ollama call clamps its timeout (and scheduler queueing)
+# to what is left, so a stuck stage can't push the response past the budget.
+MIN_CALL_TIMEOUT = 1.0  # seconds; never hand a backend less than this
+STAGE_BUDGET_SHARE = 0.7  # of the budget the independent stages may use; the rest is the summary's
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)  # time.monotonic() value
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work would start or continue past the request deadline."""
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Runs the enclosed block with a budget of seconds. A nested budget can only
+    shorten the current one. None leaves the current deadline as it is.
+    """
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + max(0.0, float(seconds))
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline():
+    """The current deadline as a time.monotonic() value, or None."""
+    return _deadline.get()
+
+
+def remaining():
+    """Seconds left in the current budget (0 when spent), or None without a deadline."""
+    at = _deadline.get()
+    return None if at is None else max(0.0, at - time.monotonic())
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def clamp_timeout(timeout):
+    """
+    timeout, cut down to the time left before the deadline.
+
+    Raises:
+        DeadlineExceeded: Less than MIN_CALL_TIMEOUT is left
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left < MIN_CALL_TIMEOUT:
+        raise DeadlineExceeded(f"Request deadline reached ({left:.1f}s left)")
+    return left if timeout is None else min(timeout, left)
@@ -1,27 +1,312 @@
 import time
-import yfinance as yf
+import random
+import threading
+from collections import OrderedDict
 from urllib.error import HTTPError
 
-def safe_get_info(ticker_symbol, max_retries=5, delay=1):
+from .tracing import span
+from .lazy_imports import lazy_module
+
+yf = lazy_module("yfinance")
+
+# Process-wide info cache. One summary request asks for the same ticker from
+# several prompt builders, so the first caller fetches and everyone else reuses.
+INFO_CACHE_TTL = 300  # seconds an info dict stays fresh
+INFO_CACHE_MAX_SIZE = 512  # tickers kept before the least recently used is evicted
+
+# Upstream protection. All threads share one token bucket so concurrent requests
+# can't hammer Yahoo in lockstep, and a circuit breaker fails fast while Yahoo
+# keeps erroring instead of piling up sleeping workers.
+RATE_LIMIT_PER_SEC = 2.0  # sustained upstream fetches per second
+RATE_LIMIT_BURST = 5  # fetches allowed back to back
+RATE_LIMIT_MAX_WAIT = 5.0  # seconds a caller may queue for a token before giving up
+BACKOFF_BASE = 0.5  # seconds; retry n sleeps a random time up to BACKOFF_BASE * 2**n
+BACKOFF_MAX = 8.0
+BREAKER_FAILURE_THRESHOLD = 5  # consecutive failed attempts that open the circuit
+BREAKER_COOLDOWN = 30.0  # seconds the circuit stays open before a trial fetch
+BREAKER_TRIAL_TIMEOUT = 60.0  # seconds a half-open trial may take before another caller gets to try
+
+_cache = OrderedDict()  # ticker -> (fetched_at, info)
+_in_flight = {}  # ticker -> _Flight
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "shared_waits": 0}
+
+
+class InfoFetchError(Exception):
+    """Raised when an info dict couldn't be fetched (as opposed to being empty)."""
+
+
+class CircuitOpenError(InfoFetchError):
+    """Raised without touching upstream while the circuit breaker is open."""
+
+
+class InfoUnavailable(InfoFetchError):
+    """Raised by an LLM stage that has no info to prompt on, instead of prompting on N/A data."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """
+        Takes one token, waiting up to timeout seconds. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after a run of consecutive failures, fails fast for the cooldown,
+    then lets a single trial call through (half-open) to decide whether to close.
+    A trial that never reports back (record_success / record_failure) stops
+    blocking others after trial_timeout, when the next caller becomes the trial.
+    """
+
+    def __init__(self, failure_threshold, cooldown, trial_timeout=BREAKER_TRIAL_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.trial_timeout = trial_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if (self.state == "open" and now - self._opened_at >= self.cooldown) or \
+                    (self.state == "half_open" and now - self._trial_started >= self.trial_timeout):
+                self.state = "half_open"
+                self._trial_started = now
+                return True  # this caller is the trial
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"⚠️ Opening yfinance circuit breaker for {self.cooldown}s")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+_rate_limiter = TokenBucket(RATE_LIMIT_PER_SEC, RATE_LIMIT_BURST)
+_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN)
+
+
+def upstream_status():
+    """
+    Returns the circuit breaker state and remaining rate-limit tokens.
+    """
+    return {"circuit": _breaker.state, "rate_limit_tokens": round(_rate_limiter._tokens, 2)}
+
+
+class _Flight:
+    """A fetch in progress that concurrent callers for the same ticker wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.info = {}
+        self.error = None
+
+
+def configure_info_cache(ttl=None, max_size=None):
+    """
+    Adjust the info cache TTL (seconds) and/or maximum number of tickers.
+    """
+    global INFO_CACHE_TTL, INFO_CACHE_MAX_SIZE
+    with _cache_lock:
+        if ttl is not None:
+            INFO_CACHE_TTL = ttl
+        if max_size is not None:
+            INFO_CACHE_MAX_SIZE = max_size
+            _evict_overflow()
+
+
+def configure_rate_limit(rate=None, burst=None, max_wait=None):
+    """
+    Adjust the upstream rate limit (fetches per second, back-to-back burst)
+    and/or how long a caller may queue for it.
+    """
+    global _rate_limiter, RATE_LIMIT_MAX_WAIT
+    if rate is not None or burst is not None:
+        _rate_limiter = TokenBucket(rate or _rate_limiter.rate, burst or _rate_limiter.burst)
+    if max_wait is not None:
+        RATE_LIMIT_MAX_WAIT = max_wait
+
+
+def clear_info_cache():
+    """
+    Drop every cached info dict and reset the counters.
+    """
+    with _cache_lock:
+        _cache.clear()
+        for key in _cache_stats:
+            _cache_stats[key] = 0
+
+
+def info_cache_stats():
+    """
+    Returns hit/miss/eviction counters plus the current cache size.
+    """
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["size"] = len(_cache)
+        stats["max_size"] = INFO_CACHE_MAX_SIZE
+        stats["ttl"] = INFO_CACHE_TTL
+    return stats
+
+
+def _evict_overflow():
+    # Caller holds _cache_lock.
+    while len(_cache) > INFO_CACHE_MAX_SIZE:
+        _cache.popitem(last=False)
+        _cache_stats["evictions"] += 1
+
+
+def safe_get_info(ticker_symbol, max_retries=5, delay=BACKOFF_BASE, use_cache=True):
     """
     Retry-safe yfinance info fetch that handles HTTP 401 errors.
+
+    Results are served from the process-wide info cache when fresh. Concurrent
+    callers asking for the same ticker share a single upstream fetch. Each caller
+    gets its own (shallow) copy, so adding fields can't leak into the cache.
+    Returns {}
+    both when the ticker has no info and when fetching failed; use get_info()
+    to tell the two apart. Stages that prompt on the info raise InfoUnavailable
+    for {} rather than spend a generation on it.
     """
+    try:
+        return get_info(ticker_symbol, max_retries=max_retries, delay=delay, use_cache=use_cache)
+    except InfoFetchError as e:
+        print(f"❌ Failed to fetch data for {ticker_symbol}: {e}")
+        return {}
+
+
+def get_info(ticker_symbol, max_retries=5, delay=BACKOFF_BASE, use_cache=True):
+    """
+    Like safe_get_info, but failures raise instead of coming back empty.
+
+    Returns:
+        dict: The info dict; {} means upstream answered with no data
+
+    Raises:
+        CircuitOpenError: Upstream is considered unhealthy, nothing was fetched
+        InfoFetchError: Every attempt failed or the rate limiter was saturated
+    """
+    if not use_cache:
+        return _fetch_info(ticker_symbol, max_retries, delay)
+
+    key = ticker_symbol.upper()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] < INFO_CACHE_TTL:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return dict(entry[1])
+
+        flight = _in_flight.get(key)
+        if flight is None:
+            flight = _Flight()
+            _in_flight[key] = flight
+            owner = True
+            _cache_stats["misses"] += 1
+        else:
+            owner = False
+            _cache_stats["shared_waits"] += 1
+
+    if not owner:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return dict(flight.info)
+
+    try:
+        flight.info = _fetch_info(ticker_symbol, max_retries, delay)
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _cache_lock:
+            # Errors aren't cached; an empty answer is, so unknown tickers
+            # don't go back upstream on every request.
+            if flight.error is None:
+                _cache[key] = (time.monotonic(), flight.info)
+                _cache.move_to_end(key)
+                _evict_overflow()
+            del _in_flight[key]
+        flight.done.set()
+
+    return dict(flight.info)
+
+
+def _is_retryable(error):
+    if isinstance(error, HTTPError):
+        return error.code in (401, 429) or error.code >= 500
+    return True
+
+
+def _fetch_info(ticker_symbol, max_retries, delay):
+    with span("yfinance_info", kind="upstream", ticker=ticker_symbol) as call:
+        return _fetch_info_attempts(ticker_symbol, max_retries, delay, call)
+
+
+def _fetch_info_attempts(ticker_symbol, max_retries, delay, call):
+    last_error = None
     for attempt in range(max_retries):
+        call.set(attempts=attempt + 1)
+        # Take the rate-limit token first: once allow() has made this call the
+        # half-open trial, every way out below has to report success or failure.
+        if not _rate_limiter.acquire(timeout=RATE_LIMIT_MAX_WAIT):
+            raise InfoFetchError(f"yfinance rate limit saturated, gave up on {ticker_symbol}")
+        if not _breaker.allow():
+            raise CircuitOpenError(f"yfinance circuit open, not fetching {ticker_symbol}")
+
         try:
             tick = yf.Ticker(ticker_symbol)
             info = tick.info
-            if info:  # Ensure we got valid data
-                return info
-        except HTTPError as e:
-            if "401" in str(e):
-                print(f"[Retry {attempt+1}] HTTP 401 error for {ticker_symbol}, retrying...")
-                time.sleep(delay)
-                continue
-            else:
-                raise
         except Exception as e:
-            print(f"[Retry {attempt+1}] Unexpected error: {e}, retrying...")
-            time.sleep(delay)
+            if not _is_retryable(e):
+                _breaker.record_success()  # upstream answered, just not with data
+                raise InfoFetchError(f"{ticker_symbol}: {e}") from e
+            _breaker.record_failure()
+            last_error = e
+            if attempt + 1 < max_retries:
+                sleep = random.uniform(0, min(BACKOFF_MAX, delay * 2 ** attempt))
+                print(f"[Retry {attempt+1}] Error for {ticker_symbol}: {e}, retrying in {sleep:.2f}s...")
+                time.sleep(sleep)
+            continue
+
+        _breaker.record_success()
+        return info or {}
 
-    print(f"❌ Failed to fetch data for {ticker_symbol} after {max_retries} retries.")
-    return {}
+    raise InfoFetchError(f"{ticker_symbol}: failed after {max_retries} attempts: {last_error}")
@@ -0,0 +1,124 @@
+import json
+import time
+import hashlib
+import threading
+from .local_db import connect
+
+# Disk-backed cache of Ollama generations, keyed by a hash of model, options and
+# prompt. The prompt builders are deterministic for a given info dict, so a
+# repeated request for the same ticker can skip the GPU entirely.
+GENERATION_CACHE_FILE = "generation_cache.sqlite3"
+GENERATION_CACHE_TTL = 24 * 3600  # seconds before an entry is regenerated
+GENERATION_CACHE_MAX_ENTRIES = 5000  # least recently used entries are evicted past this
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    body TEXT NOT NULL,
+    gen_seconds REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS generations_last_used ON generations (last_used);
+"""
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "seconds_saved": 0.0}
+
+
+def _db():
+    return connect(GENERATION_CACHE_FILE, _SCHEMA)
+
+
+def _bump(**counts):
+    with _stats_lock:
+        for name, value in counts.items():
+            _stats[name] += value
+
+
+def normalize_model(model):
+    """'qwen2.5' and 'qwen2.5:latest' are the same model to Ollama."""
+    return model if ":" in model else model + ":latest"
+
+
+def cache_key(model, options, prompt, **extra):
+    """
+    Content hash of everything that affects the generated text.
+    """
+    material = {
+        "model": normalize_model(model),
+        "options": options or {},
+        "prompt": prompt,
+        "extra": extra,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def get(key):
+    """
+    Returns the cached Ollama response body for key, or None on a miss.
+    """
+    now = time.time()
+    row = _db().execute(
+        "SELECT body, gen_seconds, created_at FROM generations WHERE key = ?", (key,)
+    ).fetchone()
+
+    if row is None or now - row[2] > GENERATION_CACHE_TTL:
+        _bump(misses=1)
+        return None
+
+    _db().execute("UPDATE generations SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+    _bump(hits=1, seconds_saved=row[1])
+    return json.loads(row[0])
+
+
+def put(key, model, body, gen_seconds):
+    """
+    Stores an Ollama response body and evicts expired / least recently used entries.
+    """
+    now = time.time()
+    conn = _db()
+    conn.execute(
+        "INSERT OR REPLACE INTO generations (key, model, body, gen_seconds, created_at, last_used, hits) "
+        "VALUES (?, ?, ?, ?, ?, ?, 0)",
+        (key, normalize_model(model), json.dumps(body), gen_seconds, now, now),
+    )
+    evicted = conn.execute("DELETE FROM generations WHERE created_at < ?", (now - GENERATION_CACHE_TTL,)).rowcount
+    overflow = conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0] - GENERATION_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        evicted += conn.execute(
+            "DELETE FROM generations WHERE key IN "
+            "(SELECT key FROM generations ORDER BY last_used LIMIT ?)", (overflow,)
+        ).rowcount
+    if evicted:
+        _bump(evictions=evicted)
+
+
+def clear():
+    """
+    Empties the cache and resets the counters.
+    """
+    _db().execute("DELETE FROM generations")
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def generation_cache_stats():
+    """
+    Returns this process's hit/miss counters, hit rate and GPU seconds saved,
+    plus the entry count and lifetime seconds saved recorded on disk.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+
+    entries, lifetime_saved = _db().execute(
+        "SELECT COUNT(*), COALESCE(SUM(hits * gen_seconds), 0) FROM generations"
+    ).fetchone()
+    stats["entries"] = entries
+    stats["lifetime_seconds_saved"] = lifetime_saved
+    return stats
@@ -1,13 +1,49 @@
-import yfinance as yf
-import pandas as pd
-import datetime as dt
-import requests 
-import json
-from .fetch_info import safe_get_info
-
-def fetch_health_prompt(ticker):
+from .fetch_info import safe_get_info, InfoUnavailable
+from .ollama_client import generate, DEFAULT_MODEL
+from .prompt_packer import SHARED_NUM_CTX
+from .llm_scheduler import SchedulerSaturated
+from .deadline import DeadlineExceeded
+from .stage_memo import fingerprint, fields_fingerprint, reuse_output, remember_output
+from .peer_table import peer_context, PEER_FIELDS
+
+# Every info field fetch_health_prompt reads; the output is regenerated only when one changes.
+HEALTH_FIELDS = (
+    "profitMargins",
+    "grossMargins",
+    "returnOnAssets",
+    "earningsGrowth",
+    "revenueGrowth",
+    "enterpriseToRevenue",
+    "totalDebt",
+    "debtToEquity",
+    "totalRevenue",
+    "marketCap",
+    "heldPercentInsiders",
+    "heldPercentInstitutions",
+    "trailingPE",
+    "forwardPE",
+    "priceToBook",
+    "currentRatio",
+    "quickRatio",
+    "freeCashflow",
+    "operatingCashflow",
+)
+
+# Fields compared against the ticker's industry / sector peers in the prompt.
+HEALTH_PEER_FIELDS = tuple(field for field in HEALTH_FIELDS if field in PEER_FIELDS)
+
+
+def health_fingerprint(ticker, tick):
+    """
+    Fingerprint of everything the health prompt reads: its info fields and the peer context.
+    """
+    return fingerprint({"fields": fields_fingerprint(tick, HEALTH_FIELDS),
+                        "peers": peer_context(ticker, HEALTH_PEER_FIELDS)})
+
+def fetch_health_prompt(ticker, info=None):
     
-    tick = safe_get_info(ticker)
+    # Callers that already hold the info dict (e.g. a MarketDataContext) pass it in.
+    tick = info if info is not None else safe_get_info(ticker)
 
     #profitablity 
     profit_margin = tick.get('profitMargins', 'N/A')
@@ -51,6 +87,9 @@ def fetch_health_prompt(ticker):
     Insiders = tick.get("heldPercentInsiders", "N/A")
     Institutions = tick.get("heldPercentInstitutions", "N/A")
 
+    # Peers - percentiles / z-scores from the fundamentals table, when it has the ticker
+    peers = peer_context(ticker, HEALTH_PEER_FIELDS) or "No peer data available."
+
     health_prompt = f"""
 You are a accountant tasked with evaluating the financial health of {ticker} based on its stock data.
 
@@ -91,12 +130,16 @@ Ownership Metrics:
 - Insider Holdings: {Insiders}
 - Institutional Holdings: {Institutions}
 
+Peer Comparison:
+{peers}
+
 Based on the metrics given above, provide a detailed and structured analysis of {ticker}'s financial health.
 
 Please highlight:
 1. Key strengths and weaknesses 
 2. Areas of risk or concern (e.g., liquidity, high debt)
 3. Overall outlook (positive/neutral/negative)
+4. How it compares with its peers, using only the peer figures given (if any)
     """
 
 
@@ -104,24 +147,28 @@ Please highlight:
 
     return health_prompt
 
-def get_health_response(ticker) -> str: 
+def get_health_response(ticker, info=None) -> str: 
         
+    tick = info if info is not None else safe_get_info(ticker)
+    if not tick:
+        # Rate limited, circuit open or no data: a prompt of N/A fields isn't worth a generation.
+        raise InfoUnavailable(f"No company info for {ticker}")
+
+    # Reuse the last output while the fields this prompt reads are unchanged.
+    stage_fingerprint = health_fingerprint(ticker, tick)
+    previous = reuse_output(ticker, "health_analysis", stage_fingerprint)
+    if previous is not None:
+        return previous
+
     try: 
         # Call Ollama API
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "qwen2.5:latest",  # or your favorite model
-                    "prompt": fetch_health_prompt(ticker),
-                    "stream": False,
-                    "num_ctx": 32000  # Adjust context size as needed
-
-                },
-                timeout=120
-            )
-            summary = response.json().get("response", "").strip()
+            summary = generate(fetch_health_prompt(ticker, tick), model=DEFAULT_MODEL, options={"num_ctx": SHARED_NUM_CTX},
+                               timeout=120, cache=True)
+            remember_output(ticker, "health_analysis", stage_fingerprint, summary)
             return summary
 
+    except (SchedulerSaturated, DeadlineExceeded):
+        raise  # the view answers 503 / the stage degrades, instead of a placeholder text
     except Exception as e:
         print(f"Error calling Ollama API: {e}")
         summary = "Failed to generate summary due to an error."
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .local_db import connect
+from .pipeline import run_single_stock, SINGLE_STOCK_STAGES
+from .deadline import deadline
+
+# Submit/poll jobs for comprehensive_summary. Jobs live in a local SQLite table
+# and run on an in-process worker pool, so no external broker is needed and any
+# worker process can answer a status poll.
+JOBS_FILE = "jobs.sqlite3"
+JOB_WORKERS = 4  # summaries running at once per process
+JOB_RETENTION = 24 * 3600  # seconds finished jobs are kept for polling
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stages TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    pid INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_pool = None
+_pool_lock = threading.Lock()
+_stage_lock = threading.Lock()  # stage updates are read-modify-write
+
+
+def _db():
+    return connect(JOBS_FILE, _SCHEMA)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="summary-job")
+    return _pool
+
+
+def _update(job_id, **fields):
+    fields["updated_at"] = time.time()
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    _db().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _set_stage(job_id, stage, status):
+    with _stage_lock:
+        row = _db().execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        stages = json.loads(row[0])
+        stages[stage] = status
+        _update(job_id, stages=json.dumps(stages))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _purge_expired():
+    _db().execute(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+        (time.time() - JOB_RETENTION,)
+    )
+
+
+def submit_summary_job(meta, ticker, start_date, end_date, concurrent=True, combined_insights=False,
+                       reuse_context=False, budget=None):
+    """
+    Queues a single-stock summary and returns its job id straight away.
+
+    Args:
+        meta (dict): Request fields (mode, user_id, dates) copied into the result
+        budget (float): Seconds the pipeline may run once a worker picks the job up
+            (time spent queued doesn't count); late stages come back stale or skipped
+    """
+    _purge_expired()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    stages = {stage: "pending" for stage in SINGLE_STOCK_STAGES}
+    _db().execute(
+        "INSERT INTO jobs (id, kind, status, stages, pid, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (job_id, "single_stock", "queued", json.dumps(stages), os.getpid(), now, now)
+    )
+    _get_pool().submit(_run_summary_job, job_id, meta, ticker, start_date, end_date, concurrent, combined_insights,
+                      reuse_context, budget)
+    return job_id
+
+
+def _run_summary_job(job_id, meta, ticker, start_date, end_date, concurrent, combined_insights, reuse_context,
+                     budget):
+    _update(job_id, status="running")
+    try:
+        results = dict(meta)
+        with deadline(budget):
+            results.update(run_single_stock(
+                ticker, start_date, end_date, concurrent=concurrent, combined_insights=combined_insights,
+                reuse_context=reuse_context, on_stage=lambda stage, status: _set_stage(job_id, stage, status)
+            ))
+        results["timestamp"] = datetime.now(timezone.utc).isoformat()
+        _update(job_id, status="done", result=json.dumps(results, default=str))
+    except Exception as e:
+        traceback.print_exc()
+        _update(job_id, status="failed", error=str(e))
+
+
+def get_job(job_id):
+    """
+    Returns the job's status, per-stage progress and (once done) the results
+    dict, or None for an unknown / expired job id.
+    """
+    row = _db().execute(
+        "SELECT id, kind, status, stages, result, error, pid, created_at, updated_at FROM jobs WHERE id = ?",
+        (job_id,)
+    ).fetchone()
+    if row is None:
+        return None
+
+    job_id, kind, status, stages, result, error, pid, created_at, updated_at = row
+    if status in ("queued", "running") and not _pid_alive(pid):
+        # The worker process that owned it died (restart, OOM); it won't finish.
+        status, error = "failed", "Worker process exited before the job finished"
+        _update(job_id, status=status, error=error)
+
+    stages = json.loads(stages)
+    job = {
+        "job_id": job_id,
+        "kind": kind,
+        "status": status,
+        "stages": stages,
+        "progress": sum(1 for value in stages.values() if value == "done") / len(stages),
+        "created_at": datetime.fromtimestamp(created_at, timezone.utc).isoformat(),
+        "updated_at": datetime.fromtimestamp(updated_at, timezone.utc).isoformat(),
+    }
+    if result is not None:
+        job["results"] = json.loads(result)
+    if error is not None:
+        job["error"] = error
+    return job
@@ -0,0 +1,92 @@
+import time
+import importlib
+import threading
+
+# Heavy third-party libraries (pandas, numpy, yfinance) and the sibling apps
+# (vision model, news scraping, AITools, portfolio data) are bound through
+# these proxies instead of being imported at module load, so starting a
+# worker doesn't pay for any of them until a request needs one. A proxy sits
+# under the usual module-level name and resolves on first attribute access or
+# call, so code uses it (and tests / benchmarks patch it) exactly like the real
+# object. Workers that should be warm before their first request call
+# preload(), e.g. from gunicorn's config:
+#
+#     def post_worker_init(worker):
+#         from API.lazy_imports import preload
+#         preload()
+
+_registry = []  # every proxy created, for preload()
+_lock = threading.Lock()
+
+
+class LazyImport:
+    """
+    Stand-in for a module (attribute=None) or one of its attributes.
+    """
+
+    def __init__(self, module, attribute=None):
+        self._module = module
+        self._attribute = attribute
+        self._target = None
+        self._resolved = False
+
+    def _resolve(self):
+        if not self._resolved:
+            with _lock:
+                if not self._resolved:
+                    target = importlib.import_module(self._module)
+                    if self._attribute is not None:
+                        target = getattr(target, self._attribute)
+                    self._target = target
+                    self._resolved = True
+        return self._target
+
+    def __getattr__(self, name):
+        # Only reached for names the proxy itself doesn't have, e.g. yf.Ticker.
+        if name in ("_module", "_attribute", "_target", "_resolved"):  # not initialised (copy / pickle)
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        name = self._module if self._attribute is None else f"{self._module}.{self._attribute}"
+        return f"<lazy {name}{'' if self._resolved else ' (not loaded)'}>"
+
+
+def lazy_module(module):
+    """Proxy for `import module`."""
+    proxy = LazyImport(module)
+    _registry.append(proxy)
+    return proxy
+
+
+def lazy_from(module, attribute):
+    """Proxy for `from module import attribute`."""
+    proxy = LazyImport(module, attribute)
+    _registry.append(proxy)
+    return proxy
+
+
+def preload():
+    """
+    Resolves every lazy import registered so far. Modules that fail to import
+    are reported and left lazy, so the error surfaces on first use instead.
+
+    Returns:
+        dict: "module" or "module.attribute" -> seconds taken (None if it failed)
+    """
+    timings = {}
+    for proxy in list(_registry):
+        name = proxy._module if proxy._attribute is None else f"{proxy._module}.{proxy._attribute}"
+        if proxy._resolved:
+            continue
+        started = time.perf_counter()
+        try:
+            proxy._resolve()
+            timings[name] = time.perf_counter() - started
+        except Exception as e:
+            print(f"Preloading {name} failed: {e}")
+            timings[name] = None
+    return timings
@@ -0,0 +1,234 @@
+import math
+import time
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from .prompt_packer import estimate_tokens, OUTPUT_TOKENS
+
+# Every Ollama generation in the process goes through one scheduler. At most
+# SLOTS generations run at once (match OLLAMA_NUM_PARALLEL on the server);
+# the rest queue by priority class. Interactive requests are served first and
+# always have RESERVED_INTERACTIVE_SLOTS that batch work can't take, so a
+# portfolio run can't starve a user waiting on a summary. The reservation never
+# takes the last slot, so with a single slot (the OLLAMA_NUM_PARALLEL=1 default)
+# batch work still runs and only the queue order favours users. Waiters age upwards
+# so batch work still finishes under steady interactive load. When a queue is
+# full, or the estimated wait is longer than the class allows, callers get
+# SchedulerSaturated straight away instead of timing out 120s later.
+SLOTS = 4
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}  # lower is served first
+DEFAULT_PRIORITY = "interactive"
+RESERVED_INTERACTIVE_SLOTS = 1
+MAX_QUEUE_DEPTH = {"interactive": 16, "batch": 64, "background": 256}  # waiters per class
+MAX_QUEUED_TOKENS = 400_000  # estimated prompt + output tokens waiting, all classes
+MAX_WAIT = {"interactive": 30, "batch": 600, "background": 1800}  # seconds a waiter may queue
+AGING_SECONDS = 60  # a waiter moves up one class for every AGING_SECONDS queued
+INITIAL_GENERATION_SECONDS = 10.0  # guess for wait estimates until calls are measured
+RETRY_AFTER_MAX = 120
+
+_priority = contextvars.ContextVar("llm_priority", default=DEFAULT_PRIORITY)
+
+
+class SchedulerSaturated(Exception):
+    """
+    Raised when a generation is refused or waited too long for a slot.
+
+    Attributes:
+        retry_after (int): Suggested seconds before trying again
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    def __init__(self, priority, tokens, seq):
+        self.priority = priority
+        self.tokens = tokens
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.started = None
+        self.granted = threading.Event()
+
+    @property
+    def waited(self):
+        return (self.started or time.monotonic()) - self.enqueued
+
+    def rank(self, now):
+        return PRIORITIES[self.priority] - (now - self.enqueued) / AGING_SECONDS, self.seq
+
+
+class LLMScheduler:
+    def __init__(self, slots=SLOTS):
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._running = {name: 0 for name in PRIORITIES}
+        self._queued_tokens = 0
+        self._seq = itertools.count()
+        self._avg_seconds = INITIAL_GENERATION_SECONDS
+        self._stats = {"admitted": 0, "rejected": 0, "timed_out": 0}
+
+    def _free_slots(self, priority):
+        running = sum(self._running.values())
+        reserved = 0 if priority == "interactive" else min(RESERVED_INTERACTIVE_SLOTS, self.slots - 1)
+        return max(0, self.slots - reserved - running)
+
+    def _estimated_wait(self, ahead):
+        # Caller holds _lock. Each slot works through the queue ahead in turn.
+        return self._avg_seconds * (ahead + 1) / self.slots
+
+    def _retry_after(self, ahead):
+        return max(1, min(RETRY_AFTER_MAX, math.ceil(self._estimated_wait(ahead))))
+
+    def _ahead_of(self, priority):
+        return sum(1 for t in self._waiting if PRIORITIES[t.priority] <= PRIORITIES[priority])
+
+    def _check_admission(self, priority, tokens):
+        # Caller holds _lock.
+        depth = sum(1 for t in self._waiting if t.priority == priority)
+        ahead = self._ahead_of(priority)
+        reason = None
+        if depth >= MAX_QUEUE_DEPTH[priority]:
+            reason = f"{depth} {priority} generations already queued"
+        elif self._waiting and self._queued_tokens + tokens > MAX_QUEUED_TOKENS:
+            reason = f"~{self._queued_tokens} tokens already queued"
+        elif ahead and self._estimated_wait(ahead) > MAX_WAIT[priority]:
+            reason = f"estimated wait {self._estimated_wait(ahead):.0f}s exceeds {MAX_WAIT[priority]}s"
+        if reason is not None:
+            self._stats["rejected"] += 1
+            raise SchedulerSaturated(f"LLM scheduler saturated: {reason}", self._retry_after(ahead))
+
+    def _dispatch(self):
+        # Caller holds _lock. Hand free slots to the best-ranked eligible waiters.
+        now = time.monotonic()
+        for ticket in sorted(self._waiting, key=lambda t: t.rank(now)):
+            if self._free_slots(ticket.priority) <= 0:
+                if sum(self._running.values()) >= self.slots:
+                    break
+                continue  # only the reserved slot is free; keep looking for interactive work
+            self._waiting.remove(ticket)
+            self._queued_tokens -= ticket.tokens
+            self._start(ticket)
+
+    def _start(self, ticket):
+        ticket.started = time.monotonic()
+        self._running[ticket.priority] += 1
+        self._stats["admitted"] += 1
+        ticket.granted.set()
+
+    def admit(self, priority=None):
+        """
+        Raises SchedulerSaturated if a new request of this class would be
+        refused right now. Views call this before starting any work.
+        """
+        priority = priority or current_priority()
+        with self._lock:
+            self._check_admission(priority, 0)
+
+    def acquire(self, tokens, priority=None, timeout=None):
+        """
+        Waits for a generation slot.
+
+        Args:
+            tokens (int): Estimated prompt + output tokens of the generation
+            priority (str): One of PRIORITIES; defaults to the current context's
+            timeout (float): Max seconds to queue; capped by MAX_WAIT for the class
+
+        Returns:
+            Ticket: Pass it to release() when the generation is done
+        """
+        priority = priority or current_priority()
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority {priority!r}")
+        ticket = Ticket(priority, tokens, next(self._seq))
+
+        with self._lock:
+            if not self._waiting and self._free_slots(priority) > 0:
+                self._start(ticket)
+                return ticket
+            self._check_admission(priority, tokens)
+            self._waiting.append(ticket)
+            self._queued_tokens += tokens
+            ahead = self._ahead_of(priority)
+            self._dispatch()  # e.g. the reserved slot is free and this is interactive
+
+        wait = MAX_WAIT[priority] if timeout is None else min(timeout, MAX_WAIT[priority])
+        if ticket.granted.wait(wait):
+            return ticket
+
+        with self._lock:
+            if ticket.granted.is_set():  # granted while we were timing out
+                return ticket
+            self._waiting.remove(ticket)
+            self._queued_tokens -= tokens
+            self._stats["timed_out"] += 1
+        raise SchedulerSaturated(f"No LLM slot within {wait:.0f}s ({priority})", self._retry_after(ahead))
+
+    def release(self, ticket):
+        with self._lock:
+            self._running[ticket.priority] -= 1
+            seconds = time.monotonic() - ticket.started
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * seconds
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, tokens, priority=None, timeout=None):
+        ticket = self.acquire(tokens, priority=priority, timeout=timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "running": dict(self._running),
+                "queued": {name: sum(1 for t in self._waiting if t.priority == name) for name in PRIORITIES},
+                "queued_tokens": self._queued_tokens,
+                "avg_generation_seconds": round(self._avg_seconds, 3),
+                **self._stats,
+            }
+
+
+scheduler = LLMScheduler()
+
+
+def estimate_generation_tokens(prompt, options=None):
+    """Prompt tokens plus the answer budget (num_predict when set)."""
+    num_predict = (options or {}).get("num_predict")
+    return estimate_tokens(prompt) + (num_predict if num_predict and num_predict > 0 else OUTPUT_TOKENS)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextmanager
+def priority(name):
+    """
+    Runs the enclosed block (and stage threads started with
+    tracing.in_context) at the given priority class.
+    """
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority {name!r}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def configure_scheduler(slots):
+    """Changes the concurrency limit, e.g. to match OLLAMA_NUM_PARALLEL."""
+    with scheduler._lock:
+        scheduler.slots = slots
+        scheduler._dispatch()
+
+
+def scheduler_stats():
+    return scheduler.stats()
@@ -0,0 +1,80 @@
+import threading
+
+from .ollama_client import chat_raw, chat_stream, DEFAULT_MODEL
+from .prompt_packer import estimate_tokens, SHARED_NUM_CTX
+
+# A chat session carries one ticker's conversation from the insight call to
+# the final summary over /api/chat. Ollama keeps the KV cache of a slot's last
+# conversation, so when the summary request repeats the earlier turns verbatim
+# only the new message is prefilled instead of the insight texts all over
+# again. That only holds while model, num_ctx and the earlier messages are
+# byte-for-byte the same, hence one fixed num_ctx for the whole session
+# (the shared size every other call uses, so the loaded model instance is shared).
+SESSION_NUM_CTX = SHARED_NUM_CTX
+
+
+class ChatSession:
+    """
+    Message history for one ticker's insight and summary calls.
+
+    The turn that opens a session always goes to Ollama, whatever cache says:
+    a generation-cache hit would never reach the model, so the next turn would
+    find no KV prefix to reuse and prefill the whole history after all.
+
+    Attributes:
+        covered (set): Insight sections whose text is already in the history
+        turns (list): Per call: prompt_eval_count, prompt_eval_duration (ns) and
+                      the estimated tokens of the full history sent, to show
+                      how much prefill the cached prefix saved
+    """
+
+    def __init__(self, ticker, model=DEFAULT_MODEL, num_ctx=SESSION_NUM_CTX):
+        self.ticker = ticker
+        self.model = model
+        self.options = {"num_ctx": num_ctx}
+        self.messages = []
+        self.covered = set()
+        self.turns = []
+        self._lock = threading.Lock()  # one turn at a time; turns build on each other
+
+    @property
+    def history_tokens(self):
+        return sum(estimate_tokens(message["content"]) for message in self.messages)
+
+    def _record(self, messages, body):
+        self.turns.append({
+            "prompt_eval_count": body.get("prompt_eval_count"),
+            "prompt_eval_duration": body.get("prompt_eval_duration"),
+            "history_tokens": sum(estimate_tokens(message["content"]) for message in messages),
+        })
+
+    def ask(self, content, timeout=240, cache=False, **extra):
+        """
+        Sends content as the next user message and appends the answer to the history.
+        cache only applies to later turns; the opening turn always reaches Ollama.
+
+        Returns:
+            str: The assistant's reply text
+        """
+        with self._lock:
+            messages = self.messages + [{"role": "user", "content": content}]
+            body = chat_raw(messages, model=self.model, options=self.options, timeout=timeout,
+                            cache=cache and bool(self.messages), **extra)
+            answer = (body.get("message") or {}).get("content", "")
+            self._record(messages, body)
+            self.messages = messages + [{"role": "assistant", "content": answer}]
+            return answer.strip()
+
+    def ask_stream(self, content, timeout=240, cache=False, **extra):
+        """
+        Streaming ask(); yields text chunks and appends the full answer once done.
+        """
+        with self._lock:
+            messages = self.messages + [{"role": "user", "content": content}]
+            finished = []
+            yield from chat_stream(messages, model=self.model, options=self.options, timeout=timeout,
+                                   cache=cache and bool(self.messages), on_done=finished.append, **extra)
+            if finished:
+                self._record(messages, finished[0])
+                answer = (finished[0].get("message") or {}).get("content", "")
+                self.messages = messages + [{"role": "assistant", "content": answer}]
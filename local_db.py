@@ -0,0 +1,33 @@
+import os
+import sqlite3
+import threading
+
+# Directory for the package's local SQLite files (generation cache and friends).
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+_local = threading.local()
+
+
+def connect(filename, schema=None):
+    """
+    Returns this thread's connection to DATA_DIR/filename, opening it on first use
+    and running the optional schema script once per connection.
+
+    Connections run in autocommit mode with WAL journaling so several workers
+    can read while one writes.
+    """
+    path = os.path.join(DATA_DIR, filename)
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if schema:
+            conn.executescript(schema)
+        conns[path] = conn
+    return conn
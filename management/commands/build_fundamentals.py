@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from ...precompute import rank_held_symbols
+from ...fetch_info import configure_rate_limit
+from ...peer_table import (build_fundamentals_table, FUNDAMENTALS_MAX_AGE, REFRESH_WORKERS, BUILD_RATE_PER_SEC,
+                           BUILD_MAX_WAIT)
+
+
+class Command(BaseCommand):
+    help = "Build or refresh the fundamentals table used for sector / industry peer comparison."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--symbols", nargs="*",
+                            help="Ticker universe (default: every symbol held in a portfolio)")
+        parser.add_argument("--symbols-file",
+                            help="File with one ticker per line, added to --symbols")
+        parser.add_argument("--user-ids", nargs="*", type=int,
+                            help="Portfolios to take held symbols from (default: every user)")
+        parser.add_argument("--max-age", type=int, default=FUNDAMENTALS_MAX_AGE,
+                            help="Seconds a row stays fresh; fresher rows aren't refetched")
+        parser.add_argument("--workers", type=int, default=REFRESH_WORKERS)
+        parser.add_argument("--rate", type=float, default=BUILD_RATE_PER_SEC,
+                            help="Upstream info fetches per second for this build")
+
+    def handle(self, *args, **options):
+        symbols = list(options["symbols"] or [])
+        if options["symbols_file"]:
+            with open(options["symbols_file"]) as f:
+                symbols += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        if not symbols:
+            user_ids = options["user_ids"] or list(get_user_model().objects.values_list("id", flat=True))
+            symbols = [symbol for symbol, _ in rank_held_symbols(user_ids)]
+        self.stdout.write(f"{len(symbols)} symbols in the universe")
+
+        # This process's limiter is the build's own: no requests to share it with, and
+        # fetches queue for it as long as the build takes instead of failing after seconds.
+        configure_rate_limit(rate=options["rate"], burst=max(1, round(options["rate"])), max_wait=BUILD_MAX_WAIT)
+        report = build_fundamentals_table(symbols, max_age=options["max_age"], workers=options["workers"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Table has {report['rows']} rows: fetched {report['fetched']}, reused {report['reused']}, "
+            f"failed {report['failed']} in {report['elapsed']:.0f}s"
+        ))
+        for symbol, error in report["failed_symbols"].items():
+            self.stderr.write(f"{symbol}: {error}")
@@ -0,0 +1,32 @@
+from datetime import datetime
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from ...precompute import rank_held_symbols, precompute_summaries, PRECOMPUTE_WINDOW, PRECOMPUTE_CONCURRENCY
+
+
+class Command(BaseCommand):
+    help = "Precompute single-stock summaries for every held ticker, most widely held first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user-ids", nargs="*", type=int,
+                            help="Portfolios to scan (default: every user)")
+        parser.add_argument("--start-date", default="2022-01-01")
+        parser.add_argument("--end-date", default=datetime.now().strftime("%Y-%m-%d"))
+        parser.add_argument("--window", type=int, default=PRECOMPUTE_WINDOW,
+                            help="Seconds after which no new symbols are started")
+        parser.add_argument("--concurrency", type=int, default=PRECOMPUTE_CONCURRENCY)
+        parser.add_argument("--limit", type=int, help="Only the N most widely held symbols")
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"] or list(get_user_model().objects.values_list("id", flat=True))
+        ranked = rank_held_symbols(user_ids)
+        symbols = [symbol for symbol, _ in ranked][:options["limit"]]
+        self.stdout.write(f"{len(symbols)} held symbols across {len(user_ids)} portfolios")
+
+        report = precompute_summaries(symbols, options["start_date"], options["end_date"],
+                                      window=options["window"], concurrency=options["concurrency"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {len(report['done'])}, failed: {len(report['failed'])}, "
+            f"skipped: {len(report['skipped'])} in {report['elapsed']:.0f}s"
+        ))
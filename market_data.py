@@ -0,0 +1,102 @@
+import threading
+
+from .fetch_info import safe_get_info
+from .price_store import load_history
+from .risk_engine import compute_risk_metrics, format_volatility_sharpe
+from .lazy_imports import lazy_module, lazy_from
+
+pd = lazy_module("pandas")
+get_historical_data = lazy_from("MomentumSim.data_fetching", "get_historical_data")
+
+
+class MarketDataContext:
+    """
+    Request-scoped market data for one ticker.
+
+    OHLCV history and the info dict are loaded lazily, at most once, and then
+    shared by every stage of the request, including stages running on other
+    threads.
+    """
+
+    def __init__(self, ticker, start_date, end_date):
+        self.ticker = ticker
+        self.start_date = start_date
+        self.end_date = end_date
+        self._values = {}
+        self._locks = {"history": threading.Lock(), "info": threading.Lock()}
+
+    def _load(self, name, loader):
+        if name not in self._values:
+            with self._locks[name]:
+                if name not in self._values:
+                    self._values[name] = loader()
+        return self._values[name]
+
+    @property
+    def history(self):
+        """OHLCV DataFrame for start_date..end_date (single-level columns)."""
+        return self._load("history", self._load_history)
+
+    def _load_history(self):
+        # The local price store only goes upstream for dates it doesn't have.
+        try:
+            return load_history(self.ticker, self.start_date, self.end_date)
+        except Exception as e:
+            print(f"Price store read failed for {self.ticker}: {e}, downloading directly")
+            return _flatten_columns(get_historical_data(self.ticker, self.start_date, self.end_date))
+
+    @property
+    def info(self):
+        """yfinance info dict ({} if unavailable)."""
+        return self._load("info", lambda: safe_get_info(self.ticker))
+
+    def closes(self):
+        """Close price series, or None if the history has no usable prices."""
+        df = self.history
+        if df is None or getattr(df, "empty", True):
+            return None
+        for column in ("Adj Close", "Close"):
+            if column in df.columns:
+                series = df[column].dropna()
+                return series if len(series) > 1 else None
+        return None
+
+
+def _flatten_columns(df):
+    # yf.download returns (field, ticker) MultiIndex columns for some versions.
+    if isinstance(df, pd.DataFrame) and isinstance(df.columns, pd.MultiIndex):
+        df = df.copy(deep=False)
+        df.columns = df.columns.get_level_values(0)
+    return df
+
+
+def volatility_sharpe_text(context):
+    """
+    Annualised volatility and Sharpe ratio computed from the shared history.
+
+    Returns:
+        str: Risk text for the prompt, or None if the history is unusable
+    """
+    closes = context.closes()
+    if closes is None:
+        return None
+
+    row = compute_risk_metrics(closes.to_frame(context.ticker)).iloc[0]
+    return format_volatility_sharpe(context.ticker, row, context.start_date, context.end_date)
+
+
+def format_market_cap(ticker, info):
+    """
+    Market cap line from an info dict, or None if it isn't there.
+    """
+    market_cap = info.get("marketCap")
+    if not isinstance(market_cap, (int, float)):
+        return None
+    return f"{ticker} market cap: ${market_cap:,.0f}"
+
+
+def market_cap_text(context):
+    """
+    Market cap line from the shared info dict, or None if it isn't there.
+    """
+    return format_market_cap(context.ticker, context.info)
@@ -0,0 +1,390 @@
+import os
+import json
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from . import generation_cache
+from .tracing import span, begin_span
+from .llm_scheduler import scheduler, estimate_generation_tokens, SchedulerSaturated
+from .deadline import remaining, expired, clamp_timeout, DeadlineExceeded, MIN_CALL_TIMEOUT
+from .ollama_pool import OllamaPool
+from .prompt_packer import SHARED_NUM_CTX
+
+OLLAMA_URL = "http://localhost:11434"
+
+# Comma-separated Ollama hosts to spread generations over; OLLAMA_URL alone when unset.
+# Raise llm_scheduler.SLOTS (configure_scheduler) to the pool's total parallel slots.
+OLLAMA_NODES = [url.strip() for url in os.environ.get("OLLAMA_NODES", "").split(",") if url.strip()]
+DEFAULT_MODEL = "qwen2.5:latest"
+
+# Sent with every request unless the caller overrides a key. num_ctx has to live
+# under "options"; at the top level Ollama ignores it and uses its own default.
+# Callers keep to the shared size (see prompt_packer) so the runner isn't reloaded.
+DEFAULT_OPTIONS = {"num_ctx": SHARED_NUM_CTX}
+
+# How long Ollama keeps the model in memory after a call, so back-to-back
+# requests don't pay for a model reload.
+DEFAULT_KEEP_ALIVE = "30m"
+
+POOL_SIZE = 16  # keep-alive connections held open to the Ollama server
+MAX_RETRIES = 2  # extra attempts on connection errors / transient statuses
+RETRY_BACKOFF = 0.5  # seconds, doubled per attempt
+TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+_pool = None
+
+
+class OllamaError(Exception):
+    """Raised when Ollama returns an error or can't be reached."""
+
+
+def get_session():
+    """
+    Returns the shared requests.Session with a keep-alive connection pool.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_pool():
+    """
+    Returns the OllamaPool over OLLAMA_NODES (or just OLLAMA_URL).
+    """
+    global _pool
+    if _pool is None:
+        with _session_lock:
+            if _pool is None:
+                _pool = OllamaPool(OLLAMA_NODES or [OLLAMA_URL],
+                                   get=lambda url, timeout: get_session().get(url, timeout=timeout))
+    return _pool
+
+
+def configure_nodes(urls):
+    """
+    Replaces the pool with one over the given base URLs.
+    """
+    global _pool
+    with _session_lock:
+        if _pool is not None:
+            _pool.stop()
+        _pool = OllamaPool(list(urls), get=lambda url, timeout: get_session().get(url, timeout=timeout))
+
+
+def ollama_pool_status():
+    return get_pool().status()
+
+
+def build_payload(prompt, model=DEFAULT_MODEL, options=None, keep_alive=None, stream=False, **extra):
+    """
+    Builds an /api/generate body with DEFAULT_OPTIONS merged under "options".
+    """
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": stream,
+        "options": {**DEFAULT_OPTIONS, **(options or {})},
+        "keep_alive": DEFAULT_KEEP_ALIVE if keep_alive is None else keep_alive,
+    }
+    payload.update(extra)
+    return payload
+
+
+def post(path, payload, timeout=120, retries=MAX_RETRIES, stream=False):
+    """
+    POSTs to the least busy Ollama node that has the model, retrying on
+    connection errors and transient HTTP statuses. A retry goes to another
+    node when there is one and only backs off once every node was tried.
+    Read timeouts are not retried since the model was most likely busy
+    generating.
+
+    With stream=True the node stays counted as busy until the caller passes
+    the response to release_stream().
+
+    Returns:
+        requests.Response: A successful response
+    """
+    pool = get_pool()
+    model = payload.get("model", DEFAULT_MODEL)
+    tried = []
+    for attempt in range(retries + 1):
+        node = pool.acquire(model, exclude=tried)
+        try:
+            response = get_session().post(node.url + path, json=payload, timeout=timeout, stream=stream)
+        except requests.ConnectionError as e:
+            pool.release(node, ok=False)
+            tried.append(node)
+            if attempt < retries:
+                print(f"[Ollama retry {attempt+1}] Connection error on {node.url}: {e}")
+                if len(set(tried)) >= len(pool.nodes):
+                    time.sleep(RETRY_BACKOFF * (2 ** attempt))
+                continue
+            raise OllamaError(f"Could not reach Ollama at {node.url}: {e}") from e
+        except BaseException:
+            pool.release(node, ok=None)
+            raise
+
+        if response.status_code in TRANSIENT_STATUS and attempt < retries:
+            print(f"[Ollama retry {attempt+1}] HTTP {response.status_code} from {node.url}")
+            response.close()
+            pool.release(node, ok=None if response.status_code == 429 else False)
+            tried.append(node)
+            if len(set(tried)) >= len(pool.nodes):
+                time.sleep(RETRY_BACKOFF * (2 ** attempt))
+            continue
+        if response.status_code != 200:
+            pool.release(node, ok=None if response.status_code < 500 else False)
+            try:
+                detail = response.json().get("error", response.text)
+            except ValueError:
+                detail = response.text
+            raise OllamaError(f"Ollama at {node.url} returned HTTP {response.status_code}: {detail}")
+
+        if stream:
+            response.ollama_node = node
+        else:
+            pool.release(node, model=model)
+        return response
+
+
+def release_stream(response, ok=True):
+    """Marks the node behind a streamed response from post() as free again."""
+    node = getattr(response, "ollama_node", None)
+    if node is not None:
+        response.ollama_node = None
+        get_pool().release(node, ok=ok, model=None)
+
+
+def _cache_get(key):
+    try:
+        return generation_cache.get(key)
+    except Exception as e:
+        print(f"Generation cache lookup failed: {e}")
+        return None
+
+
+def _cache_put(key, model, body, gen_seconds):
+    try:
+        generation_cache.put(key, model, body, gen_seconds)
+    except Exception as e:
+        print(f"Generation cache write failed: {e}")
+
+
+def _response_text(body):
+    # /api/generate answers in "response", /api/chat in "message.content".
+    if "message" in body:
+        return (body.get("message") or {}).get("content", "")
+    return body.get("response", "")
+
+
+def _acquire_slot(key_text, options):
+    # Queue no longer than the request deadline allows.
+    try:
+        return scheduler.acquire(estimate_generation_tokens(key_text, options), timeout=remaining())
+    except SchedulerSaturated:
+        if expired():
+            raise DeadlineExceeded("Request deadline reached while queued for an LLM slot") from None
+        raise
+
+
+def _past_deadline(call_timeout, timeout):
+    # A timeout that clamp_timeout cut down to the deadline firing means the
+    # request ran out of time, not that Ollama failed.
+    left = remaining()
+    return left is not None and left < MIN_CALL_TIMEOUT and (timeout is None or call_timeout < timeout)
+
+
+def _complete(path, payload, key_text, timeout, retries, cache, extra):
+    """
+    One non-streaming call through the generation cache, the LLM scheduler
+    and a tracing span. Returns Ollama's full JSON body.
+    """
+    model = payload["model"]
+    with span(path.rsplit("/", 1)[-1], kind="ollama", model=model) as call:
+        key = None
+        if cache:
+            key = generation_cache.cache_key(model, payload["options"], key_text, **extra)
+            body = _cache_get(key)
+            if body is not None:
+                call.set(cached=True)
+                return body
+
+        # Generations queue in the scheduler; cache hits above never need a slot.
+        ticket = _acquire_slot(key_text, payload["options"])
+        try:
+            call.set(priority=ticket.priority, queue_wait_s=round(ticket.waited, 4))
+            started = time.monotonic()
+            call_timeout = clamp_timeout(timeout)
+            body = post(path, payload, timeout=call_timeout, retries=retries).json()
+        except requests.Timeout as e:
+            if _past_deadline(call_timeout, timeout):
+                raise DeadlineExceeded("Request deadline reached waiting for Ollama") from e
+            raise
+        finally:
+            scheduler.release(ticket)
+        call.record_ollama(body)
+        if key and _response_text(body):
+            gen_seconds = body.get("total_duration", 0) / 1e9 or time.monotonic() - started
+            _cache_put(key, model, body, gen_seconds)
+        return body
+
+
+def _stream(path, payload, key_text, timeout, retries, cache, extra, on_done=None):
+    """
+    Streaming counterpart of _complete; yields text chunks. on_done, if
+    given, receives the final body (with the full text) once the stream ends.
+    """
+    model = payload["model"]
+    # The span can't be a with block: the caller consumes this generator.
+    call = begin_span(path.rsplit("/", 1)[-1] + "_stream", kind="ollama", model=model)
+    key = None
+    if cache:
+        key = generation_cache.cache_key(model, payload["options"], key_text, **extra)
+        body = _cache_get(key)
+        if body is not None:
+            call.set(cached=True)
+            call.finish()
+            if on_done is not None:
+                on_done(body)
+            yield _response_text(body)
+            return
+
+    parts = []
+    ticket = None
+    response = None
+    call_timeout = timeout
+    try:
+        ticket = _acquire_slot(key_text, payload["options"])
+        call.set(priority=ticket.priority, queue_wait_s=round(ticket.waited, 4))
+        started = time.monotonic()
+        call_timeout = clamp_timeout(timeout)
+        response = post(path, payload, timeout=call_timeout, retries=retries, stream=True)
+        call.set(node=response.ollama_node.url)
+        with response:
+            for line in response.iter_lines():
+                if expired():  # the read timeout only bounds the gap between chunks
+                    raise DeadlineExceeded("Request deadline reached mid-stream")
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise OllamaError(chunk["error"])
+                text = _response_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield text
+                if chunk.get("done"):
+                    call.record_ollama(chunk)
+                    body = dict(chunk)
+                    if "message" in chunk:
+                        body["message"] = {**chunk["message"], "content": "".join(parts)}
+                    else:
+                        body["response"] = "".join(parts)
+                    if key and parts:
+                        gen_seconds = chunk.get("total_duration", 0) / 1e9 or time.monotonic() - started
+                        _cache_put(key, model, body, gen_seconds)
+                    if on_done is not None:
+                        on_done(body)
+                    break
+    except Exception as e:
+        call.finish(error=e)
+        if response is not None:
+            release_stream(response, ok=None)
+        # requests reports a read timeout between chunks as a ConnectionError.
+        if isinstance(e, (requests.Timeout, requests.ConnectionError)) and _past_deadline(call_timeout, timeout):
+            raise DeadlineExceeded("Request deadline reached waiting for Ollama") from e
+        raise
+    finally:
+        if response is not None:
+            release_stream(response)
+        if ticket is not None:
+            scheduler.release(ticket)
+        call.finish()
+
+
+def generate_raw(prompt, model=DEFAULT_MODEL, options=None, timeout=120, keep_alive=None,
+                 retries=MAX_RETRIES, cache=False, **extra):
+    """
+    Calls /api/generate (non-streaming) and returns Ollama's full JSON body,
+    including the eval counts and durations. With cache=True an identical
+    earlier generation is served from the generation cache.
+    """
+    payload = build_payload(prompt, model=model, options=options, keep_alive=keep_alive, **extra)
+    return _complete("/api/generate", payload, prompt, timeout, retries, cache, extra)
+
+
+def generate(prompt, model=DEFAULT_MODEL, options=None, timeout=120, keep_alive=None,
+             retries=MAX_RETRIES, cache=False, **extra):
+    """
+    Calls /api/generate and returns the stripped response text.
+
+    Args:
+        prompt (str): Prompt text
+        model (str): Ollama model name
+        options (dict): Overrides merged over DEFAULT_OPTIONS (num_ctx, temperature, ...)
+        timeout (float): Per-call timeout in seconds
+        keep_alive (str|int): How long Ollama keeps the model loaded afterwards
+        cache (bool): Serve/store the result through the generation cache
+
+    Returns:
+        str: Generated text
+    """
+    body = generate_raw(prompt, model=model, options=options, timeout=timeout,
+                        keep_alive=keep_alive, retries=retries, cache=cache, **extra)
+    return body.get("response", "").strip()
+
+
+def generate_stream(prompt, model=DEFAULT_MODEL, options=None, timeout=120, keep_alive=None,
+                    retries=MAX_RETRIES, cache=False, **extra):
+    """
+    Calls /api/generate with streaming on and yields text chunks as Ollama
+    produces them. Retries only cover opening the stream. With cache=True a
+    cached generation is yielded in one piece and a finished stream is stored.
+    """
+    payload = build_payload(prompt, model=model, options=options, keep_alive=keep_alive, stream=True, **extra)
+    yield from _stream("/api/generate", payload, prompt, timeout, retries, cache, extra)
+
+
+def build_chat_payload(messages, model=DEFAULT_MODEL, options=None, keep_alive=None, stream=False, **extra):
+    """
+    Builds an /api/chat body; same defaults as build_payload.
+    """
+    payload = build_payload("", model=model, options=options, keep_alive=keep_alive, stream=stream, **extra)
+    del payload["prompt"]
+    payload["messages"] = messages
+    return payload
+
+
+def _chat_key_text(messages):
+    return json.dumps(messages, sort_keys=True)
+
+
+def chat_raw(messages, model=DEFAULT_MODEL, options=None, timeout=120, keep_alive=None,
+             retries=MAX_RETRIES, cache=False, **extra):
+    """
+    Calls /api/chat (non-streaming) with a message history and returns
+    Ollama's full JSON body. Ollama keeps the evaluated prefix of a
+    conversation cached, so a follow-up message only prefills what is new.
+    """
+    payload = build_chat_payload(messages, model=model, options=options, keep_alive=keep_alive, **extra)
+    return _complete("/api/chat", payload, _chat_key_text(messages), timeout, retries, cache, {"chat": True, **extra})
+
+
+def chat_stream(messages, model=DEFAULT_MODEL, options=None, timeout=120, keep_alive=None,
+                retries=MAX_RETRIES, cache=False, on_done=None, **extra):
+    """
+    Streaming /api/chat; yields text chunks. on_done receives the final body.
+    """
+    payload = build_chat_payload(messages, model=model, options=options, keep_alive=keep_alive, stream=True, **extra)
+    yield from _stream("/api/chat", payload, _chat_key_text(messages), timeout, retries, cache,
+                       {"chat": True, **extra}, on_done)
@@ -0,0 +1,177 @@
+import time
+import random
+import threading
+
+# Routing across several Ollama hosts. Each request goes to the healthy node
+# with the fewest requests outstanding from this process, preferring nodes that
+# already have the model loaded (/api/ps), then nodes that have it pulled
+# (/api/tags). A background probe refreshes both lists every PROBE_INTERVAL.
+# A node that fails EJECT_AFTER_FAILURES times in a row (connection errors,
+# 5xx, failed probes) is ejected for EJECT_SECONDS and only gets traffic again
+# once a probe succeeds or the ejection runs out.
+PROBE_INTERVAL = 15  # seconds between health / model probes
+PROBE_TIMEOUT = 2  # seconds per probe request
+EJECT_AFTER_FAILURES = 3
+EJECT_SECONDS = 30
+
+
+def _normalize_model(model):
+    return model if ":" in model else model + ":latest"
+
+
+class Node:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.failures = 0  # consecutive
+        self.ejected_until = 0.0
+        self.loaded = set()  # models in memory (/api/ps)
+        self.available = set()  # models pulled (/api/tags)
+        self.probed_at = None
+        self.requests = 0
+
+    @property
+    def ejected(self):
+        return time.monotonic() < self.ejected_until
+
+    def status(self):
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "healthy": not self.ejected,
+            "consecutive_failures": self.failures,
+            "ejected_for": max(0.0, round(self.ejected_until - time.monotonic(), 1)),
+            "loaded_models": sorted(self.loaded),
+            "available_models": sorted(self.available),
+            "requests": self.requests,
+        }
+
+
+class OllamaPool:
+    """
+    Args:
+        urls (list): Base URLs of the Ollama hosts
+        get (callable): get(url, timeout) -> requests.Response, used for probes
+    """
+
+    def __init__(self, urls, get):
+        if not urls:
+            raise ValueError("OllamaPool needs at least one node URL")
+        self.nodes = [Node(url) for url in urls]
+        self._get = get
+        self._lock = threading.Lock()
+        self._prober = None
+        self._stopped = threading.Event()
+
+    def acquire(self, model, exclude=()):
+        """
+        Picks a node for a request and counts it as outstanding there.
+        Ejected nodes are only used when every node is ejected.
+
+        Returns:
+            Node: Pass it to release() once the response has been read
+        """
+        self._start_prober()
+        model = _normalize_model(model)
+        with self._lock:
+            candidates = [node for node in self.nodes if node not in exclude] or list(self.nodes)
+            healthy = [node for node in candidates if not node.ejected]
+            if healthy:
+                loaded = [node for node in healthy if model in node.loaded]
+                pulled = [node for node in healthy if model in node.available]
+                # Nodes never probed successfully may still have the model; they rank with "pulled".
+                unknown = [node for node in healthy if node.probed_at is None]
+                pick_from = loaded or (pulled + unknown) or healthy
+                fewest = min(node.outstanding for node in pick_from)
+                node = random.choice([node for node in pick_from if node.outstanding == fewest])
+            else:
+                node = min(candidates, key=lambda n: n.ejected_until)
+            node.outstanding += 1
+            node.requests += 1
+            return node
+
+    def release(self, node, ok=True, model=None):
+        """
+        Ends a request on node. ok=False counts towards ejection; ok=True
+        resets the failure count and records the model as loaded there;
+        ok=None (e.g. a read timeout on a busy node) does neither.
+        """
+        with self._lock:
+            node.outstanding -= 1
+            if ok:
+                node.failures = 0
+                if model:
+                    node.loaded.add(_normalize_model(model))
+            elif ok is False:
+                self._record_failure(node)
+
+    def _record_failure(self, node):
+        # Caller holds _lock.
+        node.failures += 1
+        if node.failures >= EJECT_AFTER_FAILURES and not node.ejected:
+            node.ejected_until = time.monotonic() + EJECT_SECONDS
+            print(f"Ollama node {node.url} ejected for {EJECT_SECONDS}s after {node.failures} failures")
+
+    def probe(self, node):
+        """
+        Refreshes a node's loaded / available models. A successful probe
+        readmits an ejected node.
+        """
+        try:
+            loaded = self._get(node.url + "/api/ps", timeout=PROBE_TIMEOUT)
+            available = self._get(node.url + "/api/tags", timeout=PROBE_TIMEOUT)
+            if loaded.status_code != 200 or available.status_code != 200:
+                raise RuntimeError(f"HTTP {loaded.status_code}/{available.status_code}")
+            loaded_models = {_normalize_model(m.get("name") or m.get("model", "")) for m in loaded.json().get("models", [])}
+            available_models = {_normalize_model(m.get("name") or m.get("model", "")) for m in available.json().get("models", [])}
+        except Exception as e:
+            with self._lock:
+                self._record_failure(node)
+            print(f"Ollama node {node.url} probe failed: {e}")
+            return False
+
+        with self._lock:
+            node.loaded = loaded_models
+            node.available = available_models
+            node.probed_at = time.monotonic()
+            node.failures = 0
+            node.ejected_until = 0.0
+        return True
+
+    def probe_all(self):
+        for node in self.nodes:
+            self.probe(node)
+
+    def _start_prober(self):
+        if self._prober is None:
+            with self._lock:
+                if self._prober is None:
+                    self._prober = threading.Thread(target=self._probe_loop, name="ollama-probe", daemon=True)
+                    self._prober.start()
+
+    def _probe_loop(self):
+        while not self._stopped.is_set():
+            self.probe_all()
+            self._stopped.wait(PROBE_INTERVAL)
+
+    def stop(self):
+        self._stopped.set()
+
+    def status(self):
+        with self._lock:
+            return [node.status() for node in self.nodes]
+
+    def render_metrics(self):
+        """Per-node gauges in Prometheus text format."""
+        lines = [
+            "# HELP analyst_ollama_node_outstanding Requests in flight per Ollama node.",
+            "# TYPE analyst_ollama_node_outstanding gauge",
+        ]
+        statuses = self.status()
+        lines += [f'analyst_ollama_node_outstanding{{node="{s["url"]}"}} {s["outstanding"]}' for s in statuses]
+        lines += [
+            "# HELP analyst_ollama_node_healthy 1 unless the node is ejected.",
+            "# TYPE analyst_ollama_node_healthy gauge",
+        ]
+        lines += [f'analyst_ollama_node_healthy{{node="{s["url"]}"}} {int(s["healthy"])}' for s in statuses]
+        return "\n".join(lines) + "\n"
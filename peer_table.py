@@ -0,0 +1,293 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import local_db
+from .fetch_info import get_info, InfoFetchError, BREAKER_COOLDOWN
+from .lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+# Columnar fundamentals table for peer comparison: one row per ticker, one
+# float64 column per field, stored as a single .npz under DATA_DIR and replaced
+# atomically on refresh. Sector / industry percentiles and z-scores for every
+# row are computed in one vectorised pass when the table is loaded, after which
+# a ticker's peer context is a dict lookup plus an array row.
+FUNDAMENTALS_FILE = "fundamentals.npz"
+FUNDAMENTALS_MAX_AGE = 7 * 24 * 3600  # seconds before a row is refetched on refresh
+REFRESH_WORKERS = 8  # concurrent info fetches (the shared rate limiter still applies)
+BUILD_RATE_PER_SEC = 2.0  # upstream fetches per second for the build command's own limiter
+BUILD_MAX_WAIT = 3600.0  # seconds a build fetch may queue for the limiter; waiting beats failing offline
+RETRY_PASSES = 2  # further passes over the symbols whose fetch failed
+RETRY_PAUSE = BREAKER_COOLDOWN  # seconds before a retry pass, so an open circuit can close again
+MIN_PEERS = 5  # smallest industry used as the peer group; smaller ones fall back to the sector
+
+# Numeric info fields the health and analyst-opinion prompts read.
+PEER_FIELDS = (
+    "profitMargins",
+    "grossMargins",
+    "returnOnAssets",
+    "earningsGrowth",
+    "revenueGrowth",
+    "enterpriseToRevenue",
+    "debtToEquity",
+    "trailingPE",
+    "forwardPE",
+    "priceToBook",
+    "currentRatio",
+    "quickRatio",
+    "trailingPegRatio",
+    "recommendationMean",
+)
+
+# Further numeric fields stored per row (after PEER_FIELDS) for portfolio digests;
+# they get no peer statistics.
+PROFILE_FIELDS = (
+    "marketCap",
+    "currentPrice",
+    "dividendRate",
+    "dividendYield",
+    "fiftyTwoWeekChange",
+)
+TABLE_FIELDS = PEER_FIELDS + PROFILE_FIELDS
+
+_table = None
+_table_mtime = None
+_table_lock = threading.Lock()
+
+
+def _path():
+    return os.path.join(local_db.DATA_DIR, FUNDAMENTALS_FILE)
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+class PeerTable:
+    """
+    In-memory fundamentals table with peer statistics precomputed for every row.
+
+    Each row's peer group is its industry when that has at least MIN_PEERS
+    members, otherwise its sector.
+    """
+
+    def __init__(self, tickers, sectors, industries, values, fetched_at):
+        self.tickers = np.asarray(tickers, dtype=str)
+        self.sectors = np.asarray(sectors, dtype=str)
+        self.industries = np.asarray(industries, dtype=str)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.tickers), len(TABLE_FIELDS))
+        self.fetched_at = np.asarray(fetched_at, dtype=np.float64)
+        self._index = {ticker: row for row, ticker in enumerate(self.tickers)}
+        self._compute_peer_stats()
+
+    def _compute_peer_stats(self):
+        frame = pd.DataFrame(self.values[:, :len(PEER_FIELDS)], columns=PEER_FIELDS)
+        industry_size = pd.Series(self.industries).map(pd.Series(self.industries).value_counts()).to_numpy()
+        use_industry = (self.industries != "") & (industry_size >= MIN_PEERS)
+        groups = np.where(use_industry, np.char.add("industry:", self.industries), np.char.add("sector:", self.sectors))
+
+        grouped = frame.groupby(groups)
+        mean = grouped.transform("mean")
+        std = grouped.transform("std").replace(0, np.nan)
+        self.percentile = grouped.rank(pct=True).to_numpy()
+        self.zscore = ((frame - mean) / std).to_numpy()
+        self.median = grouped.transform("median").to_numpy()
+        self.peer_count = grouped.transform("count").to_numpy()  # rows with a value, per field
+        self.group = groups
+        self.group_size = pd.Series(groups).map(pd.Series(groups).value_counts()).to_numpy()
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker.upper() in self._index
+
+    def lookup(self, ticker):
+        """
+        Returns:
+            dict: group (industry or sector name), group_kind, group_size and
+                  per-field value / percentile / zscore / median / peers, or
+                  None if the ticker isn't in the table
+        """
+        row = self._index.get(ticker.upper())
+        if row is None:
+            return None
+        kind, _, name = self.group[row].partition(":")
+        fields = {}
+        for col, field in enumerate(PEER_FIELDS):
+            if np.isnan(self.values[row, col]):
+                continue
+            fields[field] = {
+                "value": float(self.values[row, col]),
+                "percentile": float(self.percentile[row, col]),
+                "zscore": None if np.isnan(self.zscore[row, col]) else float(self.zscore[row, col]),
+                "median": float(self.median[row, col]),
+                "peers": int(self.peer_count[row, col]),
+            }
+        return {"group": name, "group_kind": kind, "group_size": int(self.group_size[row]), "fields": fields}
+
+    def fundamentals(self, ticker):
+        """
+        Returns:
+            dict: sector, industry and every TABLE_FIELDS value the row has,
+                  or None if the ticker isn't in the table
+        """
+        row = self._index.get(ticker.upper())
+        if row is None:
+            return None
+        facts = {"sector": str(self.sectors[row]), "industry": str(self.industries[row])}
+        for col, field in enumerate(TABLE_FIELDS):
+            if not np.isnan(self.values[row, col]):
+                facts[field] = float(self.values[row, col])
+        return facts
+
+
+def get_peer_table():
+    """
+    The current table, reloaded when the file on disk changes. None if no
+    table has been built yet.
+    """
+    global _table, _table_mtime
+    try:
+        mtime = os.path.getmtime(_path())
+    except OSError:
+        return None
+    if mtime != _table_mtime:
+        with _table_lock:
+            if mtime != _table_mtime:
+                with np.load(_path()) as data:
+                    if tuple(data["fields"]) != TABLE_FIELDS:
+                        # Remembered for this mtime, so it's reported once rather than on every call.
+                        print("Fundamentals table was built with other fields; rebuild it")
+                        _table = None
+                    else:
+                        _table = PeerTable(data["tickers"], data["sectors"], data["industries"],
+                                           data["values"], data["fetched_at"])
+                _table_mtime = mtime
+    return _table
+
+
+def _write_table(tickers, sectors, industries, values, fetched_at):
+    os.makedirs(local_db.DATA_DIR, exist_ok=True)
+    tmp = _path() + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, tickers=np.asarray(tickers, dtype=str), sectors=np.asarray(sectors, dtype=str),
+                 industries=np.asarray(industries, dtype=str), values=np.asarray(values, dtype=np.float64),
+                 fetched_at=np.asarray(fetched_at, dtype=np.float64), fields=np.asarray(TABLE_FIELDS))
+    os.replace(tmp, _path())
+
+
+def _fetch(symbol):
+    # (info, None) or (None, error message). Skips the info cache, which a
+    # build would only fill with entries requests don't need.
+    try:
+        return get_info(symbol, use_cache=False), None
+    except InfoFetchError as e:
+        return None, str(e)
+
+
+def build_fundamentals_table(symbols, max_age=FUNDAMENTALS_MAX_AGE, workers=REFRESH_WORKERS):
+    """
+    Builds or refreshes the table for a ticker universe. Rows fetched less
+    than max_age seconds ago are kept as they are; only the rest go upstream.
+    Fetches that fail are retried for RETRY_PASSES more passes; symbols still
+    failing keep their old row if they had one and are reported.
+
+    Fetches share fetch_info's process-wide rate limiter with any request
+    handling in the same process. The build_fundamentals command runs in a
+    process of its own and sets that limiter up for the build.
+
+    Returns:
+        dict: rows, fetched, reused and failed counts, failed_symbols
+              (symbol -> last error) plus elapsed seconds
+    """
+    started = time.monotonic()
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    existing = get_peer_table()
+    now = time.time()
+
+    rows = {}
+    stale = []
+    for symbol in symbols:
+        row = existing._index.get(symbol) if existing is not None else None
+        if row is not None and now - existing.fetched_at[row] < max_age:
+            rows[symbol] = (existing.sectors[row], existing.industries[row], existing.values[row], existing.fetched_at[row])
+        else:
+            stale.append(symbol)
+
+    errors = {}
+    pending = stale
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for attempt in range(RETRY_PASSES + 1):
+            if attempt:
+                print(f"Retrying {len(pending)} failed fundamentals fetches in {RETRY_PAUSE:.0f}s")
+                time.sleep(RETRY_PAUSE)
+            for symbol, (info, error) in zip(pending, pool.map(_fetch, pending)):
+                if error is not None:
+                    errors[symbol] = error
+                    continue
+                errors.pop(symbol, None)
+                if info:  # an empty answer has nothing to tabulate
+                    rows[symbol] = (info.get("sector") or "", info.get("industry") or "",
+                                    [_number(info.get(field)) for field in TABLE_FIELDS], now)
+            pending = list(errors)
+            if not pending:
+                break
+
+    for symbol in stale:
+        previous = existing._index.get(symbol) if existing is not None and symbol not in rows else None
+        if previous is not None:  # failed or empty: keep the old row rather than losing the ticker
+            rows[symbol] = (existing.sectors[previous], existing.industries[previous],
+                            existing.values[previous], existing.fetched_at[previous])
+
+    ordered = [symbol for symbol in symbols if symbol in rows]
+    _write_table(
+        ordered,
+        [rows[symbol][0] for symbol in ordered],
+        [rows[symbol][1] for symbol in ordered],
+        np.array([rows[symbol][2] for symbol in ordered], dtype=np.float64).reshape(len(ordered), len(TABLE_FIELDS)),
+        [rows[symbol][3] for symbol in ordered],
+    )
+    return {
+        "rows": len(ordered),
+        "fetched": len(stale) - len(errors),
+        "reused": len(symbols) - len(stale),
+        "failed": len(errors),
+        "failed_symbols": errors,
+        "elapsed": time.monotonic() - started,
+    }
+
+
+def _format_value(value):
+    return f"{value:,.0f}" if abs(value) >= 1000 else f"{value:.3g}"
+
+
+def peer_context(ticker, fields):
+    """
+    Prompt-ready peer comparison for the given fields, e.g.
+    "- trailingPE: 31.2 (percentile 78, z +0.90, peer median 24.1)".
+
+    Returns:
+        str: The block, or "" when the ticker has no table row or peer group
+    """
+    table = get_peer_table()
+    entry = table.lookup(ticker) if table is not None else None
+    if entry is None or not entry["group"] or entry["group_size"] < 2:
+        return ""
+
+    lines = []
+    for field in fields:
+        stats = entry["fields"].get(field)
+        if stats is None or stats["peers"] < 2:
+            continue
+        zscore = "n/a" if stats["zscore"] is None else f"{stats['zscore']:+.2f}"
+        lines.append(
+            f"- {field}: {_format_value(stats['value'])} (percentile {stats['percentile'] * 100:.0f}, "
+            f"z {zscore}, peer median {_format_value(stats['median'])})"
+        )
+    if not lines:
+        return ""
+    return f"Compared with the {entry['group_size']} companies in the {entry['group']} {entry['group_kind']}:\n" + "\n".join(lines)
@@ -0,0 +1,339 @@
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from .Summary import summarize_stock, summarize_stock_stream
+from .health_analysis import get_health_response
+from .analyst_opinion import get_opinions_response
+from .Business_analysis import get_business_response
+from .combined_insights import SharedInsights
+from .llm_session import ChatSession
+from .market_data import MarketDataContext, volatility_sharpe_text, market_cap_text
+from .stage_memo import last_output
+from .summary_store import load_precomputed
+from .fetch_info import InfoUnavailable
+from .deadline import deadline, current_deadline, remaining, DeadlineExceeded, STAGE_BUDGET_SHARE
+from .tracing import traced, in_context
+from .lazy_imports import lazy_from
+
+get_volatility_and_sharpe = lazy_from("API.AITools", "get_volatility_and_sharpe")
+get_stock_info = lazy_from("API.AITools", "get_stock_info")
+run_news_sentiment = lazy_from("ScrapeData.helpers", "run_news_sentiment")
+run_vision_model_analysis = lazy_from("Vision.VisHelper", "run_vision_model_analysis")
+
+VISION_INDICATORS = ["20-Day SMA", "VWAP", "20-Day Bollinger Bands", "20-Day EMA"]
+
+# Upper bound on threads used when the independent stages run concurrently.
+# There are seven independent stages, so anything above that buys nothing.
+STAGE_WORKERS = 7
+
+# Stage name -> key under results["llm_insights"]
+INSIGHT_STAGES = ("health_analysis", "analyst_opinion", "business_analysis")
+
+# Every stage a single-stock summary reports progress for, in pipeline order.
+SINGLE_STOCK_STAGES = ("historical_data", "vision_model", "stock_ai", "news_sentiment") + INSIGHT_STAGES + ("stock_summary",)
+
+# Why a stage was substituted, unless the stage said otherwise (see StageFallback).
+DEADLINE_REASON = "not ready within the request deadline"
+
+
+def run_vision_stage(ticker, start_date, end_date):
+    """
+    Runs the vision model and strips it down to ticker + analysis (no chart_json).
+    """
+    vision_result_raw = run_vision_model_analysis(ticker, start_date, end_date, indicators=VISION_INDICATORS)
+    vision_result_clean = {}
+
+    if vision_result_raw and "results" in vision_result_raw and len(vision_result_raw["results"]) > 0:
+        vision_data = vision_result_raw["results"][0]
+
+        vision_result_clean = {
+            "ticker": vision_data.get("ticker", ""),
+            "analysis": vision_data.get("analysis", {})  # No chart_json here
+        }
+
+    return vision_result_clean
+
+
+def run_stock_ai_stage(context):
+    """
+    Risk metrics from the request's shared history and info. Falls back to the
+    AITools tools (which fetch their own data) only when those are unusable.
+    """
+    ticker = context.ticker
+    volatility_sharpe = volatility_sharpe_text(context)
+    basic_info = market_cap_text(context)
+    return {
+        #"volume": analyse_volume_change.invoke({"stock": ticker}),
+        "volatility_sharpe": volatility_sharpe or get_volatility_and_sharpe.invoke({"ticker": ticker}),
+        "basic_info": basic_info or get_stock_info.invoke({"stock": ticker, "field": "market cap"})
+    }
+
+
+def single_stock_stages(context, combined_insights=False, session=None):
+    """
+    The independent stages of a single-stock summary, keyed by stage name.
+    None of them depend on each other; only summarize_stock needs them all.
+    They share the request's MarketDataContext, so history and info are
+    downloaded once no matter how many stages read them.
+
+    With combined_insights=True the three insight stages share one JSON-mode
+    LLM call (see combined_insights) instead of making one call each; with a
+    session that call is the first turn of the session's conversation.
+    """
+    ticker, start_date, end_date = context.ticker, context.start_date, context.end_date
+    stages = {
+        "historical_data": lambda: context.history,
+        "vision_model": lambda: run_vision_stage(ticker, start_date, end_date),
+        "stock_ai": lambda: run_stock_ai_stage(context),
+        "news_sentiment": lambda: run_news_sentiment(ticker),
+        "health_analysis": lambda: get_health_response(ticker, context.info),
+        "analyst_opinion": lambda: get_opinions_response(ticker, context.info),
+        "business_analysis": lambda: get_business_response(ticker, context.info),
+    }
+    if combined_insights or session is not None:
+        shared = SharedInsights(ticker, lambda: context.info, session)
+        stages.update({name: (lambda name=name: shared.get(name)) for name in INSIGHT_STAGES})
+    return stages
+
+
+class StageFallback:
+    """
+    Substitutes for stages that miss the request deadline or have no info to
+    work on: the last value stored for the ticker (stage memo for LLM stages,
+    the precomputed store for the rest), otherwise an explicit skipped marker.
+
+    Attributes:
+        degraded (dict): Stage name -> {"status": "stale", "as_of": ..., "reason": ...}
+                         or {"status": "skipped", "reason": ...} for every substituted stage
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.degraded = {}
+        self._stored = False
+
+    def _precomputed(self):
+        if self._stored is False:
+            context = self.context
+            self._stored = load_precomputed(context.ticker, context.start_date, context.end_date, max_age=float("inf"))
+        return self._stored
+
+    def _last(self, name):
+        if name in INSIGHT_STAGES or name == "stock_summary":
+            return last_output(self.context.ticker, name)
+        stored = self._precomputed() if name in ("vision_model", "stock_ai", "news_sentiment") else None
+        return None if stored is None else (stored[name], stored["computed_at"])
+
+    def __call__(self, name, reason=DEADLINE_REASON):
+        last = self._last(name)
+        if last is not None:
+            self.degraded[name] = {"status": "stale", "reason": reason,
+                                   "as_of": datetime.fromtimestamp(last[1], timezone.utc).isoformat()}
+            return last[0]
+        self.degraded[name] = {"status": "skipped", "reason": reason}
+        text = f"Skipped: {reason}."
+        if name in INSIGHT_STAGES or name == "stock_summary":
+            return text
+        return None if name == "historical_data" else {"skipped": True, "reason": text}
+
+
+def _stage_result(name, result, fallback):
+    # A stage that ran out of time itself degrades like one that is still
+    # running; one without info to prompt on degrades with that as the reason.
+    try:
+        return result()
+    except DeadlineExceeded:
+        if fallback is None:
+            raise
+        return fallback(name)
+    except InfoUnavailable as e:
+        if fallback is None:
+            raise
+        return fallback(name, reason=str(e))
+
+
+def run_stages(stages, concurrent=False, max_workers=STAGE_WORKERS, fallback=None):
+    """
+    Runs a dict of stage name -> callable and returns stage name -> result.
+
+    Sequential by default. With concurrent=True the stages are fanned out over a
+    bounded thread pool and joined, so wall time is roughly the slowest stage.
+    The first failing stage's exception is re-raised either way. Every stage
+    runs inside a tracing span named after it.
+
+    Under a request deadline (see deadline.py) the stages always fan out, and
+    any stage still running when it passes is left behind and replaced by
+    fallback(name).
+    """
+    if not concurrent and current_deadline() is None:
+        return {name: _stage_result(name, traced(name, fn), fallback) for name, fn in stages.items()}
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(stages)) or 1)
+    try:
+        futures = {name: pool.submit(in_context(traced(name, fn))) for name, fn in stages.items()}
+        wait(futures.values(), timeout=remaining())
+        return {name: _stage_result(name, future.result, fallback) if future.done() or fallback is None
+                else fallback(name) for name, future in futures.items()}
+    finally:
+        # Don't wait on stages that missed the deadline; their calls time out on their own.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_stages(stages, max_workers=STAGE_WORKERS, fallback=None):
+    """
+    Fans the stages out like run_stages(concurrent=True) but yields
+    (stage name, result) pairs in completion order, as soon as each is ready.
+    Stages still running at the request deadline come last, from fallback.
+    """
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(stages)) or 1)
+    try:
+        futures = {pool.submit(in_context(traced(name, fn))): name for name, fn in stages.items()}
+        if current_deadline() is None or fallback is None:
+            for future in as_completed(futures):
+                yield futures[future], _stage_result(futures[future], future.result, fallback)
+            return
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                yield futures[future], _stage_result(futures[future], future.result, fallback)
+        for future in pending:
+            yield futures[future], fallback(futures[future])
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _stage_results_to_sections(stage_results):
+    return {
+        "vision_model": stage_results["vision_model"],
+        "stock_ai": stage_results["stock_ai"],
+        "news_sentiment": stage_results["news_sentiment"],
+        "llm_insights": {name: stage_results[name] for name in INSIGHT_STAGES},
+    }
+
+
+def _summary_args(ticker, sections):
+    return dict(
+        ticker=ticker,
+        vision_analysis=sections["vision_model"].get("analysis", {}),
+        stock_ai=sections["stock_ai"],
+        news_sentiment=sections["news_sentiment"],
+        health_text=sections["llm_insights"]["health_analysis"],
+        business_text=sections["llm_insights"]["business_analysis"],
+        analyst_opinion_text=sections["llm_insights"]["analyst_opinion"]
+    )
+
+
+def _reporting(name, fn, on_stage):
+    def run():
+        on_stage(name, "running")
+        try:
+            value = fn()
+        except Exception:
+            on_stage(name, "failed")
+            raise
+        on_stage(name, "done")
+        return value
+    return run
+
+
+def _stage_budget():
+    # Under a request deadline the independent stages get STAGE_BUDGET_SHARE of
+    # what is left, so whatever arrived can still be summarised in the rest.
+    left = remaining()
+    return None if left is None else left * STAGE_BUDGET_SHARE
+
+
+def run_single_stock(ticker, start_date, end_date, concurrent=False, context=None, on_stage=None,
+                     combined_insights=False, reuse_context=False):
+    """
+    Runs every single-stock stage and the final summary, sharing one
+    MarketDataContext (created here unless the caller passes one).
+
+    Under a request deadline, stages and the summary that don't finish in time
+    are replaced by their last stored value or a skipped marker (see
+    StageFallback) and listed under results["degraded"].
+
+    Args:
+        on_stage (callable): Optional progress hook, called as
+            on_stage(stage name, "running" | "done" | "failed")
+        combined_insights (bool): One structured call for the three insight sections
+        reuse_context (bool): Make that call and the summary two turns of one
+            /api/chat conversation, so the summary only prefills new data
+
+    Returns:
+        dict: vision_model, stock_ai, news_sentiment, llm_insights and stock_summary
+              entries, in the shape comprehensive_summary returns them.
+    """
+    context = context or MarketDataContext(ticker, start_date, end_date)
+    session = ChatSession(ticker) if reuse_context else None
+    stages = single_stock_stages(context, combined_insights, session)
+    if on_stage is not None:
+        stages = {name: _reporting(name, fn, on_stage) for name, fn in stages.items()}
+
+    fallback = StageFallback(context)
+    with deadline(_stage_budget()):
+        stage_results = run_stages(stages, concurrent=concurrent, fallback=fallback)
+    results = _stage_results_to_sections(stage_results)
+
+    # LLM summary of info
+    summary_stage = traced("stock_summary", lambda: summarize_stock(**_summary_args(ticker, results), session=session))
+    if on_stage is not None:
+        summary_stage = _reporting("stock_summary", summary_stage, on_stage)
+    try:
+        stock_summary_text = summary_stage()
+    except DeadlineExceeded:
+        stock_summary_text = fallback("stock_summary")
+
+    results["stock_summary"] = {
+        "ticker": ticker,
+        "summary": stock_summary_text
+    }
+    if fallback.degraded:
+        results["degraded"] = fallback.degraded
+    return results
+
+
+def iter_single_stock(ticker, start_date, end_date, context=None, combined_insights=False, reuse_context=False):
+    """
+    Streaming counterpart of run_single_stock.
+
+    Yields:
+        dict: One event per finished stage ({"type": "stage", ...}) in completion
+              order, then {"type": "token", ...} events for the summary text.
+              Under a request deadline, substituted stages carry a "status"
+              ("stale" with "as_of", or "skipped"), and a summary cut short
+              ends with {"type": "degraded", "stage": "stock_summary", ...}.
+    """
+    context = context or MarketDataContext(ticker, start_date, end_date)
+    stage_results = {}
+    session = ChatSession(ticker) if reuse_context else None
+    fallback = StageFallback(context)
+    with deadline(_stage_budget()):
+        for name, value in iter_stages(single_stock_stages(context, combined_insights, session), fallback=fallback):
+            stage_results[name] = value
+            if name == "historical_data":
+                continue  # only used internally, not part of the response
+            yield {
+                "type": "stage",
+                "section": "llm_insights" if name in INSIGHT_STAGES else name,
+                "stage": name,
+                "data": value,
+                **fallback.degraded.get(name, {}),
+            }
+
+    sections = _stage_results_to_sections(stage_results)
+    streamed = False
+    try:
+        for text in summarize_stock_stream(**_summary_args(ticker, sections), session=session):
+            streamed = True
+            yield {"type": "token", "text": text}
+    except DeadlineExceeded:
+        if streamed:
+            yield {"type": "degraded", "stage": "stock_summary", "status": "truncated"}
+            return
+        yield {"type": "token", "text": fallback("stock_summary")}
+        yield {"type": "degraded", "stage": "stock_summary", **fallback.degraded["stock_summary"]}
@@ -0,0 +1,228 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .Summary import summarize_stock
+from .health_analysis import get_health_response
+from .analyst_opinion import get_opinions_response
+from .Business_analysis import get_business_response
+from .combined_insights import get_combined_insights
+from .fetch_info import safe_get_info, InfoUnavailable
+from .risk_engine import batch_risk
+from .market_data import format_market_cap
+from .summary_store import load_precomputed, as_portfolio_entry
+from .deadline import deadline, remaining, expired, DeadlineExceeded
+from .tracing import span, in_context
+from .lazy_imports import lazy_from
+
+analyse_volume_change = lazy_from("API.AITools", "analyse_volume_change")
+get_volatility_and_sharpe = lazy_from("API.AITools", "get_volatility_and_sharpe")
+get_stock_info = lazy_from("API.AITools", "get_stock_info")
+run_news_sentiment = lazy_from("ScrapeData.helpers", "run_news_sentiment")
+run_vision_model_analysis = lazy_from("Vision.VisHelper", "run_vision_model_analysis")
+
+PORTFOLIO_INDICATORS = ["20-Day SMA", "VWAP", "20-Day EMA", "20-Day Bollinger Bands"]
+
+SYMBOL_WORKERS = 8  # symbols analysed at the same time
+SYMBOL_DEADLINE = 300  # seconds a single symbol may take once it has started
+
+# Max concurrent calls per stage across all symbols of a run. The LLM stages
+# should roughly match the parallel slots of the Ollama server.
+STAGE_LIMITS = {
+    "vision": 2,
+    "risk": 8,
+    "news": 4,
+    "insights": 3,
+    "summary": 2,
+}
+
+
+INSIGHT_KEYS = ("health_analysis", "analyst_opinion", "business_analysis")
+
+
+class SymbolDeadlineExceeded(Exception):
+    """Raised when a symbol runs past its deadline."""
+
+
+def _skipped_insights(keys, error, degraded):
+    # Insights with no info to prompt on are reported as skipped, not generated from N/A fields.
+    for key in keys:
+        degraded[key] = {"status": "skipped", "reason": str(error)}
+    return {key: f"Skipped: {error}." for key in keys}
+
+
+def _stock_ai(symbol, batch):
+    # Prefer the batch engine's numbers; the tools are the per-symbol fallback.
+    risk = batch.get(symbol)
+    if risk is None:
+        return {
+            "volume": analyse_volume_change.invoke({"stock": symbol}),
+            "volatility_sharpe": get_volatility_and_sharpe.invoke({"ticker": symbol}),
+            "basic_info": get_stock_info.invoke({"stock": symbol, "field": "market cap"})
+        }
+
+    basic_info = format_market_cap(symbol, safe_get_info(symbol))
+    return {
+        "volume": risk["volume"],
+        "volatility_sharpe": risk["volatility_sharpe"],
+        "basic_info": basic_info or get_stock_info.invoke({"stock": symbol, "field": "market cap"})
+    }
+
+
+def _analyse_symbol(index, symbol, start_date, end_date, gates, started, symbol_deadline, batch, combined_insights):
+    started.setdefault(index, time.monotonic())
+    # The symbol's deadline bounds its gate waits, LLM scheduler queueing and
+    # Ollama calls, so a symbol iter_portfolio has given up on lets go of them
+    # instead of holding them until its work would have finished.
+    try:
+        with deadline(symbol_deadline):
+            return _symbol_entry(symbol, start_date, end_date, gates, symbol_deadline, batch, combined_insights)
+    except DeadlineExceeded as e:
+        raise SymbolDeadlineExceeded(f"{symbol} exceeded its {symbol_deadline}s deadline: {e}") from e
+
+
+def _symbol_entry(symbol, start_date, end_date, gates, symbol_deadline, batch, combined_insights):
+    def stage(name, fn, label=None):
+        if expired():
+            raise SymbolDeadlineExceeded(f"{symbol} exceeded its {symbol_deadline}s deadline before the {name} stage")
+        with span(label or name, symbol=symbol) as current:
+            if not gates[name].acquire(timeout=remaining()):
+                raise SymbolDeadlineExceeded(f"{symbol} exceeded its {symbol_deadline}s deadline waiting for the {name} stage")
+            try:
+                current.set(gate_wait_s=round(time.monotonic() - current.started, 4))
+                return fn()
+            finally:
+                gates[name].release()
+
+    vision = stage("vision", lambda: run_vision_model_analysis(symbol, start_date, end_date, indicators=PORTFOLIO_INDICATORS))
+    vision_analysis = vision.get("results", [{}])[0].get("analysis", {})
+
+    stock_ai = stage("risk", lambda: _stock_ai(symbol, batch))
+
+    news = stage("news", lambda: run_news_sentiment(symbol))
+
+    degraded = {}
+    if combined_insights:
+        try:
+            llm_insights = stage("insights", lambda: get_combined_insights(symbol), "llm_insights")
+        except InfoUnavailable as e:
+            llm_insights = _skipped_insights(INSIGHT_KEYS, e, degraded)
+    else:
+        llm_insights = {}
+        responses = (get_health_response, get_opinions_response, get_business_response)
+        for key, response in zip(INSIGHT_KEYS, responses):
+            try:
+                llm_insights[key] = stage("insights", lambda response=response: response(symbol), key)
+            except InfoUnavailable as e:
+                llm_insights.update(_skipped_insights((key,), e, degraded))
+
+    summary = stage("summary", lambda: summarize_stock(
+        symbol,
+        vision_analysis,
+        stock_ai,
+        news,
+        health_text=llm_insights["health_analysis"],
+        business_text=llm_insights["business_analysis"],
+        analyst_opinion_text=llm_insights["analyst_opinion"]
+    ))
+
+    entry = {
+        "symbol": symbol,
+        "summary": summary,
+        "vision_analysis": vision_analysis,
+        "stock_ai": stock_ai,
+        "news_sentiment": news,
+        "llm_insights": llm_insights
+    }
+    if degraded:
+        entry["degraded"] = degraded
+    return entry
+
+
+def iter_portfolio(symbols, start_date, end_date, max_workers=SYMBOL_WORKERS,
+                   symbol_deadline=SYMBOL_DEADLINE, stage_limits=None, combined_insights=False):
+    """
+    Analyses every holding concurrently and yields each one as soon as it is
+    done, so a caller streaming the results only ever holds one symbol.
+
+    Each stage is gated by its own limit from STAGE_LIMITS (overridable through
+    stage_limits), so e.g. vision and LLM calls can't flood their backends.
+    A symbol that runs past symbol_deadline becomes an error entry without
+    holding up the others. combined_insights=True makes one structured LLM
+    call per symbol for the three insight sections.
+
+    Yields:
+        tuple: (holding index, entry) in completion order. Precomputed symbols
+               come first; failed symbols are {"symbol": ..., "error": ...}.
+    """
+    # Symbols precomputed by the warm-up job are served as-is.
+    pending = []
+    for index, symbol in enumerate(symbols):
+        stored = load_precomputed(symbol, start_date, end_date)
+        if stored is not None:
+            yield index, as_portfolio_entry(symbol, stored)
+        else:
+            pending.append((index, symbol))
+    if not pending:
+        return
+
+    limits = {**STAGE_LIMITS, **(stage_limits or {})}
+    gates = {name: threading.BoundedSemaphore(limit) for name, limit in limits.items()}
+    started = {}  # holding index -> monotonic start time, set by the worker
+
+    # Risk metrics for every holding in one vectorised pass up front.
+    try:
+        with span("batch_risk", symbols=len(pending)):
+            batch = batch_risk([symbol for _, symbol in pending], start_date, end_date)
+    except Exception as e:
+        print(f"Batch risk engine failed, falling back to per-symbol tools: {e}")
+        batch = {}
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending))))
+    try:
+        futures = {
+            pool.submit(in_context(_analyse_symbol), index, symbol, start_date, end_date, gates, started, symbol_deadline, batch,
+                        combined_insights): (index, symbol)
+            for index, symbol in pending
+        }
+
+        while futures:
+            # Symbols still queued have no deadline running yet.
+            now = time.monotonic()
+            wait_for = 1.0
+            for future, (index, symbol) in list(futures.items()):
+                begun = started.get(index)
+                if begun is None or future.done():
+                    continue
+                left = begun + symbol_deadline - now
+                if left <= 0:
+                    del futures[future]
+                    yield index, {"symbol": symbol, "error": f"Timed out after {symbol_deadline}s"}
+                else:
+                    wait_for = min(wait_for, left)
+
+            done, _ = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, symbol = futures.pop(future)
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    entry = {"symbol": symbol, "error": str(e)}
+                yield index, entry
+    finally:
+        # Don't keep the caller waiting on symbols that already timed out.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_portfolio(symbols, start_date, end_date, **kwargs):
+    """
+    iter_portfolio collected into a list.
+
+    Returns:
+        list: One dict per symbol, in holding order. Failed symbols are
+              {"symbol": ..., "error": ...}.
+    """
+    results = [None] * len(symbols)
+    for index, entry in iter_portfolio(symbols, start_date, end_date, **kwargs):
+        results[index] = entry
+    return results
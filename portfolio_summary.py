@@ -0,0 +1,231 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .ollama_client import generate
+from .fetch_info import safe_get_info
+from .llm_scheduler import SchedulerSaturated
+from .summary_store import load_precomputed
+from .peer_table import get_peer_table
+from .prompt_packer import estimate_tokens, shrink_text, SHARED_NUM_CTX
+from .tracing import span, in_context
+
+# Portfolio summary as a map-reduce over the holdings. Each holding becomes a
+# short digest; digests are packed into batches of at most LEVEL_INPUT_TOKENS
+# and condensed into notes in parallel, and the notes are condensed the same
+# way level by level until they fit one prompt for the final 4-6 bullets.
+# That final prompt also gets sector, dividend and recommendation totals
+# computed over every holding, which condensing can't blur.
+# Every call stays within the same small context, and since each level cuts
+# the text by roughly LEVEL_INPUT_TOKENS / NOTE_TOKENS the number of levels
+# (and so the latency) grows with the log of the number of holdings.
+LEVEL_INPUT_TOKENS = 6000  # holding digests / notes per condense or final call
+NOTE_TOKENS = 400  # answer budget of a condense call
+DIGEST_TOKENS = 300  # cap on one holding's digest
+MAP_WORKERS = 4  # condense calls in flight; the LLM scheduler still applies
+DIGEST_WORKERS = 8  # holdings whose info / stored summary is loaded at once
+TOP_SECTORS = 8  # sectors listed in the root prompt; the rest are summed as "Other"
+
+# Fundamentals carried into a holding's digest. The fundamentals table built
+# offline (peer_table) has all of them, so live info is only fetched for
+# holdings that have neither a table row nor a stored summary.
+DIGEST_FIELDS = ("sector", "industry", "marketCap", "currentPrice", "trailingPE", "dividendYield", "dividendRate",
+                 "recommendationMean", "fiftyTwoWeekChange")
+
+PORTFOLIO_SUMMARY_AREAS = """
+1. Portfolio performance trends
+2. Sector distribution insights
+3. Dividend income highlights
+4. Notable analyst recommendations
+5. General investment outlook and risks
+"""
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _holding_digest(holding, start_date, end_date, table):
+    """
+    One holding as compact text (the account's own fields, its fundamentals and
+    the precomputed single-stock summary when there is one), plus the figures
+    the portfolio aggregates are built from.
+
+    Returns:
+        tuple: (digest text, dict of symbol, sector, value, dividend_income, recommendation)
+    """
+    symbol = holding["symbol"].upper()
+    account = {key: value for key, value in holding.items()
+               if key != "symbol" and isinstance(value, (str, int, float)) and not isinstance(value, bool)}
+    stored = load_precomputed(symbol, start_date, end_date)
+    source = table.fundamentals(symbol) if table is not None else None
+    if source is None and stored is None:
+        source = safe_get_info(symbol)
+    facts = {key: source[key] for key in DIGEST_FIELDS if source and source.get(key) not in (None, "")}
+
+    lines = [f"{symbol}: {json.dumps({**account, **facts}, separators=(',', ':'), default=str)}"]
+    if stored is not None:
+        lines.append(stored["stock_summary"]["summary"])
+
+    quantity = _number(holding.get("quantity"))
+    price = _number(facts.get("currentPrice"))
+    dividend = _number(facts.get("dividendRate"))
+    position = {
+        "symbol": symbol,
+        "sector": facts.get("sector") or "Unknown",
+        "value": quantity * price if quantity is not None and price is not None else None,
+        "dividend_income": quantity * dividend if quantity is not None and dividend else None,
+        "recommendation": _number(facts.get("recommendationMean")),
+    }
+    return shrink_text("\n".join(lines), DIGEST_TOKENS), position
+
+
+def _portfolio_aggregates(positions):
+    """
+    Sector totals, dividend income and analyst consensus over every holding,
+    computed exactly here so the root prompt doesn't depend on the condensed
+    notes having kept them.
+    """
+    priced = sum(position["value"] for position in positions if position["value"] is not None)
+    sectors = {}
+    for position in positions:
+        sector = sectors.setdefault(position["sector"], {"holdings": 0, "value": 0.0})
+        sector["holdings"] += 1
+        sector["value"] += position["value"] or 0.0
+    ranked = sorted(sectors.items(), key=lambda item: (item[1]["value"], item[1]["holdings"]), reverse=True)
+    if len(ranked) > TOP_SECTORS:
+        rest = ranked[TOP_SECTORS - 1:]
+        ranked = ranked[:TOP_SECTORS - 1] + [("Other", {"holdings": sum(s["holdings"] for _, s in rest),
+                                                       "value": sum(s["value"] for _, s in rest)})]
+    sector_lines = []
+    for name, sector in ranked:
+        line = f"- {name}: {sector['holdings']} holding{'' if sector['holdings'] == 1 else 's'}"
+        if priced:
+            line += f", ${sector['value']:,.0f} ({sector['value'] / priced:.1%} of priced value)"
+        sector_lines.append(line)
+
+    payers = [position for position in positions if position["dividend_income"]]
+    income = sum(position["dividend_income"] for position in payers)
+    dividends = f"{len(payers)} of {len(positions)} holdings pay a dividend"
+    if income:
+        dividends += f"; estimated annual income ${income:,.0f}"
+        if priced:
+            dividends += f" ({income / priced:.2%} yield on priced value)"
+        top = sorted(payers, key=lambda position: position["dividend_income"], reverse=True)[:5]
+        dividends += "; largest payers: " + ", ".join(f"{p['symbol']} ${p['dividend_income']:,.0f}" for p in top)
+
+    rated = sorted((position for position in positions if position["recommendation"] is not None),
+                   key=lambda position: position["recommendation"])
+    if rated:
+        recommendations = (f"Analyst consensus (1 = strong buy, 5 = sell) for {len(rated)} holdings; strongest: "
+                           + ", ".join(f"{p['symbol']} {p['recommendation']:.1f}" for p in rated[:3])
+                           + "; weakest: "
+                           + ", ".join(f"{p['symbol']} {p['recommendation']:.1f}" for p in rated[-3:][::-1]))
+    else:
+        recommendations = "N/A"
+
+    return {"sectors": "\n".join(sector_lines), "dividends": dividends, "recommendations": recommendations}
+
+
+def _batches(items, budget):
+    # Greedy packing in holding order; a batch always takes at least one item.
+    batches, current, used = [], [], 0
+    for item in items:
+        tokens = estimate_tokens(item)
+        if current and used + tokens > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _condense(items, level):
+    """
+    One map / reduce call: notes on a batch of holding digests or earlier notes.
+    """
+    source = "holdings" if level == 0 else "notes on groups of holdings"
+    prompt = f"""
+You are a financial assistant condensing part of a large portfolio review.
+Below are {len(items)} {source}. Write compact notes (at most {NOTE_TOKENS * 3 // 5} words) that keep:
+- the ticker symbols that matter most (largest positions, biggest movers, notable risks)
+- sector concentration, dividend income and analyst views
+- any figures needed to compare these holdings with the rest of the portfolio
+Do not add facts that are not in the input.
+
+{chr(10).join(items)}
+"""
+    try:
+        notes = generate(prompt, options={"num_ctx": SHARED_NUM_CTX, "num_predict": NOTE_TOKENS}, timeout=240, cache=True)
+    except SchedulerSaturated:
+        raise
+    except Exception as e:
+        # Keep the tree converging: carry a truncated copy of the input up instead.
+        print(f"Portfolio condense call failed at level {level}: {e}")
+        notes = "\n".join(items)
+    return shrink_text(notes, NOTE_TOKENS)
+
+
+def hierarchical_portfolio_summary(holdings, start_date, end_date):
+    """
+    4-6 bullet summary of a portfolio of any size.
+
+    Args:
+        holdings (list): Dicts with at least a "symbol", as returned by fetch_updated_data
+
+    Returns:
+        dict: summary text, holdings count, per level the number of inputs and calls,
+              and the sector / dividend / recommendation aggregates given to the final call
+    """
+    holdings = [holding for holding in holdings if holding.get("symbol")]
+    if not holdings:
+        return {"summary": "No holdings to summarize.", "holdings": 0, "levels": []}
+
+    table = get_peer_table()
+    with span("portfolio_digests", holdings=len(holdings)):
+        with ThreadPoolExecutor(max_workers=min(DIGEST_WORKERS, len(holdings))) as pool:
+            futures = [pool.submit(in_context(_holding_digest), holding, start_date, end_date, table)
+                       for holding in holdings]
+            items, positions = zip(*(future.result() for future in futures))
+    items = list(items)
+    aggregates = _portfolio_aggregates(positions)
+
+    levels = []
+    while sum(estimate_tokens(item) for item in items) > LEVEL_INPUT_TOKENS:
+        level = len(levels)
+        batches = _batches(items, LEVEL_INPUT_TOKENS)
+        with span("portfolio_condense", level=level, inputs=len(items), calls=len(batches)):
+            with ThreadPoolExecutor(max_workers=min(MAP_WORKERS, len(batches))) as pool:
+                futures = [pool.submit(in_context(_condense), batch, level) for batch in batches]
+                items = [future.result() for future in futures]
+        levels.append({"inputs": sum(len(batch) for batch in batches), "calls": len(batches)})
+
+    prompt = f"""
+You are a financial assistant. Based on the following totals and notes covering all {len(holdings)} holdings of a portfolio,
+provide a clear 4-6 bullet point summary covering:
+{PORTFOLIO_SUMMARY_AREAS}
+Only use facts present in the totals and notes.
+
+--- SECTOR TOTALS ---
+{aggregates["sectors"]}
+
+--- DIVIDENDS ---
+{aggregates["dividends"]}
+
+--- RECOMMENDATIONS ---
+{aggregates["recommendations"]}
+
+--- PORTFOLIO NOTES ---
+{chr(10).join(items)}
+"""
+    try:
+        with span("portfolio_final", inputs=len(items)):
+            summary = generate(prompt, options={"num_ctx": SHARED_NUM_CTX}, timeout=240, cache=True)
+    except SchedulerSaturated:
+        raise
+    except Exception as e:
+        summary = f"Portfolio summary generation failed: {str(e)}"
+
+    levels.append({"inputs": len(items), "calls": 1})
+    return {"summary": summary, "holdings": len(holdings), "levels": levels, "aggregates": aggregates}
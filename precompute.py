@@ -0,0 +1,73 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .pipeline import run_single_stock
+from .summary_store import save_precomputed
+from .llm_scheduler import priority
+from .lazy_imports import lazy_from
+
+fetch_updated_data = lazy_from("API.UpdateUserData", "fetch_updated_data")
+
+PRECOMPUTE_WINDOW = 3600  # seconds; no new symbols are started after this
+PRECOMPUTE_CONCURRENCY = 2  # symbols precomputed at once
+
+
+def rank_held_symbols(user_ids):
+    """
+    Union of symbols held across the given users' portfolios, most widely held first.
+
+    Returns:
+        list: (symbol, number of portfolios holding it) pairs
+    """
+    counts = Counter()
+    for user_id in user_ids:
+        try:
+            portfolio_data = fetch_updated_data(user_id=user_id)
+        except Exception as e:
+            print(f"Skipping user {user_id}: {e}")
+            continue
+        counts.update({x["symbol"].upper() for x in portfolio_data if x.get("symbol")})
+    return counts.most_common()
+
+
+def precompute_summaries(symbols, start_date, end_date, window=PRECOMPUTE_WINDOW,
+                         concurrency=PRECOMPUTE_CONCURRENCY):
+    """
+    Runs the full single-stock pipeline (health, analyst opinion, business,
+    vision, risk, news and summary) for each symbol in order and stores the
+    results. Symbols not started within `window` seconds are skipped.
+
+    Returns:
+        dict: done / failed / skipped symbol lists and elapsed seconds
+    """
+    started = time.monotonic()
+    report = {"done": [], "failed": [], "skipped": []}
+
+    def work(symbol):
+        if time.monotonic() - started > window:
+            return symbol, "skipped"
+        # Warm-up work only gets LLM slots nobody interactive is waiting for.
+        with priority("background"):
+            results = run_single_stock(symbol, start_date, end_date)
+        if results.get("degraded"):
+            # Substituted stages (e.g. no info) mustn't be served as a fresh summary all day.
+            raise RuntimeError(f"degraded stages: {', '.join(results['degraded'])}")
+        save_precomputed(symbol, start_date, end_date, results)
+        return symbol, "done"
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(work, symbol): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                _, outcome = future.result()
+            except Exception as e:
+                print(f"Precompute failed for {symbol}: {e}")
+                outcome = "failed"
+            report[outcome].append(symbol)
+            if outcome == "done":
+                print(f"Precomputed {symbol} ({len(report['done'])}/{len(symbols)})")
+
+    report["elapsed"] = time.monotonic() - started
+    return report
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import threading
+from datetime import date, timedelta
+
+from . import local_db
+from .lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+yf = lazy_module("yfinance")
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX; fall back to in-process locking only
+    fcntl = None
+
+# Local columnar OHLCV store. Each symbol is a directory of raw little-endian
+# column files (dates as int64 days since epoch, prices/volume as float64) that
+# are only ever appended to and are read back with np.memmap. The dates column
+# is written last, so its length is the committed row count.
+PRICE_STORE_DIR = "prices"
+COLUMNS = ("Open", "High", "Low", "Close", "Adj Close", "Volume")
+STORE_START_DATE = "2015-01-01"  # earliest date fetched on a cold symbol
+REFRESH_INTERVAL = 3600  # seconds between upstream checks for new trailing bars (weekends are skipped)
+ADJUSTMENT_TOLERANCE = 1e-4  # relative change of a stored bar that means the history was re-adjusted
+
+_FILENAMES = {column: column.lower().replace(" ", "_") + ".f8" for column in COLUMNS}
+_DATES_FILE = "dates.i8"
+_META_FILE = "meta.json"
+
+_locks = {}
+_locks_guard = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"cold_reads": 0, "warm_reads": 0, "cold_seconds": 0.0, "warm_seconds": 0.0,
+          "rows_appended": 0, "upstream_fetches": 0, "adjustment_rewrites": 0}
+
+
+def _symbol_dir(symbol):
+    return os.path.join(local_db.DATA_DIR, PRICE_STORE_DIR, symbol.upper())
+
+
+def _lock_for(symbol):
+    with _locks_guard:
+        return _locks.setdefault(symbol.upper(), threading.Lock())
+
+
+class _SymbolLock:
+    """Serialises writers for one symbol across threads and (on POSIX) processes."""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self._thread_lock = _lock_for(symbol)
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            os.makedirs(_symbol_dir(self.symbol), exist_ok=True)
+            self._file = open(os.path.join(_symbol_dir(self.symbol), ".lock"), "w")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+        self._thread_lock.release()
+
+
+def _to_days(values):
+    return pd.DatetimeIndex(values).normalize().values.astype("datetime64[D]").astype(np.int64)
+
+
+def _read_meta(symbol):
+    try:
+        with open(os.path.join(_symbol_dir(symbol), _META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(symbol, meta):
+    path = os.path.join(_symbol_dir(symbol), _META_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(path + ".tmp", path)
+
+
+def _read_columns(symbol):
+    """
+    Memory-maps the committed rows of a symbol.
+
+    Returns:
+        tuple: (int64 day array, {column: float64 array}); empty arrays if absent
+    """
+    folder = _symbol_dir(symbol)
+    dates_path = os.path.join(folder, _DATES_FILE)
+    if not os.path.exists(dates_path) or os.path.getsize(dates_path) == 0:
+        return np.empty(0, dtype=np.int64), {column: np.empty(0) for column in COLUMNS}
+
+    dates = np.memmap(dates_path, dtype="<i8", mode="r")
+    rows = len(dates)
+    columns = {}
+    for column, filename in _FILENAMES.items():
+        data = np.memmap(os.path.join(folder, filename), dtype="<f8", mode="r")
+        columns[column] = data[:rows]  # ignore any half-written tail
+    return dates, columns
+
+
+def _append_rows(symbol, frame):
+    """
+    Appends rows (DatetimeIndex, OHLCV columns) after the last stored date.
+    Column files first, dates last, so a crash never exposes a partial row.
+    """
+    if frame.empty:
+        return 0
+    folder = _symbol_dir(symbol)
+    os.makedirs(folder, exist_ok=True)
+
+    dates, _ = _read_columns(symbol)
+    rows = len(dates)
+    for column, filename in _FILENAMES.items():
+        path = os.path.join(folder, filename)
+        # Drop any tail left behind by an interrupted append before extending.
+        if os.path.exists(path) and os.path.getsize(path) > rows * 8:
+            with open(path, "r+b") as f:
+                f.truncate(rows * 8)
+        values = frame[column] if column in frame.columns else frame["Close"]
+        with open(path, "ab") as f:
+            f.write(values.to_numpy(dtype="<f8", na_value=np.nan).tobytes())
+
+    with open(os.path.join(folder, _DATES_FILE), "ab") as f:
+        f.write(_to_days(frame.index).astype("<i8").tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+    with _stats_lock:
+        _stats["rows_appended"] += len(frame)
+    return len(frame)
+
+
+def _rewrite(symbol, frame):
+    # Only for cold fills, back-fills and re-adjusted history; daily updates go through _append_rows.
+    folder = _symbol_dir(symbol)
+    for filename in list(_FILENAMES.values()) + [_DATES_FILE]:
+        path = os.path.join(folder, filename)
+        if os.path.exists(path):
+            os.remove(path)
+    _append_rows(symbol, frame)
+
+
+def _download(symbol, start, end):
+    with _stats_lock:
+        _stats["upstream_fetches"] += 1
+    df = yf.download(symbol, start=start, end=end, auto_adjust=False, progress=False)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=list(COLUMNS), index=pd.DatetimeIndex([]))
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df.index = pd.DatetimeIndex(df.index).tz_localize(None).normalize()
+    # Only complete sessions are stored; today's bar may still be moving.
+    df = df[df.index < pd.Timestamp(date.today())]
+    return df[[column for column in COLUMNS if column in df.columns]].dropna(subset=["Close"])
+
+
+def _frame(dates, columns, mask):
+    index = pd.DatetimeIndex(dates[mask].astype("datetime64[D]"), name="Date")
+    # np.array copies out of the memmap so the files can be appended/replaced later.
+    return pd.DataFrame({column: np.array(columns[column][mask]) for column in COLUMNS}, index=index)
+
+
+def _readjusted(symbol, columns, tail, last):
+    # Upstream's bar for the last stored day no longer matching ours means a
+    # split or dividend has re-adjusted the history since it was stored.
+    if last not in tail.index:
+        return False
+    bar = tail.loc[last]
+    for column in ("Close", "Adj Close"):
+        if column not in tail.columns:
+            continue
+        stored, fresh = float(columns[column][-1]), float(bar[column])
+        if abs(fresh - stored) > ADJUSTMENT_TOLERANCE * max(abs(stored), 1e-9):
+            print(f"Price store: {symbol} {column} on {last.date()} moved {stored} -> {fresh}; refetching history")
+            return True
+    return False
+
+
+def _sync(symbol, start_date):
+    """
+    Makes sure the store covers start_date..yesterday, fetching only what's missing.
+    Returns True if upstream was contacted.
+    """
+    dates, columns = _read_columns(symbol)
+    meta = _read_meta(symbol)
+    yesterday = date.today() - timedelta(days=1)
+    requested_start = min(pd.Timestamp(start_date), pd.Timestamp(STORE_START_DATE))
+
+    first_requested = meta.get("first_requested")
+
+    if first_requested is None or pd.Timestamp(first_requested) > requested_start:
+        # Cold symbol, or a request reaching further back than we ever fetched:
+        # fetch the whole range once and replace what's stored.
+        full = _download(symbol, requested_start.strftime("%Y-%m-%d"), None)
+        if not full.empty:
+            _rewrite(symbol, full)
+        meta["first_requested"] = requested_start.strftime("%Y-%m-%d")
+    elif time.time() - meta.get("checked_at", 0) <= REFRESH_INTERVAL:
+        return False
+    elif len(dates) == 0:
+        # Nothing came back last time (delisted / unknown symbol); try again.
+        _append_rows(symbol, _download(symbol, first_requested, None))
+    else:
+        last = pd.Timestamp(dates[-1].astype("datetime64[D]"))
+        if last >= pd.Timestamp(yesterday):
+            return False
+        checked_through = meta.get("checked_through")
+        if checked_through and not np.busday_count(date.fromisoformat(checked_through) + timedelta(days=1),
+                                                   date.today()):
+            # No weekday has closed since the last check (holidays still cost one check a day).
+            return False
+        # Start at the last stored day so its bar can be compared with upstream's.
+        tail = _download(symbol, last.strftime("%Y-%m-%d"), None)
+        if _readjusted(symbol, columns, tail, last):
+            full = _download(symbol, first_requested, None)
+            if not full.empty:
+                _rewrite(symbol, full)
+                with _stats_lock:
+                    _stats["adjustment_rewrites"] += 1
+        else:
+            _append_rows(symbol, tail[tail.index > last])
+
+    meta["checked_at"] = time.time()
+    meta["checked_through"] = yesterday.isoformat()  # last day a complete bar could exist for
+    _write_meta(symbol, meta)
+    return True
+
+
+def load_history(symbol, start_date, end_date=None):
+    """
+    OHLCV history for start_date <= date < end_date (end exclusive, like
+    yf.download), served from the local store. Upstream is only asked for
+    dates the store doesn't have yet.
+
+    Returns:
+        pd.DataFrame: Open, High, Low, Close, Adj Close, Volume indexed by Date
+    """
+    started = time.monotonic()
+    with _SymbolLock(symbol):
+        fetched = _sync(symbol, start_date)
+        dates, columns = _read_columns(symbol)
+
+    start_day = np.datetime64(pd.Timestamp(start_date).date(), "D").astype(np.int64)
+    mask = dates >= start_day
+    if end_date:
+        mask &= dates < np.datetime64(pd.Timestamp(end_date).date(), "D").astype(np.int64)
+    frame = _frame(dates, columns, mask)
+
+    elapsed = time.monotonic() - started
+    kind = "cold" if fetched else "warm"
+    with _stats_lock:
+        _stats[f"{kind}_reads"] += 1
+        _stats[f"{kind}_seconds"] += elapsed
+    return frame
+
+
+def price_store_stats():
+    """
+    Returns read counts and mean latency for cold (upstream fetched) and warm
+    (served locally) reads, plus rows appended and upstream fetches.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    for kind in ("cold", "warm"):
+        reads = stats[f"{kind}_reads"]
+        stats[f"{kind}_mean_ms"] = stats[f"{kind}_seconds"] / reads * 1000 if reads else 0.0
+    return stats
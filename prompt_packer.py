@@ -0,0 +1,118 @@
+import json
+import math
+
+# Rough characters per token for qwen-style tokenizers on mixed prose/JSON.
+# Kept a little low so estimates err on the side of more tokens.
+CHARS_PER_TOKEN = 3.5
+
+# The one context size every call asks Ollama for. Ollama reloads the model
+# runner whenever num_ctx changes, so sizing each prompt's context separately
+# (insights at 32000, the summary at 8192, ...) swapped the model several times
+# per request, which costs far more than a smaller context saves on prefill.
+# Sessions and cached prefixes also need the same num_ctx on every turn.
+SHARED_NUM_CTX = 32000
+
+OUTPUT_TOKENS = 1500  # room left for the model's answer
+
+TRIM_MARKER = "\n[... trimmed to fit context ...]"
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate from character count.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+class Section:
+    """
+    One titled block of a prompt.
+
+    Args:
+        title (str): Rendered as "--- TITLE ---"
+        text (str): Section body
+        priority (int): Higher is more valuable; low priorities shrink first
+        min_tokens (int): Floor the section may be shrunk to (0 allows dropping it)
+        compact (str): Optional cheaper rendering of the same data (e.g. JSON
+            without indentation), tried before any text is cut
+    """
+
+    def __init__(self, title, text, priority, min_tokens=0, compact=None):
+        self.title = title
+        self.text = text or "N/A"
+        self.priority = priority
+        self.min_tokens = min_tokens
+        self.compact = compact
+
+    def render(self):
+        return f"--- {self.title} ---\n{self.text}\n"
+
+    def tokens(self):
+        return estimate_tokens(self.render())
+
+
+def json_section(title, data, priority, min_tokens=0):
+    """
+    Section for a JSON-serialisable value, with a compact fallback rendering.
+    """
+    return Section(title, json.dumps(data, indent=2), priority, min_tokens,
+                   compact=json.dumps(data, separators=(",", ":")))
+
+
+def shrink_text(text, max_tokens):
+    """
+    Cuts text to roughly max_tokens at a line boundary where possible.
+    """
+    if max_tokens <= 0:
+        return ""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN) - len(TRIM_MARKER)
+    if max_chars <= 0:
+        return ""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", 0, max_chars)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return text[:cut].rstrip() + TRIM_MARKER
+
+
+def pack_sections(header, sections, budget):
+    """
+    Assembles header + sections within a token budget.
+
+    Sections keep their order in the prompt. When over budget, the lowest
+    priority sections are first swapped for their compact rendering, then cut
+    down towards their min_tokens, before anything more valuable is touched.
+
+    Returns:
+        tuple: (prompt text, estimated prompt tokens, list of shrunk section titles)
+    """
+    header_tokens = estimate_tokens(header)
+    shrunk = []
+
+    def total():
+        return header_tokens + sum(section.tokens() for section in sections)
+
+    by_priority = sorted(sections, key=lambda section: section.priority)
+
+    for section in by_priority:
+        if total() <= budget:
+            break
+        if section.compact and len(section.compact) < len(section.text):
+            section.text = section.compact
+            shrunk.append(section.title)
+
+    for section in by_priority:
+        over = total() - budget
+        if over <= 0:
+            break
+        body_tokens = estimate_tokens(section.text)
+        target = max(section.min_tokens, body_tokens - over)
+        if target < body_tokens:
+            section.text = shrink_text(section.text, target) or "N/A (omitted to fit context)"
+            if section.title not in shrunk:
+                shrunk.append(section.title)
+
+    prompt = header + "\n" + "\n".join(section.render() for section in sections)
+    return prompt, estimate_tokens(prompt), shrunk
+
@@ -0,0 +1,127 @@
+from .price_store import load_history
+from .lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.04  # annual, used for the Sharpe ratio
+VOLUME_RECENT_DAYS = 5  # recent window compared against...
+VOLUME_BASELINE_DAYS = 30  # ...the average of the days before it
+
+
+def load_price_matrix(symbols, start_date, end_date):
+    """
+    Aligned close and volume matrices (dates x symbols) from the local price store.
+    Symbols whose history can't be loaded are left out.
+
+    Returns:
+        tuple: (closes DataFrame, volumes DataFrame)
+    """
+    closes, volumes = {}, {}
+    for symbol in dict.fromkeys(symbols):
+        try:
+            history = load_history(symbol, start_date, end_date)
+        except Exception as e:
+            print(f"Risk engine: no price history for {symbol}: {e}")
+            continue
+        if history.empty:
+            continue
+        price_column = "Adj Close" if history["Adj Close"].notna().any() else "Close"
+        closes[symbol] = history[price_column]
+        volumes[symbol] = history["Volume"]
+    return pd.DataFrame(closes), pd.DataFrame(volumes)
+
+
+def compute_risk_metrics(closes, volumes=None):
+    """
+    One vectorised pass over every column of the close (and volume) matrix.
+
+    Returns:
+        pd.DataFrame: One row per symbol with volatility, annual_return, sharpe,
+                      volume_change, last_month_return, avg_month_return,
+                      best_month_return, worst_month_return
+    """
+    returns = closes.pct_change(fill_method=None)
+    volatility = returns.std() * np.sqrt(TRADING_DAYS)
+    annual_return = returns.mean() * TRADING_DAYS
+    sharpe = (annual_return - RISK_FREE_RATE) / volatility.replace(0, np.nan)
+
+    monthly = closes.groupby(closes.index.to_period("M")).last().pct_change(fill_method=None)
+
+    metrics = pd.DataFrame({
+        "volatility": volatility,
+        "annual_return": annual_return,
+        "sharpe": sharpe,
+        "last_month_return": monthly.iloc[-1] if len(monthly) else np.nan,
+        "avg_month_return": monthly.mean(),
+        "best_month_return": monthly.max(),
+        "worst_month_return": monthly.min(),
+    })
+
+    if volumes is not None and not volumes.empty:
+        recent = volumes.iloc[-VOLUME_RECENT_DAYS:].mean()
+        baseline = volumes.iloc[-(VOLUME_RECENT_DAYS + VOLUME_BASELINE_DAYS):-VOLUME_RECENT_DAYS].mean()
+        metrics["recent_volume"] = recent
+        metrics["baseline_volume"] = baseline
+        metrics["volume_change"] = recent / baseline.replace(0, np.nan) - 1
+    return metrics
+
+
+def _pct(value):
+    return "N/A" if pd.isna(value) else f"{value:.2%}"
+
+
+def format_volatility_sharpe(symbol, row, start_date, end_date):
+    sharpe = "N/A" if pd.isna(row["sharpe"]) else f"{row['sharpe']:.2f}"
+    return (
+        f"{symbol} ({start_date} to {end_date}): "
+        f"annualised volatility {_pct(row['volatility'])}, annualised return {_pct(row['annual_return'])}, "
+        f"Sharpe ratio {sharpe} (risk-free rate {RISK_FREE_RATE:.0%})."
+    )
+
+
+def format_volume_change(symbol, row):
+    if pd.isna(row.get("volume_change", np.nan)):
+        return f"{symbol}: not enough volume history to compare."
+    return (
+        f"{symbol}: average volume over the last {VOLUME_RECENT_DAYS} sessions was "
+        f"{row['recent_volume']:,.0f} vs {row['baseline_volume']:,.0f} over the prior "
+        f"{VOLUME_BASELINE_DAYS} sessions ({row['volume_change']:+.2%})."
+    )
+
+
+def format_monthly_performance(symbol, row):
+    return (
+        f"{symbol} monthly performance: last month {_pct(row['last_month_return'])}, "
+        f"average month {_pct(row['avg_month_return'])}, best {_pct(row['best_month_return'])}, "
+        f"worst {_pct(row['worst_month_return'])}."
+    )
+
+
+def batch_risk(symbols, start_date, end_date, closes=None, volumes=None):
+    """
+    Risk texts for every symbol from one vectorised pass.
+
+    Returns:
+        dict: symbol -> {"volume", "volatility_sharpe", "monthly_performance",
+              "metrics"}; symbols without price history are absent so callers
+              can fall back to the per-symbol tools
+    """
+    if closes is None:
+        closes, volumes = load_price_matrix(symbols, start_date, end_date)
+    if closes.empty:
+        return {}
+
+    metrics = compute_risk_metrics(closes, volumes)
+    results = {}
+    for symbol, row in metrics.iterrows():
+        if pd.isna(row["volatility"]):
+            continue
+        results[symbol] = {
+            "volume": format_volume_change(symbol, row),
+            "volatility_sharpe": format_volatility_sharpe(symbol, row, start_date, end_date),
+            "monthly_performance": format_monthly_performance(symbol, row),
+            "metrics": {key: (None if pd.isna(value) else float(value)) for key, value in row.items()},
+        }
+    return results
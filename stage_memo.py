@@ -0,0 +1,112 @@
+import json
+import time
+import hashlib
+import threading
+
+from .local_db import connect
+
+# Last output of each LLM stage per ticker, keyed by a fingerprint of exactly
+# the input fields that stage consumes. When the fingerprint is unchanged the
+# previous output is reused and the model isn't called at all.
+STAGE_MEMO_FILE = "stage_memo.sqlite3"
+STAGE_MEMO_MAX_AGE = 30 * 24 * 3600  # seconds; regenerate at least this often
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_outputs (
+    ticker TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    output TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (ticker, stage)
+);
+"""
+
+_stats_lock = threading.Lock()
+_stats = {}  # stage -> {"reused": n, "regenerated": n}
+
+
+def _db():
+    return connect(STAGE_MEMO_FILE, _SCHEMA)
+
+
+def _count(stage, outcome):
+    with _stats_lock:
+        _stats.setdefault(stage, {"reused": 0, "regenerated": 0})[outcome] += 1
+
+
+def fingerprint(data):
+    """
+    Stable hash of any JSON-serialisable value.
+    """
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def fields_fingerprint(info, fields):
+    """
+    Fingerprint of just the given info-dict fields.
+    """
+    return fingerprint({field: info.get(field) for field in fields})
+
+
+def reuse_output(ticker, stage, stage_fingerprint):
+    """
+    Returns the stored output if it was produced from the same fingerprint,
+    otherwise None (and the caller regenerates).
+    """
+    try:
+        row = _db().execute(
+            "SELECT fingerprint, output, updated_at FROM stage_outputs WHERE ticker = ? AND stage = ?",
+            (ticker.upper(), stage)
+        ).fetchone()
+    except Exception as e:
+        print(f"Stage memo lookup failed for {ticker}/{stage}: {e}")
+        return None
+
+    if row is None or row[0] != stage_fingerprint or time.time() - row[2] > STAGE_MEMO_MAX_AGE:
+        _count(stage, "regenerated")
+        return None
+    _count(stage, "reused")
+    return row[1]
+
+
+def remember_output(ticker, stage, stage_fingerprint, output):
+    """
+    Stores a freshly generated stage output under its input fingerprint.
+    """
+    if not output:
+        return
+    try:
+        _db().execute(
+            "INSERT OR REPLACE INTO stage_outputs (ticker, stage, fingerprint, output, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (ticker.upper(), stage, stage_fingerprint, output, time.time())
+        )
+    except Exception as e:
+        print(f"Stage memo write failed for {ticker}/{stage}: {e}")
+
+
+def last_output(ticker, stage):
+    """
+    The most recent stored output for a stage whatever its fingerprint or age,
+    for serving stale when the stage can't run in time.
+
+    Returns:
+        tuple: (output, updated_at epoch), or None
+    """
+    try:
+        row = _db().execute(
+            "SELECT output, updated_at FROM stage_outputs WHERE ticker = ? AND stage = ?",
+            (ticker.upper(), stage)
+        ).fetchone()
+    except Exception as e:
+        print(f"Stage memo lookup failed for {ticker}/{stage}: {e}")
+        return None
+    return None if row is None else (row[0], row[1])
+
+
+def stage_memo_stats():
+    """
+    Returns reused / regenerated counts per stage for this process.
+    """
+    with _stats_lock:
+        return {stage: dict(counts) for stage, counts in _stats.items()}
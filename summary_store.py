@@ -0,0 +1,78 @@
+import json
+import time
+
+from .local_db import connect
+
+# Precomputed single-stock results, written by the precompute_summaries command
+# and served by comprehensive_summary / portfolio_breakdown when fresh.
+SUMMARY_STORE_FILE = "summaries.sqlite3"
+PRECOMPUTE_MAX_AGE = 26 * 3600  # seconds; a nightly run stays valid through the next day
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS precomputed (
+    ticker TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    results TEXT NOT NULL,
+    computed_at REAL NOT NULL,
+    PRIMARY KEY (ticker, start_date, end_date)
+);
+"""
+
+
+def _db():
+    return connect(SUMMARY_STORE_FILE, _SCHEMA)
+
+
+def save_precomputed(ticker, start_date, end_date, results):
+    """
+    Stores a single-stock results dict (vision_model, stock_ai, news_sentiment,
+    llm_insights, stock_summary) for the given date range.
+    """
+    _db().execute(
+        "INSERT OR REPLACE INTO precomputed (ticker, start_date, end_date, results, computed_at) VALUES (?, ?, ?, ?, ?)",
+        (ticker.upper(), start_date, end_date, json.dumps(results, default=str), time.time())
+    )
+
+
+def load_precomputed(ticker, start_date, end_date, max_age=PRECOMPUTE_MAX_AGE):
+    """
+    Returns the stored results dict plus "computed_at" (epoch) and the
+    "data_end_date" it was computed for, or None if there is nothing fresh
+    for this ticker and start date.
+
+    A run is stored under the end date it was computed for, usually the day
+    it ran, so the newest fresh row ending on or before end_date is served:
+    a nightly run still answers requests made after midnight.
+    """
+    try:
+        row = _db().execute(
+            "SELECT results, computed_at, end_date FROM precomputed"
+            " WHERE ticker = ? AND start_date = ? AND end_date <= ? AND computed_at >= ?"
+            " ORDER BY end_date DESC, computed_at DESC LIMIT 1",
+            (ticker.upper(), start_date, end_date, time.time() - max_age)
+        ).fetchone()
+    except Exception as e:
+        print(f"Summary store lookup failed for {ticker}: {e}")
+        return None
+
+    if row is None:
+        return None
+    results = json.loads(row[0])
+    results["computed_at"] = row[1]
+    results["data_end_date"] = row[2]
+    return results
+
+
+def as_portfolio_entry(symbol, results):
+    """
+    Reshapes stored single-stock results into a portfolio_breakdown entry.
+    """
+    return {
+        "symbol": symbol,
+        "summary": results["stock_summary"]["summary"],
+        "vision_analysis": results["vision_model"].get("analysis", {}),
+        "stock_ai": results["stock_ai"],
+        "news_sentiment": results["news_sentiment"],
+        "llm_insights": results["llm_insights"]
+    }
@@ -0,0 +1,71 @@
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+from .. import local_db, ollama_client, pipeline
+from ..benchmarks.fake_ollama import FakeOllamaServer
+from ..deadline import deadline
+
+BUDGET = 3.0  # seconds; far below the fake server's answer time
+
+
+class _Context:
+    ticker, start_date, end_date = "DLTEST", "2024-01-01", "2024-06-30"
+    history = None
+    info = {}
+
+
+def _quick_stages(context, combined_insights=False, session=None):
+    return {
+        "historical_data": lambda: None,
+        "vision_model": lambda: {"analysis": {}},
+        "stock_ai": lambda: {"volatility_sharpe": "n/a", "basic_info": "n/a"},
+        "news_sentiment": lambda: {"sentiment": "neutral"},
+        "health_analysis": lambda: "health",
+        "analyst_opinion": lambda: "opinion",
+        "business_analysis": lambda: "business",
+    }
+
+
+class SummaryPastDeadlineTest(unittest.TestCase):
+    """
+    The summary call outruns the request deadline: its read timeout (clamped
+    to the deadline) must degrade the summary, not report a failed generation.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        local_db.DATA_DIR = tempfile.mkdtemp()
+        # Prefill alone takes longer than the budget, so no bytes arrive before the read timeout.
+        cls.server = FakeOllamaServer(prefill_latency=0.1).start()
+        ollama_client.configure_nodes([cls.server.url])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_run_single_stock(self):
+        started = time.monotonic()
+        with mock.patch.object(pipeline, "single_stock_stages", _quick_stages), deadline(BUDGET):
+            results = pipeline.run_single_stock(_Context.ticker, _Context.start_date, _Context.end_date,
+                                                context=_Context())
+        self.assertLess(time.monotonic() - started, BUDGET + 1.5)
+        self.assertEqual(results["degraded"]["stock_summary"]["status"], "skipped")
+        self.assertTrue(results["stock_summary"]["summary"].startswith("Skipped:"))
+        self.assertNotIn("failed", results["stock_summary"]["summary"])
+
+    def test_iter_single_stock(self):
+        started = time.monotonic()
+        with mock.patch.object(pipeline, "single_stock_stages", _quick_stages), deadline(BUDGET):
+            events = list(pipeline.iter_single_stock(_Context.ticker, _Context.start_date, _Context.end_date,
+                                                     context=_Context()))
+        self.assertLess(time.monotonic() - started, BUDGET + 1.5)
+        tokens = "".join(event["text"] for event in events if event["type"] == "token")
+        self.assertTrue(tokens.startswith("Skipped:"))
+        self.assertEqual(events[-1], {"type": "degraded", "stage": "stock_summary", "status": "skipped",
+                                      "reason": pipeline.DEADLINE_REASON})
+
+
+if __name__ == "__main__":
+    unittest.main()
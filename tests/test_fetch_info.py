@@ -0,0 +1,182 @@
+import time
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from urllib.error import HTTPError
+
+from .. import fetch_info
+from ..fetch_info import get_info, safe_get_info, InfoFetchError, TokenBucket, CircuitBreaker
+
+
+class _Upstream:
+    """Stands in for yf: counts Ticker(...).info reads, optionally slow or failing."""
+
+    def __init__(self, info=None, delay=0.0, error=None):
+        self.info, self.delay, self.error = info or {}, delay, error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def Ticker(self, symbol):
+        upstream = self
+
+        class _Ticker:
+            @property
+            def info(self):
+                with upstream._lock:
+                    upstream.calls += 1
+                time.sleep(upstream.delay)
+                if upstream.error is not None:
+                    raise upstream.error
+                return dict(upstream.info, symbol=symbol)
+
+        return _Ticker()
+
+
+class _FetchInfoTest(unittest.TestCase):
+
+    def setUp(self):
+        fetch_info.clear_info_cache()
+        self.upstream = _Upstream()
+        for patcher in (mock.patch.object(fetch_info, "yf", self.upstream),
+                        mock.patch.object(fetch_info, "_rate_limiter", TokenBucket(1000, 1000)),
+                        mock.patch.object(fetch_info, "_breaker", CircuitBreaker(5, 30.0))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(fetch_info.clear_info_cache)
+
+    def _concurrently(self, fn, count=8):
+        results, errors = [], []
+
+        def run():
+            try:
+                results.append(fn())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results, errors
+
+
+class InfoCacheTest(_FetchInfoTest):
+
+    def test_concurrent_callers_share_one_fetch(self):
+        self.upstream.info, self.upstream.delay = {"sector": "Tech"}, 0.2
+        results, errors = self._concurrently(lambda: get_info("abc"))
+        self.assertEqual(errors, [])
+        self.assertEqual(self.upstream.calls, 1)
+        self.assertEqual([info["sector"] for info in results], ["Tech"] * 8)
+        stats = fetch_info.info_cache_stats()
+        self.assertEqual((stats["misses"], stats["shared_waits"]), (1, 7))
+
+    def test_fetch_error_reaches_every_waiter_and_is_not_cached(self):
+        self.upstream.delay = 0.2
+        self.upstream.error = HTTPError("https://example", 404, "Not Found", {}, None)
+        results, errors = self._concurrently(lambda: get_info("ABC"))
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 8)
+        self.assertTrue(all(isinstance(error, InfoFetchError) for error in errors))
+        self.assertEqual(self.upstream.calls, 1)
+
+        self.upstream.error, self.upstream.delay = None, 0.0
+        self.assertEqual(get_info("ABC")["symbol"], "ABC")
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_callers_get_copies(self):
+        self.upstream.info = {"sector": "Tech"}
+        get_info("ABC")["sector"] = "changed by a caller"
+        safe_get_info("ABC")["derived"] = 1
+        self.assertEqual(get_info("ABC"), {"sector": "Tech", "symbol": "ABC"})
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_entries_expire_after_the_ttl(self):
+        with mock.patch.object(fetch_info, "INFO_CACHE_TTL", 0.05):
+            get_info("ABC")
+            get_info("ABC")
+            time.sleep(0.1)
+            get_info("ABC")
+        self.assertEqual(self.upstream.calls, 2)
+
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=20, burst=3)
+        self.assertTrue(all(bucket.acquire(timeout=0) for _ in range(3)))
+        self.assertFalse(bucket.acquire(timeout=0))
+        started = time.monotonic()
+        self.assertTrue(bucket.acquire(timeout=1))
+        self.assertGreaterEqual(time.monotonic() - started, 0.03)  # ~1/20s for the next token
+
+    def test_gives_up_when_the_wait_is_too_long(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.acquire()
+        started = time.monotonic()
+        self.assertFalse(bucket.acquire(timeout=0.1))
+        self.assertLess(time.monotonic() - started, 0.1)  # refuses up front instead of sleeping
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_open_half_open_close(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())  # the trial
+        self.assertEqual(breaker.state, "half_open")
+        self.assertFalse(breaker.allow())  # everyone else waits for it
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+    def test_lost_trial_is_replaced(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0, trial_timeout=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())  # trial that never reports back
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+
+
+class UpstreamProtectionTest(_FetchInfoTest):
+
+    def test_retryable_failures_open_the_circuit(self):
+        self.upstream.error = HTTPError("https://example", 503, "Unavailable", {}, None)
+        with mock.patch.object(fetch_info, "_breaker", CircuitBreaker(2, 30.0)), \
+                mock.patch.object(fetch_info.time, "sleep"):
+            with self.assertRaises(InfoFetchError):
+                get_info("ABC", max_retries=2)
+            with self.assertRaises(fetch_info.CircuitOpenError):
+                get_info("ABC", max_retries=2)
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_saturated_rate_limit_raises(self):
+        with mock.patch.object(fetch_info, "_rate_limiter", TokenBucket(0.1, 1)), \
+                mock.patch.object(fetch_info, "RATE_LIMIT_MAX_WAIT", 0.05):
+            get_info("ABC")
+            with self.assertRaises(InfoFetchError):
+                get_info("XYZ")
+            self.assertEqual(safe_get_info("XYZ"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from .. import jobs, local_db
+from ..deadline import remaining
+
+
+def _wait_for(job_id, statuses, timeout=5):
+    until = time.monotonic() + timeout
+    while time.monotonic() < until:
+        job = jobs.get_job(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {statuses}")
+
+
+class SummaryJobTest(unittest.TestCase):
+
+    def setUp(self):
+        local_db.DATA_DIR = tempfile.mkdtemp()
+        self.release = threading.Event()
+
+    def _fake_pipeline(self, fail=False):
+        def run_single_stock(ticker, start_date, end_date, on_stage=None, **kwargs):
+            on_stage("historical_data", "running")
+            on_stage("historical_data", "done")
+            self.release.wait(5)
+            if fail:
+                raise RuntimeError("vision backend down")
+            return {"stock_summary": {"ticker": ticker, "summary": "ok"}}
+        return mock.patch.object(jobs, "run_single_stock", run_single_stock)
+
+    def test_queued_running_done(self):
+        with self._fake_pipeline():
+            job_id = jobs.submit_summary_job({"mode": "single_stock"}, "ABC", "2024-01-01", "2024-06-30")
+            job = _wait_for(job_id, ("running",))
+            self.assertNotIn("results", job)
+            self.assertEqual(job["stages"]["historical_data"], "done")
+            self.assertEqual(job["progress"], 1 / len(job["stages"]))
+            self.release.set()
+            job = _wait_for(job_id, ("done",))
+        self.assertEqual(job["results"]["mode"], "single_stock")
+        self.assertEqual(job["results"]["stock_summary"]["summary"], "ok")
+        self.assertIn("timestamp", job["results"])
+
+    def test_failure_is_recorded(self):
+        self.release.set()
+        with self._fake_pipeline(fail=True):
+            job_id = jobs.submit_summary_job({}, "ABC", "2024-01-01", "2024-06-30")
+            job = _wait_for(job_id, ("failed",))
+        self.assertEqual(job["error"], "vision backend down")
+
+    def test_budget_applies_in_the_worker(self):
+        seen = []
+
+        def run_single_stock(ticker, start_date, end_date, on_stage=None, **kwargs):
+            seen.append(remaining())
+            return {}
+
+        with mock.patch.object(jobs, "run_single_stock", run_single_stock):
+            _wait_for(jobs.submit_summary_job({}, "ABC", "2024-01-01", "2024-06-30", budget=30), ("done",))
+            _wait_for(jobs.submit_summary_job({}, "ABC", "2024-01-01", "2024-06-30"), ("done",))
+        self.assertTrue(0 < seen[0] <= 30)
+        self.assertIsNone(seen[1])
+
+    def test_unknown_job(self):
+        self.assertIsNone(jobs.get_job("no-such-job"))
+
+    def test_job_of_a_dead_worker_fails(self):
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        now = time.time()
+        jobs._db().execute(
+            "INSERT INTO jobs (id, kind, status, stages, pid, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ("orphan", "single_stock", "running", '{"historical_data": "done"}', dead.pid, now, now)
+        )
+        job = jobs.get_job("orphan")
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("Worker process exited", job["error"])
+        self.assertEqual(jobs.get_job("orphan")["status"], "failed")  # persisted
+
+    def test_expired_jobs_are_purged(self):
+        old = time.time() - jobs.JOB_RETENTION - 60
+        jobs._db().execute(
+            "INSERT INTO jobs (id, kind, status, stages, pid, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ("old", "single_stock", "done", "{}", 1, old, old)
+        )
+        self.release.set()
+        with self._fake_pipeline():
+            _wait_for(jobs.submit_summary_job({}, "ABC", "2024-01-01", "2024-06-30"), ("done",))
+        self.assertIsNone(jobs.get_job("old"))
+
+
+if __name__ == "__main__":
+    unittest.main()
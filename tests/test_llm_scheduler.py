@@ -0,0 +1,124 @@
+import time
+import threading
+import unittest
+from unittest import mock
+
+from .. import llm_scheduler
+from ..llm_scheduler import LLMScheduler, SchedulerSaturated
+
+
+class _Waiter(threading.Thread):
+    """Acquires a slot in the background and records when it was granted."""
+
+    def __init__(self, scheduler, priority, granted, timeout=5):
+        super().__init__(daemon=True)
+        self.scheduler, self.priority, self.granted, self.timeout = scheduler, priority, granted, timeout
+        self.ticket = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.ticket = self.scheduler.acquire(100, priority=self.priority, timeout=self.timeout)
+            self.granted.append(self.priority)
+        except SchedulerSaturated as e:
+            self.error = e
+
+
+def _queue(scheduler, priority, granted, timeout=5):
+    # Starts a waiter and returns once it is actually queued.
+    queued = sum(scheduler.stats()["queued"].values())
+    waiter = _Waiter(scheduler, priority, granted, timeout)
+    waiter.start()
+    for _ in range(500):
+        if sum(scheduler.stats()["queued"].values()) > queued or waiter.ticket or waiter.error:
+            break
+        time.sleep(0.002)
+    return waiter
+
+
+class LLMSchedulerTest(unittest.TestCase):
+
+    def test_single_slot_runs_batch_work(self):
+        # OLLAMA_NUM_PARALLEL=1: the reservation can't take the only slot.
+        scheduler = LLMScheduler(slots=1)
+        ticket = scheduler.acquire(100, priority="batch", timeout=1)
+        granted = []
+        waiter = _queue(scheduler, "background", granted, timeout=2)
+        scheduler.release(ticket)
+        waiter.join(2)
+        self.assertEqual(granted, ["background"])
+        scheduler.release(waiter.ticket)
+        self.assertEqual(scheduler.stats()["running"], {"interactive": 0, "batch": 0, "background": 0})
+
+    def test_interactive_is_served_first(self):
+        scheduler = LLMScheduler(slots=1)
+        ticket = scheduler.acquire(100, priority="interactive")
+        granted = []
+        batch, interactive = _queue(scheduler, "batch", granted), _queue(scheduler, "interactive", granted)
+        scheduler.release(ticket)
+        interactive.join(1)
+        self.assertEqual(granted, ["interactive"])
+        scheduler.release(interactive.ticket)
+        batch.join(1)
+        scheduler.release(batch.ticket)
+        self.assertEqual(granted, ["interactive", "batch"])
+
+    def test_waiters_age_upwards(self):
+        scheduler = LLMScheduler(slots=1)
+        ticket = scheduler.acquire(100, priority="interactive")
+        granted = []
+        with mock.patch.object(llm_scheduler, "AGING_SECONDS", 0.01):
+            old = _queue(scheduler, "background", granted)
+            time.sleep(0.1)  # 10 aging steps: ahead of any fresh interactive waiter
+            new = _queue(scheduler, "interactive", granted)
+            scheduler.release(ticket)
+            old.join(1)
+        self.assertEqual(granted, ["background"])
+        scheduler.release(old.ticket)
+        new.join(1)
+        scheduler.release(new.ticket)
+        self.assertEqual(granted, ["background", "interactive"])
+
+    def test_reserved_slot_is_kept_for_interactive(self):
+        scheduler = LLMScheduler(slots=2)
+        batch = scheduler.acquire(100, priority="batch")
+        granted = []
+        waiter = _queue(scheduler, "batch", granted, timeout=0.2)
+        interactive = scheduler.acquire(100, priority="interactive", timeout=0.1)  # takes the reserved slot
+        waiter.join(1)
+        self.assertEqual(granted, [])
+        self.assertIsInstance(waiter.error, SchedulerSaturated)
+        scheduler.release(interactive)
+        scheduler.release(batch)
+
+    def test_admission_rejects_a_full_queue(self):
+        scheduler = LLMScheduler(slots=1)
+        ticket = scheduler.acquire(100, priority="batch")
+        granted = []
+        with mock.patch.dict(llm_scheduler.MAX_QUEUE_DEPTH, {"batch": 1}):
+            waiter = _queue(scheduler, "batch", granted)
+            with self.assertRaises(SchedulerSaturated) as raised:
+                scheduler.admit("batch")
+            self.assertGreaterEqual(raised.exception.retry_after, 1)
+            with self.assertRaises(SchedulerSaturated):
+                scheduler.acquire(100, priority="batch")
+        self.assertEqual(scheduler.stats()["rejected"], 2)
+        scheduler.release(ticket)
+        waiter.join(1)
+        scheduler.release(waiter.ticket)
+
+    def test_timeout_leaves_nothing_queued(self):
+        scheduler = LLMScheduler(slots=1)
+        ticket = scheduler.acquire(100, priority="interactive")
+        with self.assertRaises(SchedulerSaturated):
+            scheduler.acquire(250, priority="interactive", timeout=0.05)
+        stats = scheduler.stats()
+        self.assertEqual(stats["queued"]["interactive"], 0)
+        self.assertEqual(stats["queued_tokens"], 0)
+        self.assertEqual(stats["timed_out"], 1)
+        scheduler.release(ticket)
+        scheduler.release(scheduler.acquire(100, priority="interactive", timeout=0.1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from unittest import mock
+
+from .. import llm_session
+
+
+class ChatSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.object(llm_session, "chat_raw", self._chat_raw)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _chat_raw(self, messages, cache=False, **kwargs):
+        self.calls.append({"messages": len(messages), "cache": cache})
+        return {"message": {"content": f"answer {len(self.calls)}"}, "prompt_eval_count": 10}
+
+    def test_opening_turn_skips_the_cache(self):
+        session = llm_session.ChatSession("ABC")
+        session.ask("insights", cache=True)
+        session.ask("summary", cache=True)
+        self.assertEqual(self.calls, [{"messages": 1, "cache": False}, {"messages": 3, "cache": True}])
+        self.assertEqual([message["role"] for message in session.messages],
+                         ["user", "assistant", "user", "assistant"])
+        self.assertEqual(len(session.turns), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
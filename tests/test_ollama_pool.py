@@ -0,0 +1,81 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from .. import ollama_pool
+from ..ollama_pool import OllamaPool, EJECT_AFTER_FAILURES
+
+MODEL = "qwen2.5"
+
+
+def _response(status=200, models=()):
+    return SimpleNamespace(status_code=status, json=lambda: {"models": [{"name": name} for name in models]})
+
+
+class OllamaPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        # No background prober; tests probe explicitly.
+        patcher = mock.patch.object(OllamaPool, "_start_prober")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.responses = {}
+        self.pool = OllamaPool(["http://a", "http://b"],
+                               get=lambda url, timeout: self.responses.get(url, _response(models=[MODEL])))
+        self.a, self.b = self.pool.nodes
+
+    def test_least_outstanding(self):
+        first = self.pool.acquire(MODEL)
+        second = self.pool.acquire(MODEL)
+        self.assertNotEqual(first, second)
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(MODEL), first)
+
+    def test_prefers_a_node_with_the_model_loaded(self):
+        self.b.loaded.add(MODEL + ":latest")
+        self.pool.acquire(MODEL)
+        self.pool.acquire(MODEL)
+        self.assertEqual((self.a.outstanding, self.b.outstanding), (0, 2))
+
+    def test_ejected_after_repeated_failures(self):
+        for _ in range(EJECT_AFTER_FAILURES):
+            self.pool.release(self.pool.acquire(MODEL, exclude=[self.b]), ok=False)
+        self.assertTrue(self.a.ejected)
+        self.assertFalse(self.pool.status()[0]["healthy"])
+        self.assertEqual({self.pool.acquire(MODEL) for _ in range(3)}, {self.b})
+
+    def test_timeouts_do_not_eject(self):
+        for _ in range(EJECT_AFTER_FAILURES + 1):
+            self.pool.release(self.pool.acquire(MODEL, exclude=[self.b]), ok=None)
+        self.assertFalse(self.a.ejected)
+
+    def test_successful_probe_readmits(self):
+        for _ in range(EJECT_AFTER_FAILURES):
+            self.pool.release(self.pool.acquire(MODEL, exclude=[self.b]), ok=False)
+        self.assertTrue(self.pool.probe(self.a))
+        self.assertFalse(self.a.ejected)
+        self.assertIn(MODEL + ":latest", self.a.available)
+
+    def test_failed_probes_eject(self):
+        self.responses["http://a/api/ps"] = _response(status=500)
+        for _ in range(EJECT_AFTER_FAILURES):
+            self.assertFalse(self.pool.probe(self.a))
+        self.assertTrue(self.a.ejected)
+
+    def test_retry_excludes_nodes_already_tried(self):
+        first = self.pool.acquire(MODEL)
+        self.pool.release(first, ok=False)
+        retry = self.pool.acquire(MODEL, exclude=[first])
+        self.assertIsNot(retry, first)
+        self.pool.release(retry)
+        # With every node tried the pool still hands one out.
+        self.assertIn(self.pool.acquire(MODEL, exclude=[self.a, self.b]), (self.a, self.b))
+
+    def test_all_ejected_picks_the_first_to_return(self):
+        with mock.patch.object(ollama_pool.time, "monotonic", return_value=1000.0):
+            self.a.ejected_until, self.b.ejected_until = 1020.0, 1010.0
+            self.assertIs(self.pool.acquire(MODEL), self.b)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from .. import local_db, peer_table
+from ..fetch_info import InfoFetchError
+
+
+class BuildFundamentalsTest(unittest.TestCase):
+
+    def setUp(self):
+        local_db.DATA_DIR = tempfile.mkdtemp()
+        self.failures = {}  # symbol -> fetches left to fail
+        self.fetches = []
+        for patcher in (mock.patch.object(peer_table, "get_info", self._get_info),
+                        mock.patch.object(peer_table, "RETRY_PAUSE", 0)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get_info(self, symbol, **kwargs):
+        self.fetches.append(symbol)
+        if self.failures.get(symbol):
+            self.failures[symbol] -= 1
+            raise InfoFetchError(f"{symbol}: rate limit saturated")
+        return {"sector": "Technology", "industry": "Software", "trailingPE": 20.0, "dividendRate": 1.5}
+
+    def test_failed_fetches_are_retried(self):
+        self.failures = {"BBB": 1}
+        report = peer_table.build_fundamentals_table(["AAA", "BBB"])
+        self.assertEqual(self.fetches.count("BBB"), 2)
+        self.assertEqual(self.fetches.count("AAA"), 1)
+        self.assertEqual((report["rows"], report["failed"], report["failed_symbols"]), (2, 0, {}))
+        self.assertEqual(peer_table.get_peer_table().fundamentals("BBB")["dividendRate"], 1.5)
+
+    def test_lasting_failures_are_reported_and_keep_their_row(self):
+        peer_table.build_fundamentals_table(["AAA", "BBB"])
+        self.failures = {"BBB": peer_table.RETRY_PASSES + 1}
+        report = peer_table.build_fundamentals_table(["AAA", "BBB"], max_age=0)
+        self.assertEqual(report["failed"], 1)
+        self.assertIn("rate limit saturated", report["failed_symbols"]["BBB"])
+        self.assertEqual(report["rows"], 2)
+        self.assertIn("BBB", peer_table.get_peer_table())
+
+
+if __name__ == "__main__":
+    unittest.main()
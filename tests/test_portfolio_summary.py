@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from .. import local_db, peer_table, portfolio_summary
+
+INFO = {
+    "AAA": {"sector": "Technology", "industry": "Software", "currentPrice": 100.0, "dividendRate": 2.0,
+            "trailingPE": 30.0, "recommendationMean": 1.8},
+    "BBB": {"sector": "Technology", "industry": "Semiconductors", "currentPrice": 50.0,
+            "recommendationMean": 2.6},
+    "CCC": {"sector": "Utilities", "industry": "Utilities", "currentPrice": 20.0, "dividendRate": 1.0,
+            "recommendationMean": 3.1},
+}
+
+
+class PortfolioSummaryTest(unittest.TestCase):
+
+    def setUp(self):
+        local_db.DATA_DIR = tempfile.mkdtemp()
+        self.info_calls = []
+        self.prompts = []
+        for patcher in (mock.patch.object(peer_table, "get_info", lambda symbol, **kwargs: dict(INFO[symbol])),
+                        mock.patch.object(portfolio_summary, "safe_get_info", self._safe_get_info),
+                        mock.patch.object(portfolio_summary, "load_precomputed", lambda *args: None),
+                        mock.patch.object(portfolio_summary, "generate", self._generate)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _safe_get_info(self, symbol):
+        self.info_calls.append(symbol)
+        return dict(INFO.get(symbol, {}))
+
+    def _generate(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return "- bullet"
+
+    def _summarize(self, symbols):
+        holdings = [{"symbol": symbol, "quantity": 10} for symbol in symbols]
+        return portfolio_summary.hierarchical_portfolio_summary(holdings, "2024-01-01", "2024-06-30")
+
+    def test_table_rows_skip_the_info_fetch(self):
+        peer_table.build_fundamentals_table(["AAA", "BBB"])
+        self._summarize(["AAA", "BBB", "CCC"])
+        self.assertEqual(self.info_calls, ["CCC"])
+        self.assertIn('"sector":"Technology"', self.prompts[-1])
+
+    def test_stored_summary_skips_the_info_fetch(self):
+        stored = {"stock_summary": {"summary": "CCC looks fine."}}
+        with mock.patch.object(portfolio_summary, "load_precomputed", lambda symbol, *args: stored):
+            self._summarize(["CCC"])
+        self.assertEqual(self.info_calls, [])
+        self.assertIn("CCC looks fine.", self.prompts[-1])
+
+    def test_root_prompt_has_portfolio_totals(self):
+        result = self._summarize(["AAA", "BBB", "CCC"])
+        prompt = self.prompts[-1]
+        self.assertIn("- Technology: 2 holdings, $1,500 (88.2% of priced value)", prompt)
+        self.assertIn("- Utilities: 1 holding, $200 (11.8% of priced value)", prompt)
+        self.assertIn("2 of 3 holdings pay a dividend; estimated annual income $30", prompt)
+        self.assertIn("strongest: AAA 1.8", prompt)
+        self.assertEqual(result["aggregates"]["dividends"].split(";")[0], "2 of 3 holdings pay a dividend")
+
+
+if __name__ == "__main__":
+    unittest.main()
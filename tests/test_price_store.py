@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from .. import local_db, price_store
+
+
+class _Upstream:
+    """Stands in for yf.download over a fixed calendar of sessions; prices can be re-based."""
+
+    def __init__(self):
+        self.sessions = pd.bdate_range("2024-05-01", "2024-06-28")
+        self.factor = 1.0
+        self.starts = []
+
+    def download(self, symbol, start=None, end=None, **kwargs):
+        self.starts.append(start)
+        index = self.sessions[self.sessions >= pd.Timestamp(start)]
+        close = (100.0 + np.arange(len(self.sessions)))[len(self.sessions) - len(index):] / self.factor
+        return pd.DataFrame({column: close for column in price_store.COLUMNS}, index=index)
+
+
+def _today(day):
+    class _Date(date):
+        @classmethod
+        def today(cls):
+            return cls.fromisoformat(day)
+    return _Date
+
+
+class PriceStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        local_db.DATA_DIR = tempfile.mkdtemp()
+        self.upstream = _Upstream()
+        for patcher in (mock.patch.object(price_store, "yf", self.upstream),
+                        mock.patch.object(price_store, "REFRESH_INTERVAL", 0)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _load(self, today):
+        with mock.patch.object(price_store, "date", _today(today)):
+            return price_store.load_history("ABC", "2024-05-01")
+
+    def test_tail_is_appended(self):
+        first = self._load("2024-06-12")  # Wednesday: through Tuesday the 11th
+        self.assertEqual(first.index[-1], pd.Timestamp("2024-06-11"))
+        rows_before = price_store.price_store_stats()["rows_appended"]
+
+        later = self._load("2024-06-15")  # Saturday: Wednesday to Friday are new
+        self.assertEqual(self.upstream.starts[-1], "2024-06-11")  # from the last stored day
+        self.assertEqual(later.index[-1], pd.Timestamp("2024-06-14"))
+        self.assertEqual(len(later), len(first) + 3)
+        self.assertEqual(price_store.price_store_stats()["rows_appended"] - rows_before, 3)
+        pd.testing.assert_frame_equal(later.iloc[:len(first)], first)
+
+    def test_split_rewrites_history(self):
+        self._load("2024-06-12")
+        self.upstream.factor = 2.0  # 2:1 split re-bases every bar
+        rewrites = price_store.price_store_stats()["adjustment_rewrites"]
+        history = self._load("2024-06-15")
+        self.assertEqual(price_store.price_store_stats()["adjustment_rewrites"] - rewrites, 1)
+        self.assertEqual(history["Close"].iloc[0], 50.0)
+        self.assertEqual(history.index[-1], pd.Timestamp("2024-06-14"))
+
+    def test_weekend_does_not_go_upstream(self):
+        self._load("2024-06-15")  # Saturday: stored through Friday the 14th
+        fetches = len(self.upstream.starts)
+        self._load("2024-06-16")  # Sunday
+        self._load("2024-06-17")  # Monday: Monday's bar isn't complete yet
+        self.assertEqual(len(self.upstream.starts), fetches)
+        self._load("2024-06-18")
+        self.assertEqual(len(self.upstream.starts), fetches + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
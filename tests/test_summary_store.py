@@ -0,0 +1,54 @@
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from .. import local_db, summary_store
+from ..summary_store import save_precomputed, load_precomputed, PRECOMPUTE_MAX_AGE
+
+
+def _epoch(text):
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _results(label):
+    return {"stock_summary": {"summary": label}}
+
+
+class PrecomputedAcrossMidnightTest(unittest.TestCase):
+
+    def setUp(self):
+        local_db.DATA_DIR = tempfile.mkdtemp()
+
+    def _save(self, end_date, at, label):
+        with mock.patch.object(summary_store.time, "time", return_value=_epoch(at)):
+            save_precomputed("abc", "2024-01-01", end_date, _results(label))
+
+    def _load(self, end_date, at, **kwargs):
+        with mock.patch.object(summary_store.time, "time", return_value=_epoch(at)):
+            return load_precomputed("ABC", "2024-01-01", end_date, **kwargs)
+
+    def test_nightly_run_serves_next_day(self):
+        self._save("2024-06-30", "2024-06-30T23:30:00", "nightly")
+        stored = self._load("2024-07-01", "2024-07-01T09:00:00")
+        self.assertEqual(stored["stock_summary"]["summary"], "nightly")
+        self.assertEqual(stored["data_end_date"], "2024-06-30")
+
+    def test_newest_end_date_wins(self):
+        self._save("2024-06-29", "2024-06-30T23:00:00", "older range")
+        self._save("2024-06-30", "2024-06-30T23:30:00", "nightly")
+        self.assertEqual(self._load("2024-07-01", "2024-07-01T09:00:00")["stock_summary"]["summary"], "nightly")
+
+    def test_never_serves_a_later_end_date(self):
+        self._save("2024-07-01", "2024-07-01T00:30:00", "tomorrow's range")
+        self.assertIsNone(self._load("2024-06-30", "2024-07-01T01:00:00"))
+
+    def test_too_old_is_not_served(self):
+        self._save("2024-06-30", "2024-06-30T23:30:00", "nightly")
+        later = datetime.fromtimestamp(_epoch("2024-06-30T23:30:00") + PRECOMPUTE_MAX_AGE + 60, timezone.utc)
+        self.assertIsNone(self._load("2024-07-02", later.replace(tzinfo=None).isoformat()))
+        self.assertIsNotNone(self._load("2024-07-02", later.replace(tzinfo=None).isoformat(), max_age=float("inf")))
+
+
+if __name__ == "__main__":
+    unittest.main()
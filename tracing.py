@@ -0,0 +1,258 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Lightweight request tracing. Spans (a pipeline stage, an Ollama call, a
+# yfinance fetch) are timed and recorded twice: on the request's Trace, when
+# the view started one, for the optional "timings" block of the response; and
+# in process-wide histograms exposed in Prometheus text format by the metrics
+# view.
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TOKEN_BUCKETS = (64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+_current_trace = contextvars.ContextVar("analyst_trace", default=None)
+_current_span = contextvars.ContextVar("analyst_span", default=None)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by label values."""
+
+    def __init__(self, name, help_text, labels, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.setdefault(label_values, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, values in series:
+            labels = ",".join(f'{key}="{_escape(value)}"' for key, value in zip(self.labels, label_values))
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_count{{{labels}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            labels = ",".join(f'{key}="{_escape(value)}"' for key, value in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+SPAN_SECONDS = Histogram("analyst_span_duration_seconds", "Wall time per stage / upstream call.", ("kind", "name"))
+SPAN_ERRORS = Counter("analyst_span_errors_total", "Spans that ended with an exception.", ("kind", "name"))
+OLLAMA_SECONDS = Histogram("analyst_ollama_request_duration_seconds", "Wall time per Ollama generation.", ("model",))
+OLLAMA_LOAD_SECONDS = Histogram("analyst_ollama_load_duration_seconds", "Ollama model load time per generation.", ("model",))
+OLLAMA_PROMPT_SECONDS = Histogram("analyst_ollama_prompt_eval_duration_seconds", "Ollama prompt prefill time per generation.", ("model",))
+OLLAMA_EVAL_SECONDS = Histogram("analyst_ollama_eval_duration_seconds", "Ollama token generation time per generation.", ("model",))
+OLLAMA_PROMPT_TOKENS = Histogram("analyst_ollama_prompt_tokens", "Prompt tokens evaluated per generation.", ("model",), TOKEN_BUCKETS)
+OLLAMA_EVAL_TOKENS = Histogram("analyst_ollama_eval_tokens", "Tokens generated per generation.", ("model",), TOKEN_BUCKETS)
+OLLAMA_CACHE_HITS = Counter("analyst_ollama_cache_hits_total", "Generations served from the generation cache.", ("model",))
+
+METRICS = (SPAN_SECONDS, SPAN_ERRORS, OLLAMA_SECONDS, OLLAMA_LOAD_SECONDS, OLLAMA_PROMPT_SECONDS,
+           OLLAMA_EVAL_SECONDS, OLLAMA_PROMPT_TOKENS, OLLAMA_EVAL_TOKENS, OLLAMA_CACHE_HITS)
+
+
+class Trace:
+    """The spans recorded while handling one request."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def timings(self):
+        """
+        Returns:
+            dict: total_s plus one entry per span (name, kind, parent, start_s,
+                  seconds and the span's attributes), in start order
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.started)
+        return {
+            "total_s": round(time.monotonic() - self.started, 4),
+            "spans": [span.as_dict(self.started) for span in spans],
+        }
+
+
+class Span:
+    def __init__(self, name, kind, attrs):
+        self.name = name
+        self.kind = kind
+        self.attrs = attrs
+        parent = _current_span.get()
+        self.parent = parent.name if parent is not None else None
+        self.trace = _current_trace.get()
+        self.started = time.monotonic()
+        self.seconds = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record_ollama(self, body):
+        """Copies the eval counters and durations from an Ollama response body."""
+        self.attrs.update({
+            "prompt_eval_count": body.get("prompt_eval_count"),
+            "eval_count": body.get("eval_count"),
+            "load_duration_s": _ns_to_s(body.get("load_duration")),
+            "prompt_eval_duration_s": _ns_to_s(body.get("prompt_eval_duration")),
+            "eval_duration_s": _ns_to_s(body.get("eval_duration")),
+            "total_duration_s": _ns_to_s(body.get("total_duration")),
+        })
+
+    def finish(self, error=None):
+        if self.seconds is not None:
+            return
+        self.seconds = time.monotonic() - self.started
+        if error is not None:
+            self.attrs["error"] = f"{type(error).__name__}: {error}"
+        if self.trace is not None:
+            self.trace.add(self)
+        _observe(self, error)
+
+    def as_dict(self, origin):
+        record = {
+            "name": self.name,
+            "kind": self.kind,
+            "parent": self.parent,
+            "start_s": round(self.started - origin, 4),
+            "seconds": None if self.seconds is None else round(self.seconds, 4),
+        }
+        record.update(self.attrs)
+        return record
+
+
+def _ns_to_s(value):
+    return None if value is None else round(value / 1e9, 4)
+
+
+def _observe(span, error):
+    SPAN_SECONDS.observe((span.kind, span.name), span.seconds)
+    if error is not None:
+        SPAN_ERRORS.inc((span.kind, span.name))
+    if span.kind != "ollama" or error is not None:
+        return
+
+    model = (span.attrs.get("model"),)
+    if span.attrs.get("cached"):
+        OLLAMA_CACHE_HITS.inc(model)
+        return
+    OLLAMA_SECONDS.observe(model, span.seconds)
+    for histogram, key in ((OLLAMA_LOAD_SECONDS, "load_duration_s"), (OLLAMA_PROMPT_SECONDS, "prompt_eval_duration_s"),
+                           (OLLAMA_EVAL_SECONDS, "eval_duration_s"), (OLLAMA_PROMPT_TOKENS, "prompt_eval_count"),
+                           (OLLAMA_EVAL_TOKENS, "eval_count")):
+        if span.attrs.get(key) is not None:
+            histogram.observe(model, span.attrs[key])
+
+
+@contextmanager
+def start_trace():
+    """
+    Collects every span finished in this context (and in stage threads started
+    through in_context) on a new Trace.
+    """
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def begin_span(name, kind="stage", **attrs):
+    """
+    Starts a span without making it the parent of later spans. Call
+    .finish() on it when the work is done; used where a with block can't
+    cover the work, e.g. a generator consumed by the caller.
+    """
+    return Span(name, kind, attrs)
+
+
+@contextmanager
+def span(name, kind="stage", **attrs):
+    """
+    Times the enclosed block. Spans started inside it record it as their parent.
+
+    Args:
+        name (str): Stage or call name, e.g. "vision_model" or "generate"
+        kind (str): "stage", "ollama" or "upstream"
+    """
+    current = Span(name, kind, attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+def traced(name, fn, kind="stage"):
+    """Wraps fn so each call runs inside a span."""
+    def run(*args, **kwargs):
+        with span(name, kind):
+            return fn(*args, **kwargs)
+    return run
+
+
+def in_context(fn):
+    """
+    Binds fn to a copy of the caller's context, so a worker thread running it
+    reports its spans to the caller's trace and parent span.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return run
+
+
+def render_metrics():
+    """Every metric in Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
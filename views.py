@@ -1,25 +1,25 @@
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 import json
+import math
 import traceback
-from datetime import datetime
-from MomentumSim.data_fetching import get_historical_data, fetch_multiple_historical_data
-from API.UpdateUserData import fetch_updated_data
-from API.AITools import (
-    summarize_portfolio, sector_total, get_total_dividends, get_recommendations,
-    analyse_volume_change, get_volatility_and_sharpe, get_monthly_performance, get_stock_info
-)
-from ScrapeData.helpers import run_news_sentiment
-from Vision.VisHelper import run_vision_model_analysis  # you likely already have this helper now!
-from PortfolioGraphs.PortfolioAllLines import get_multi_stock_graph_json
-
-# Import it at the top:
-from .Summary import summarize_stock, summary_portfolio
-
-# new features 
-from .health_analysis import get_health_response
-from .analyst_opinion import get_opinions_response
-from .Business_analysis import get_business_response
+from datetime import datetime, timezone
+
+from .pipeline import run_single_stock, iter_single_stock
+from .ollama_client import generate, get_pool, DEFAULT_MODEL
+from .portfolio_engine import run_portfolio, iter_portfolio
+from .portfolio_summary import hierarchical_portfolio_summary
+from .market_data import MarketDataContext
+from .jobs import submit_summary_job, get_job
+from .summary_store import load_precomputed
+from .tracing import start_trace, render_metrics
+from .llm_scheduler import scheduler, priority, SchedulerSaturated
+from .deadline import deadline
+from .lazy_imports import lazy_from
+
+# Heavy sibling apps load on first use; see lazy_imports.preload for warm workers.
+fetch_updated_data = lazy_from("API.UpdateUserData", "fetch_updated_data")
 
 
 @csrf_exempt
@@ -30,7 +30,7 @@ def comprehensive_summary(request):
     try:
         payload = json.loads(request.body)
         user_id = payload.get("user_id", 1)
-        mode = payload.get("mode", "portfolio")  # default
+        mode = payload.get("mode")
         ticker = payload.get("ticker", "").upper()
         start_date = payload.get("start_date", "2022-01-01")
         end_date = payload.get("end_date", datetime.now().strftime("%Y-%m-%d"))
@@ -43,80 +43,218 @@ def comprehensive_summary(request):
             "end_date": end_date
         }
 
-        if mode != "single_stock":
-            return JsonResponse({"error": "Only 'single_stock' mode is supported."}, status=400)
+        # "deadline": seconds the response may take; late stages come back stale or skipped.
+        try:
+            budget = _deadline_seconds(payload)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        if mode not in ("single_stock", "portfolio"):
+            return JsonResponse({"error": "Only 'single_stock' and 'portfolio' modes are supported."}, status=400)
+
+        elif mode == "portfolio" and "user_id" not in payload:
+            # The map-reduce summary is expensive; never start one for a defaulted user.
+            return JsonResponse({"error": "'portfolio' mode requires a user_id."}, status=400)
 
+        elif mode == "portfolio" and budget is not None:
+            # The map-reduce summary has no stale fallbacks to cut short to; reject rather than ignore the budget.
+            return JsonResponse({"error": "'deadline' is only supported in 'single_stock' mode."}, status=400)
+
+        elif mode == "portfolio":
+            # Holdings are condensed in parallel batches, then reduced level by level to 4-6 bullets.
+            scheduler.admit("batch")
+            with start_trace() as trace, priority("batch"):
+                results.update(hierarchical_portfolio_summary(fetch_updated_data(user_id=int(user_id)),
+                                                              start_date, end_date))
+            if payload.get("timings"):
+                results["timings"] = trace.timings()
 
         elif mode == "single_stock" and ticker:
-            # Single Stock mode
-            df = get_historical_data(ticker, start_date, end_date)
-
-            # Vision model (cleaned)
-            vision_result_raw = run_vision_model_analysis(ticker, start_date, end_date, indicators=["20-Day SMA", "VWAP", "20-Day Bollinger Bands", "20-Day EMA"])
-            vision_result_clean = {}
-
-            if vision_result_raw and "results" in vision_result_raw and len(vision_result_raw["results"]) > 0:
-                vision_data = vision_result_raw["results"][0]
-
-                vision_result_clean = {
-                    "ticker": vision_data.get("ticker", ""),
-                    "analysis": vision_data.get("analysis", {})  # No chart_json here
-                }
-
-            results["vision_model"] = vision_result_clean
-
-            # Stock AI tools
-            results["stock_ai"] = {
-                #"volume": analyse_volume_change.invoke({"stock": ticker}),
-                "volatility_sharpe": get_volatility_and_sharpe.invoke({"ticker": ticker}),
-                "basic_info": get_stock_info.invoke({"stock": ticker, "field": "market cap"})
-            }
-
-            # News sentiment for single stock
-            results["news_sentiment"] = run_news_sentiment(ticker)
-
-            results["llm_insights"] = {
-                "health_analysis": get_health_response(ticker),
-                "analyst_opinion": get_opinions_response(ticker),
-                "business_analysis": get_business_response(ticker)
-            }
-
-            # LLM summary of info 
-            stock_summary_text = summarize_stock(
-                ticker,
-                vision_result_clean.get("analysis", {}),
-                results["stock_ai"],
-                results["news_sentiment"],
-                health_text=results["llm_insights"]["health_analysis"],
-                business_text=results["llm_insights"]["business_analysis"],
-                analyst_opinion_text=results["llm_insights"]["analyst_opinion"]
-            )
-
-            results["stock_summary"] = {
-                "ticker": ticker,
-                "summary": stock_summary_text
-            }
+            # "combined_insights": true asks for the three insight sections in one JSON-mode call.
+            combined_insights = bool(payload.get("combined_insights", False))
+            # "reuse_context": true also continues that call's /api/chat conversation for the summary.
+            reuse_context = bool(payload.get("reuse_context", False))
+            # "async": true queues the pipeline on the local job pool; poll summary_job_status.
+            # A deadline there starts counting when a job worker picks the job up.
+            if payload.get("async"):
+                scheduler.admit()
+                job_id = submit_summary_job(results, ticker, start_date, end_date,
+                                            concurrent=bool(payload.get("concurrent", True)),
+                                            combined_insights=combined_insights, reuse_context=reuse_context,
+                                            budget=budget)
+                return JsonResponse({"job_id": job_id, "status": "queued"}, status=202)
+
+            # "stream": true sends NDJSON events as each stage finishes, then the summary tokens.
+            if payload.get("stream"):
+                scheduler.admit()
+                return _stream_single_stock(results, ticker, start_date, end_date, combined_insights, reuse_context,
+                                            budget)
+
+            # Serve a fresh precomputed result when there is one ("refresh": true skips it).
+            precomputed = None if payload.get("refresh") else load_precomputed(ticker, start_date, end_date)
+            if precomputed is not None:
+                results.update(precomputed)
+                results["timestamp"] = datetime.fromtimestamp(results.pop("computed_at"), timezone.utc).isoformat()
+                return JsonResponse(results)
+
+            # Single Stock mode. With "concurrent": true the independent stages
+            # (history, vision, risk tools, news, insights) run side by side.
+            concurrent = bool(payload.get("concurrent", False))
+            scheduler.admit()
+            with start_trace() as trace, deadline(budget):
+                context = MarketDataContext(ticker, start_date, end_date)
+                results.update(run_single_stock(ticker, start_date, end_date, concurrent=concurrent, context=context,
+                                                combined_insights=combined_insights, reuse_context=reuse_context))
+
+            # "timings": true adds the per-stage / per-Ollama-call spans of this request.
+            if payload.get("timings"):
+                results["timings"] = trace.timings()
 
 
         else:
             return JsonResponse({"error": "Invalid mode or missing ticker"}, status=400)
 
         # Optional timestamp
-        from datetime import timezone
         results["timestamp"] = datetime.now(timezone.utc).isoformat()
 
         return JsonResponse(results)
 
+    except SchedulerSaturated as e:
+        return _saturated(e)
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+def _deadline_seconds(payload):
+    """
+    The request's "deadline" field as seconds, or None when it's absent.
+
+    Raises:
+        ValueError: It isn't a positive, finite number
+    """
+    value = payload.get("deadline")
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("'deadline' must be a number of seconds.") from None
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError("'deadline' must be a positive, finite number of seconds.")
+    return seconds
+
+
+def _saturated(e):
+    # Ollama is at capacity: tell the client when to come back instead of queueing it.
+    response = JsonResponse({"error": str(e), "retry_after": e.retry_after}, status=503)
+    response["Retry-After"] = str(e.retry_after)
+    return response
+
+
+def summary_job_status(request, job_id):
+    if request.method != "GET":
+        return JsonResponse({"error": "Only GET allowed"}, status=405)
+
+    try:
+        job = get_job(job_id)
+        if job is None:
+            return JsonResponse({"error": "Unknown or expired job id"}, status=404)
+        return JsonResponse(job)
+
     except Exception as e:
         traceback.print_exc()
         return JsonResponse({"error": str(e)}, status=500)
 
 
+def _ndjson(record):
+    return json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+def _stream_single_stock(meta, ticker, start_date, end_date, combined_insights=False, reuse_context=False,
+                         budget=None):
+    """
+    NDJSON streaming response for single_stock mode. Records, one per line:
+        {"type": "meta", ...request fields}
+        {"type": "stage", "section": ..., "stage": ..., "data": ...}  per stage, as it finishes
+        {"type": "token", "text": ...}  summary text as Ollama generates it
+        {"type": "degraded", "stage": "stock_summary", ...}  summary cut short by the deadline
+        {"type": "done", "timestamp": ...} or {"type": "error", "error": ...}
+    """
+    def events():
+        yield _ndjson({"type": "meta", **meta})
+        try:
+            with deadline(budget):
+                context = MarketDataContext(ticker, start_date, end_date)
+                for event in iter_single_stock(ticker, start_date, end_date, context=context,
+                                               combined_insights=combined_insights, reuse_context=reuse_context):
+                    yield _ndjson(event)
+        except Exception as e:
+            traceback.print_exc()
+            error = {"type": "error", "error": str(e)}
+            if isinstance(e, SchedulerSaturated):
+                error["retry_after"] = e.retry_after
+            yield _ndjson(error)
+            return
+        yield _ndjson({"type": "done", "timestamp": datetime.now(timezone.utc).isoformat()})
+
+    response = StreamingHttpResponse(events(), content_type="application/x-ndjson")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # stop nginx from buffering the stream
+    return response
+
+
+def _stream_portfolio(user_id, symbols, combined_insights=False, timings=False):
+    """
+    NDJSON streaming response for portfolio_breakdown. Records, one per line:
+        {"type": "meta", "user_id": ..., "symbols": [...]}
+        {"type": "stock", "index": ..., "data": ...}  per holding, in completion order
+        {"type": "done", "total": ..., "succeeded": ..., "failed": ..., "errors": [...], ...}
+        or {"type": "error", "error": ...} if the run itself fails
+    """
+    def events():
+        yield _ndjson({"type": "meta", "user_id": user_id, "symbols": symbols})
+        errors = []
+        started = datetime.now(timezone.utc)
+        try:
+            with start_trace() as trace, priority("batch"):
+                for index, entry in iter_portfolio(symbols, "2022-01-01", datetime.now().strftime("%Y-%m-%d"),
+                                                   combined_insights=combined_insights):
+                    if "error" in entry:
+                        errors.append({"index": index, "symbol": entry.get("symbol"), "error": entry["error"]})
+                    yield _ndjson({"type": "stock", "index": index, "data": entry})
+        except Exception as e:
+            traceback.print_exc()
+            error = {"type": "error", "error": str(e)}
+            if isinstance(e, SchedulerSaturated):
+                error["retry_after"] = e.retry_after
+            yield _ndjson(error)
+            return
+
+        done = {
+            "type": "done",
+            "user_id": user_id,
+            "total": len(symbols),
+            "succeeded": len(symbols) - len(errors),
+            "failed": len(errors),
+            "errors": errors,
+            "elapsed_s": round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+        if timings:
+            done["timings"] = trace.timings()
+        yield _ndjson(done)
+
+    response = StreamingHttpResponse(events(), content_type="application/x-ndjson")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # stop nginx from buffering the stream
+    return response
+
+
 @csrf_exempt
 def summarize_risk_metrics(request):
-    import requests
-    import json
-
     if request.method != "POST":
         return JsonResponse({"error": "Only POST allowed"}, status=405)
 
@@ -150,21 +288,16 @@ def summarize_risk_metrics(request):
         """)
 
         # Call Ollama API
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "qwen2.5:latest",  # or your favorite model
-                "prompt": summary_prompt,
-                "stream": False,
-                "num_ctx": 32000  # Adjust context size as needed
-
-            },
-            timeout=120
-        )
-        summary = response.json().get("response", "").strip()
+        with start_trace() as trace:
+            summary = generate(summary_prompt, model=DEFAULT_MODEL, timeout=120)
 
-        return JsonResponse({"summary": summary})
+        response = {"summary": summary}
+        if data.get("timings"):
+            response["timings"] = trace.timings()
+        return JsonResponse(response)
 
+    except SchedulerSaturated as e:
+        return _saturated(e)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
@@ -177,46 +310,43 @@ def portfolio_breakdown(request):
     try:
         payload = json.loads(request.body)
         user_id = int(payload.get("user_id", 1))
+        if payload.get("deadline") is not None:
+            # Each symbol already gets its own time limit in iter_portfolio; there is no request-wide one.
+            return JsonResponse({"error": "'deadline' is only supported by comprehensive_summary single_stock mode."},
+                                status=400)
 
         portfolio_data = fetch_updated_data(user_id=user_id)
         portfolio_symbols = [x["symbol"] for x in portfolio_data if x.get("symbol")]
 
-        results = { "user_id": user_id, "stocks": [] }
-
-        for symbol in portfolio_symbols:
-            try:
-                vision = run_vision_model_analysis(symbol, "2022-01-01", datetime.now().strftime("%Y-%m-%d"),
-                                                   indicators=["20-Day SMA", "VWAP", "20-Day EMA", "20-Day Bollinger Bands"])
-                vision_analysis = vision.get("results", [{}])[0].get("analysis", {})
-
-                stock_ai = {
-                    "volume": analyse_volume_change.invoke({"stock": symbol}),
-                    "volatility_sharpe": get_volatility_and_sharpe.invoke({"ticker": symbol}),
-                    "basic_info": get_stock_info.invoke({"stock": symbol, "field": "market cap"})
-                }
-
-                news = run_news_sentiment(symbol)
-
-                summary = summarize_stock(symbol, vision_analysis, stock_ai, news)
-
-                results["stocks"].append({
-                    "symbol": symbol,
-                    "summary": summary,
-                    "vision_analysis": vision_analysis,
-                    "stock_ai": stock_ai,
-                    "news_sentiment": news
-                })
-
-            except Exception as e:
-                results["stocks"].append({
-                    "symbol": symbol,
-                    "error": str(e)
-                })
+        # Symbols run concurrently with per-stage limits; results stay in holding order.
+        # Their generations queue behind interactive requests in the LLM scheduler.
+        scheduler.admit("batch")
+        combined_insights = bool(payload.get("combined_insights", False))
+        # "stream": true sends one NDJSON record per symbol as it finishes instead.
+        if payload.get("stream"):
+            return _stream_portfolio(user_id, portfolio_symbols, combined_insights, bool(payload.get("timings")))
+
+        with start_trace() as trace, priority("batch"):
+            stocks = run_portfolio(portfolio_symbols, "2022-01-01", datetime.now().strftime("%Y-%m-%d"),
+                                   combined_insights=combined_insights)
+        results = { "user_id": user_id, "stocks": stocks }
+        if payload.get("timings"):
+            results["timings"] = trace.timings()
 
         return JsonResponse(results)
 
+    except SchedulerSaturated as e:
+        return _saturated(e)
     except Exception as e:
         traceback.print_exc()
         return JsonResponse({"error": str(e)}, status=500)
 
 
+def metrics(request):
+    """
+    Stage and Ollama histograms for this process in Prometheus text format.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Only GET allowed"}, status=405)
+    return HttpResponse(render_metrics() + get_pool().render_metrics(),
+                        content_type="text/plain; version=0.0.4; charset=utf-8")